@@ -0,0 +1,107 @@
+"""
+Aho-Corasick 多模式匹配
+
+一次扫描找出文本中所有词典词（O(文本长度 + 匹配数)），并在此基础上做最大匹配分词：
+选取互不重叠、覆盖字符数最多的词典词（覆盖相同时词数最少，即优先长词）。
+
+用于检验项目名称切分（"阿维菌素哒螨灵" -> 阿维菌素 / 哒螨灵），见 item_name_matcher.ItemDictionary。
+"""
+from __future__ import annotations
+
+from collections import deque
+from typing import Any, Dict, Iterator, List, Mapping, Tuple
+
+
+class AhoCorasick:
+    """
+    由 {模式串: 值} 构建的自动机（构建后只读，线程安全）
+
+    状态用整数表示：_goto[s] 为转移表，_fail[s] 为失配指针，
+    _out[s] 为以状态 s 结尾的模式（沿输出链 _dict_link 可以取到所有更短的后缀模式）
+    """
+
+    def __init__(self, patterns: Mapping[str, Any]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, Any]] = [(0, None)]   # (模式长度, 值)，长度 0 表示该状态不是模式结尾
+        self._dict_link: List[int] = [0]                 # 最近的、本身是模式结尾的后缀状态
+
+        for pattern, value in patterns.items():
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append((0, None))
+                    self._dict_link.append(0)
+                state = nxt
+            self._out[state] = (len(pattern), value)
+
+        # BFS 计算失配指针
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                fail_state = self._fail[nxt]
+                self._dict_link[nxt] = fail_state if self._out[fail_state][0] else self._dict_link[fail_state]
+
+    def __len__(self) -> int:
+        return sum(1 for length, _ in self._out if length)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """所有（可重叠的）匹配 (start, end, value)，按 end 升序"""
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            match = state if self._out[state][0] else self._dict_link[state]
+            while match:
+                length, value = self._out[match]
+                yield i + 1 - length, i + 1, value
+                match = self._dict_link[match]
+
+    def segment(self, text: str) -> List[Tuple[int, int, Any]]:
+        """
+        最大匹配分词：互不重叠、覆盖字符数最多的匹配 (start, end, value)，按位置排列
+
+        动态规划 best[i] = 前 i 个字符的最优 (覆盖字符数, -词数)，
+        每个位置只看以该位置结尾的匹配，总体线性
+        """
+        n = len(text)
+        best: List[Tuple[int, int]] = [(0, 0)] * (n + 1)
+        back: List[Tuple[int, Any]] = [(-1, None)] * (n + 1)   # (匹配起点 或 -1 表示跳过该字符, 值)
+        ends: Dict[int, List[Tuple[int, Any]]] = {}
+        for start, end, value in self.iter_matches(text):
+            ends.setdefault(end, []).append((start, value))
+
+        for i in range(1, n + 1):
+            best[i], back[i] = best[i - 1], (-1, None)
+            for start, value in ends.get(i, ()):
+                covered, neg_words = best[start]
+                candidate = (covered + i - start, neg_words - 1)
+                if candidate > best[i]:
+                    best[i], back[i] = candidate, (start, value)
+
+        segments: List[Tuple[int, int, Any]] = []
+        i = n
+        while i > 0:
+            start, value = back[i]
+            if start < 0:
+                i -= 1
+            else:
+                segments.append((start, i, value))
+                i = start
+        segments.reverse()
+        return segments
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import functools
 import json
+import logging
 import os
 import re
 import sys
@@ -12,9 +14,20 @@ sys.path.insert(0, str(Path(__file__).parent))
 # Disable PaddleOCR model source check to prevent startup hang/timeout
 os.environ["PADDLE_PDX_DISABLE_MODEL_SOURCE_CHECK"] = "True"
 
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, Response, g, render_template, request, redirect, url_for, flash, jsonify, stream_with_context
 
-from gb_verifier import verify_gb_standards
+from app_logging import configure_logging, get_logger, new_request_id, reset_request_id, set_request_id
+
+from gb_verifier import apply_standard_change, refresh_standard, verify_gb_standards
+from gb_verifier.jobs import (
+    format_validity_result,
+    iter_job_events,
+    job_exists,
+    read_job_events,
+    stale_reason,
+    start_gb_validity_job,
+)
+from gb_verifier.report_store import build_gb_issues, compute_report_id, load_report, save_report
 from package_image_processor import process_package_image
 from fastgpt_client import query_inspection_items
 from ragflow_client import get_ragflow_client  # 新增RAGFlow检索客户端
@@ -23,10 +36,12 @@ from field_extractor import (
     extract_gb_standards,
     extract_gb_standards_with_title,
     extract_inspection_items,
+    extract_method_standards,
     extract_production_date,
 )
 from ocr_engine import get_ocr_engine
 from pdf_reader import parse_pdf
+from verification_pipeline import run_stages
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent  # Go up to PDFInfExtraction directory
@@ -39,16 +54,40 @@ app = Flask(__name__,
             static_folder=str(BASE_DIR / "static"))
 app.secret_key = "change-me-in-production"
 
+configure_logging()
+logger = get_logger(__name__)
+
+
+@app.before_request
+def _bind_request_id():
+    # 请求 ID: 沿用上游（网关/调用方）传入的 X-Request-ID，否则新生成；同一请求内所有模块的日志都带上它
+    g.request_id = request.headers.get("X-Request-ID") or new_request_id()
+    g.request_id_token = set_request_id(g.request_id)
+
+
+@app.after_request
+def _add_request_id_header(response):
+    if "request_id" in g:
+        response.headers["X-Request-ID"] = g.request_id
+    return response
+
+
+@app.teardown_request
+def _unbind_request_id(exc):
+    token = g.pop("request_id_token", None)
+    if token is not None:
+        reset_request_id(token)
+
 
 def process_single_file(file_storage, ocr_engine):
     """处理单个上传的PDF文件，返回检测结果和状态"""
     safe_name = Path(file_storage.filename).name
     save_path = UPLOAD_DIR / safe_name
     file_storage.save(save_path)
-    print(f"[DEBUG] Started processing file: {safe_name}", flush=True)
+    logger.info("Started processing file: %s", safe_name)
 
     report = parse_pdf(str(save_path), ocr_engine=ocr_engine)
-    print(f"[DEBUG] PDF Parsed. Keys: {list(report.keys()) if report else 'None'}", flush=True)
+    logger.debug("PDF Parsed. Keys: %s", list(report.keys()) if report else None)
 
     food_name = extract_food_name(report)
     production_date = extract_production_date(report)
@@ -56,11 +95,8 @@ def process_single_file(file_storage, ocr_engine):
     gb_detail = extract_gb_standards_with_title(report)
     items = extract_inspection_items(report)
     
-    print(f"[DEBUG] Extracted Info:", flush=True)
-    print(f"  - Food Name: {food_name}", flush=True)
-    print(f"  - Prod Date: {production_date}", flush=True)
-    print(f"  - GB Codes : {gb_codes}", flush=True)
-    print(f"  - Items Count: {len(items) if items else 0}", flush=True)
+    logger.info("Extracted Info: food=%s, production_date=%s, gb_codes=%s, items=%d",
+                food_name, production_date, gb_codes, len(items) if items else 0)
 
     # 简单的问题检测逻辑：检查必填字段是否缺失
     issues = []
@@ -73,10 +109,6 @@ def process_single_file(file_storage, ocr_engine):
     if not items:
         issues.append("未检测到检验项目表格")
 
-    # 验证国标有效性（如果有生产日期和国标编号）
-    gb_validation_results = {}
-    ragflow_verification = {}  # 新增 RAGFlow 验证结果
-
     # 加载配置
     config_path = BASE_DIR / "config.local.json"
     config = {}
@@ -84,93 +116,57 @@ def process_single_file(file_storage, ocr_engine):
         with open(config_path, "r", encoding="utf-8") as f:
             config = json.load(f)
 
+    # 外部核验阶段只依赖提取结果，同时启动，总耗时约为最慢的阶段
+    stages = {}
     if production_date and gb_codes:
-        try:
-            gb_validation_results = verify_gb_standards(
-                gb_codes=gb_codes,
-                production_date=production_date,
-                config_path=str(config_path),
-                enable_screenshot=True,  # 自动启用截图
-                enable_download=True     # 自动启用下载
-            )
-            print(f"[DEBUG] GB Validation Results: {json.dumps(gb_validation_results, ensure_ascii=False)[:500]}...", flush=True)
-            
-            # 检查是否有国标验证失败
-            failed_gb_codes = []
-            for code, validation in gb_validation_results.items():
-                if not validation.get("passed", False):
-                    failed_gb_codes.append(code)
-            
-            if failed_gb_codes:
-                issues.append(f"国标验证失败: {', '.join(failed_gb_codes)}")
-                
-            
-            # 2. 提取并验证检测方法中的标准
-            if items:
-                method_codes = set()
-                import re
-                gb_regex = re.compile(r"GB(?:/T)?\s*\d+(?:\.\d+)?\s*[—\-‑–－]\s*\d{4}")
-                
-                for item in items:
-                    method_str = item.get("method", "")
-                    if method_str:
-                         # 提取标准号
-                         matches = gb_regex.findall(method_str)
-                         for code in matches:
-                             # 清理标准号中的换行符和多余空格
-                             clean_code = re.sub(r'\s+', ' ', code).strip()
-                             method_codes.add(clean_code)
-                
-                if method_codes:
-                    # 过滤掉已经验证过的
-                    new_codes = [c for c in method_codes if c not in gb_validation_results]
-                    if new_codes:
-                        print(f"验证检测方法标准: {new_codes}")
-                        method_results = verify_gb_standards(
-                            gb_codes=new_codes,
-                            production_date=production_date,
-                            config_path=str(config_path),
-                            enable_screenshot=True,  # 方法标准也自动截图
-                            enable_download=True     # 方法标准也自动下载
-                        )
-                        # 合并结果
-                        gb_validation_results.update(method_results)
-                        
-                        # 检查方法标准是否有效
-                        for code, validation in method_results.items():
-                            if not validation.get("passed", False):
-                                status_text = validation.get("status_text", "未知")
-                                issues.append(f"检测方法标准 {code} 无效 ({status_text})")
-
-        except Exception as e:
-            # 验证失败不影响基本功能
-            print(f"国标验证失败: {e}")
-            
-            # 新增: RAGFlow 检验项目合规性验证
+        # 报告国标 + 检测方法标准合并为一批验证，问题由 build_gb_issues 按报告国标/方法标准区分
+        method_codes = [c for c in extract_method_standards(items) if c not in gb_codes]
+        if method_codes:
+            logger.info("验证检测方法标准: %s", method_codes)
+        stages["gb"] = functools.partial(
+            verify_gb_standards,
+            gb_codes=list(gb_codes) + method_codes,
+            production_date=production_date,
+            config_path=str(config_path),
+            enable_screenshot=True,  # 自动启用截图
+            enable_download=True     # 自动启用下载
+        )
     if food_name and items:
-        try:
+        # RAGFlow 检验项目合规性验证
+        def _verify_compliance():
             from ragflow_verifier import verify_inspection_compliance
-            print(f"正在进行 RAGFlow 合规性验证: {food_name}")
-            ragflow_verification = verify_inspection_compliance(
+            logger.info("正在进行 RAGFlow 合规性验证: %s", food_name)
+            return verify_inspection_compliance(
                 food_name=food_name,
                 report_items=items,
                 report_gb_codes=gb_codes,  # 传入提取的标准号列表
                 config=config
             )
-            print(f"[DEBUG] RAGFlow Verification Status: {ragflow_verification.get('status')}", flush=True)
-            if ragflow_verification.get('issues'):
-                 print(f"[DEBUG] RAGFlow Issues: {ragflow_verification.get('issues')}", flush=True)
-            
-            # 将 RAGFlow 发现的问题添加到总 issues 中
-            if ragflow_verification.get("status") == "fail":
-                 rag_issues = ragflow_verification.get("issues", [])
-                 for issue in rag_issues:
-                     issues.append(f"[合规性] {issue}")
-                     
-        except Exception as e:
-            print(f"RAGFlow 验证失败: {e}")
-            import traceback
-            traceback.print_exc()
+        stages["ragflow"] = _verify_compliance
+    stage_results = run_stages(stages)
+
+    # 验证国标有效性（如果有生产日期和国标编号）
+    gb_validation_results = {}
+    if "gb" in stage_results:
+        # 验证失败不影响基本功能（异常已在 run_stages 中记录）
+        gb_validation_results = stage_results["gb"].value or {}
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("GB Validation Results: %.500s...", json.dumps(gb_validation_results, ensure_ascii=False))
+        # 检查报告国标和检测方法标准是否有效
+        issues.extend(build_gb_issues(gb_codes, gb_validation_results))
+
+    ragflow_verification = {}  # RAGFlow 验证结果
+    if "ragflow" in stage_results:
+        ragflow_verification = stage_results["ragflow"].value or {}
+        logger.info("RAGFlow Verification Status: %s", ragflow_verification.get('status'))
+        if ragflow_verification.get('issues'):
+             logger.debug("RAGFlow Issues: %s", ragflow_verification.get('issues'))
+
+        # 将 RAGFlow 发现的问题添加到总 issues 中
+        if ragflow_verification.get("status") == "fail":
+             rag_issues = ragflow_verification.get("issues", [])
+             for issue in rag_issues:
+                 issues.append(f"[合规性] {issue}")
 
     
     summary = {
@@ -195,7 +191,9 @@ def process_single_file(file_storage, ocr_engine):
 
     pdf_url = url_for("static", filename=f"uploads/{safe_name}")
 
-    return {
+    report_id = compute_report_id(save_path)
+    result = {
+        "report_id": report_id,
         "filename": safe_name,
         "pdf_url": pdf_url,
         "summary": summary,
@@ -205,6 +203,14 @@ def process_single_file(file_storage, ocr_engine):
         "status": "error" if issues else "success",
     }
 
+    # 持久化结果并更新国标 -> 报告反向索引，供标准状态变化时增量重验证
+    try:
+        save_report(report_id, result)
+    except Exception as e:
+        logger.warning("保存报告验证结果失败: %s", e)
+
+    return result
+
 
 @app.route("/api/upload_package_image", methods=["POST"])
 def upload_package_image():
@@ -374,15 +380,15 @@ def upload_label_info():
         # Perform OCR processing
         package_info = {}
         try:
-            print(f"Processing label image for OCR: {save_path}")
+            logger.info("Processing label image for OCR: %s", save_path)
             ocr_engine = get_ocr_engine()
             package_info = process_package_image(str(save_path), ocr_engine)
-            print(f"OCR Success. Extracted: {package_info.keys()}")
-            print(f"Product Type: {package_info.get('product_type')}, Standard: {package_info.get('standard_code')}")
+            logger.info(
+                "OCR Success. Product Type: %s, Standard: %s",
+                package_info.get("product_type"), package_info.get("standard_code"),
+            )
         except Exception as e:
-            print(f"Error processing package image: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error processing package image: %s", e)
             package_info = {"raw_text": f"Error: {str(e)}"}
         
         return jsonify({
@@ -508,7 +514,7 @@ def ragflow_query_inspection_items():
                 config = json.load(f)
         else:
             config = {}
-            print(f"配置文件未找到: {config_path}")
+            logger.warning("配置文件未找到: %s", config_path)
 
         # 获取RAGFlow客户端
         ragflow_client = get_ragflow_client(config)
@@ -740,10 +746,62 @@ def ragflow_query_standard_indicators():
         }), 500
 
 
+@app.route("/api/ragflow/bump_kb_version", methods=["POST"])
+def ragflow_bump_kb_version():
+    """
+    知识库重新索引后调用，使该知识库的检索结果缓存失效
+
+    输入:
+    {
+        "dataset_id": "95dec9ddff4d11f0bc3e0242ac120006",
+        "version": "2025-06-01"     // 可选，默认使用当前时间
+    }
+    """
+    try:
+        data = request.get_json() or {}
+        dataset_id = data.get('dataset_id')
+        if not dataset_id:
+            return jsonify({
+                "success": False,
+                "error": "缺少 dataset_id"
+            }), 400
+
+        config_path = BASE_DIR / "config.local.json"
+        if config_path.exists():
+            with open(config_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        else:
+            config = {}
+
+        ragflow_client = get_ragflow_client(config)
+        if not ragflow_client or not ragflow_client.cache:
+            return jsonify({
+                "success": False,
+                "error": "RAGFlow 检索缓存未启用"
+            }), 400
+
+        version = ragflow_client.bump_dataset_version(dataset_id, data.get('version'))
+        return jsonify({
+            "success": True,
+            "data": {
+                "dataset_id": dataset_id,
+                "version": version,
+                "cache": ragflow_client.cache.stats()
+            }
+        })
+
+    except Exception as e:
+        import traceback
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "traceback": traceback.format_exc()
+        }), 500
+
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     if request.method == "POST":
-        print("[DEBUG] Received POST request at /", flush=True)
         files = request.files.getlist("pdfs")
         if not files or all(f.filename == "" for f in files):
             flash("请至少选择一个 PDF 文件。", "error")
@@ -760,7 +818,6 @@ def index():
             return redirect(url_for("index"))
 
         # 初始化OCR引擎（只初始化一次）
-        print("[DEBUG] Initializing OCR engine...", flush=True)
         ocr_engine = get_ocr_engine()
 
         # 批量处理所有文件
@@ -787,7 +844,6 @@ def index():
             results_json=json.dumps(results, ensure_ascii=False),
         )
 
-    print(f"[DEBUG] Received {request.method} request at /", flush=True)
     return render_template("index.html")
 
 
@@ -878,21 +934,7 @@ def check_gb_validity():
         )
         
         # 格式化返回结果
-        results = []
-        for code, result in validation_results.items():
-            results.append({
-                "code": code,
-                "status": result.get("status", "unknown"),
-                "status_text": result.get("status_text", "未知"),
-                "passed": result.get("passed", False),
-                "publish_date": result.get("publish_date"),
-                "implement_date": result.get("implement_date"),
-                "abolish_date": result.get("abolish_date"),
-                "detail_url": result.get("detail_url"),
-                "screenshot_path": result.get("screenshot_path"),
-                "download_path": result.get("download_path"),
-                "reasons": result.get("reasons", []),
-            })
+        results = [format_validity_result(code, result) for code, result in validation_results.items()]
         
         return jsonify({"results": results})
     
@@ -904,8 +946,228 @@ def check_gb_validity():
         }), 500
 
 
+@app.route("/api/check_gb_validity/jobs", methods=["POST"])
+def create_gb_validity_job():
+    """
+    提交 GB 标准有效性验证任务（异步），立即返回任务 ID
+
+    请求格式同 /api/check_gb_validity。
+
+    返回格式：
+    {
+        "job_id": "3f2c...",
+        "total": 3,
+        "events_url": "/api/check_gb_validity/jobs/3f2c.../events"
+    }
+
+    之后通过 events_url 流式获取逐条结果：
+      - 默认 NDJSON（application/x-ndjson），每行一个事件
+      - ?format=sse 返回 Server-Sent Events，事件 id 即 seq，可用 Last-Event-ID 续传
+      - ?cursor=N 从序号 N 开始续传（断线重连时传入已收到的最后 seq + 1）
+    事件类型：started / result / error / done，result 事件的 result 字段格式同
+    /api/check_gb_validity 的 results 元素。
+    """
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "Invalid JSON"}), 400
+
+        gb_codes = data.get("gb_codes", [])
+        if not gb_codes:
+            return jsonify({"error": "Missing gb_codes"}), 400
+
+        job_id = start_gb_validity_job(
+            gb_codes=gb_codes,
+            production_date=data.get("production_date", "2025-01-01"),
+            config_path=str(BASE_DIR / "config.local.json"),
+            enable_screenshot=data.get("enable_screenshot", False),
+            enable_download=data.get("enable_download", False),
+        )
+
+        return jsonify({
+            "job_id": job_id,
+            "total": len(set(gb_codes)),
+            "events_url": url_for("gb_validity_job_events", job_id=job_id),
+        }), 202
+
+    except Exception as e:
+        import traceback
+        return jsonify({
+            "error": str(e),
+            "traceback": traceback.format_exc()
+        }), 500
+
+
+@app.route("/api/check_gb_validity/jobs/<job_id>", methods=["GET"])
+def get_gb_validity_job(job_id):
+    """获取任务当前已有的全部结果（不等待），用于轮询或断线后一次性补齐"""
+    if not job_exists(job_id):
+        return jsonify({"error": "任务不存在或已过期"}), 404
+
+    events = read_job_events(job_id)
+    results = [ev["result"] for ev in events if ev.get("type") == "result"]
+    started = next((ev for ev in events if ev.get("type") == "started"), {})
+    done = any(ev.get("type") == "done" for ev in events)
+    # 执行任务的 worker 已退出时不会再有 done 事件，按中断结束
+    error = None if done else stale_reason(job_id, started)
+    return jsonify({
+        "job_id": job_id,
+        "done": done or error is not None,
+        "error": error,
+        "total": started.get("total"),
+        "results": results,
+        "next_cursor": (events[-1]["seq"] + 1) if events else 0,
+    })
+
+
+@app.route("/api/check_gb_validity/jobs/<job_id>/events", methods=["GET"])
+def gb_validity_job_events(job_id):
+    """流式返回任务事件（NDJSON 或 SSE），支持从 cursor / Last-Event-ID 续传"""
+    if not job_exists(job_id):
+        return jsonify({"error": "任务不存在或已过期"}), 404
+
+    fmt = request.args.get("format", "ndjson")
+    cursor = request.args.get("cursor", type=int)
+    if cursor is None:
+        last_event_id = request.headers.get("Last-Event-ID")
+        cursor = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+
+    def generate_ndjson():
+        for ev in iter_job_events(job_id, cursor=cursor):
+            if ev is None:
+                yield "\n"  # 心跳
+                continue
+            yield json.dumps(ev, ensure_ascii=False) + "\n"
+
+    def generate_sse():
+        yield "retry: 2000\n\n"
+        for ev in iter_job_events(job_id, cursor=cursor):
+            if ev is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {ev['seq']}\nevent: {ev.get('type', 'message')}\ndata: {json.dumps(ev, ensure_ascii=False)}\n\n"
+
+    if fmt == "sse":
+        body, mimetype = generate_sse(), "text/event-stream"
+    else:
+        body, mimetype = generate_ndjson(), "application/x-ndjson"
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/bulk_audit", methods=["POST"])
+def bulk_audit():
+    """
+    批量复核历史 (国标号, 生产日期) 组合，流式返回 CSV
+
+    请求：multipart 上传 CSV 文件（字段名 file），至少包含 code、production_date 两列，
+    其余列原样透传。可选表单参数 code_column / date_column 指定列名。
+
+    返回：text/csv，在输入列之后追加 passed、status、implement_date、
+    before_implement_date 等判定列（见 gb_verifier.bulk_audit.RESULT_COLUMNS）。
+    """
+    from gb_verifier.bulk_audit import DEFAULT_CATALOG_FILE, get_catalog, stream_csv
+
+    try:
+        if 'file' not in request.files:
+            return jsonify({"success": False, "error": "未提供文件"}), 400
+
+        catalog_path = BASE_DIR / DEFAULT_CATALOG_FILE
+        if not catalog_path.exists():
+            return jsonify({"success": False, "error": "标准目录不存在，请先执行国标验证"}), 500
+        catalog = get_catalog(catalog_path)
+
+        code_column = request.form.get("code_column", "code")
+        date_column = request.form.get("date_column", "production_date")
+
+        import io
+        upload = request.files['file']
+        text_stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+
+        # 表头在开始流式响应之前校验，缺列时返回 400（响应开始后的异常只能得到半截 CSV）
+        try:
+            csv_chunks = stream_csv(catalog, text_stream, code_column, date_column)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        return Response(
+            stream_with_context(csv_chunks),
+            mimetype="text/csv",
+            headers={"Content-Disposition": "attachment; filename=bulk_audit.csv"},
+        )
+
+    except Exception as e:
+        import traceback
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "traceback": traceback.format_exc()
+        }), 500
+
+
+@app.route("/api/reverify_standard", methods=["POST"])
+def reverify_standard_api():
+    """
+    国标状态变化后，增量重验证引用该国标的历史报告（不重新 OCR / RAG）
+
+    请求格式：
+    {
+        "gb_code": "GB 2763-2021",
+        "standard_info": {              // 可选，不提供则重新抓取最新状态
+            "status": "已废止",
+            "implement_date": "2021-09-03",
+            "abolish_date": "2025-08-01"
+        }
+    }
+
+    返回格式：
+    {
+        "gb_code": "GB 2763-2021",
+        "affected": 12,                 // 引用该国标的报告数
+        "updated": ["<report_id>", ...],  // 结果发生变化的报告
+        "cache_updated": 3
+    }
+    """
+    try:
+        data = request.get_json()
+        if not data or not data.get("gb_code"):
+            return jsonify({"error": "Missing gb_code"}), 400
+
+        gb_code = data["gb_code"]
+        standard_info = data.get("standard_info")
+
+        if standard_info:
+            result = apply_standard_change(gb_code, standard_info)
+        else:
+            result = refresh_standard(gb_code, config_path=str(BASE_DIR / "config.local.json"))
+
+        if result.get("error"):
+            return jsonify(result), 500
+        return jsonify(result)
+
+    except Exception as e:
+        import traceback
+        return jsonify({
+            "error": str(e),
+            "traceback": traceback.format_exc()
+        }), 500
+
+
+@app.route("/api/reports/<report_id>", methods=["GET"])
+def get_report(report_id):
+    """获取已持久化的报告验证结果（包含增量重验证后的最新状态）"""
+    record = load_report(Path(report_id).name)
+    if not record:
+        return jsonify({"success": False, "error": "报告不存在"}), 404
+    return jsonify({"success": True, "data": record})
+
+
 if __name__ == "__main__":
     # Force port 5002 to avoid conflict
     port = int(os.environ.get("PORT", 5002))
-    print(f"[DEBUG] Starting Flask server on port {port}...", flush=True)
+    logger.info("Starting Flask server on port %d", port)
     app.run(host="0.0.0.0", port=port, debug=True)
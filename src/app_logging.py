@@ -0,0 +1,221 @@
+"""
+请求级结构化日志
+
+核验链路（ragflow_verifier / ragflow_client / html_table_parser / gb_verifier）原来用 print 输出调试信息，
+每个 chunk、每行、每个项目都有几行，gunicorn 下一份报告就是上千次无缓冲的 stdout 写入。
+这里统一成标准库 logging：
+
+- 按级别过滤: logger.debug("...%s", x) 在级别之下只做一次整数比较，参数不格式化
+  （需要额外计算的参数先判断 logger.isEnabledFor(logging.DEBUG)）
+- 请求/追踪 ID: request_context() 把 ID 放进 contextvars，同一请求内所有模块的日志都带上它；
+  线程池中执行的任务用 bind_context() 包装后继承调用方的 ID
+- 异步写出: 业务线程只把日志记录放进队列（QueueHandler），由后台 QueueListener 线程写控制台/文件
+  （gunicorn preload_app 时在 master 中配置；fork 出的 worker 中用新的队列重新启动写出线程）
+
+环境变量:
+    LOG_LEVEL   DEBUG / INFO / WARNING（默认 INFO）
+    LOG_FORMAT  text（默认）/ json（每行一个 JSON 对象）
+    LOG_FILE    额外写入的日志文件（默认不写文件）
+
+gb_verifier 的国标核验记录（INFO 及以上）另外写入 gb_verify.log，与原来的内容一致。
+"""
+from __future__ import annotations
+
+import atexit
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+# 所有业务模块的 logger 都挂在这个名字下面，统一配置级别和输出
+ROOT_LOGGER_NAME = "checker"
+DEFAULT_LEVEL = "INFO"
+# 模块名前缀 -> 单独的日志文件（只写 INFO 及以上）
+MODULE_LOG_FILES = {"gb_verifier": "gb_verify.log"}
+
+_request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+
+_configure_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+def current_request_id() -> str:
+    return _request_id.get()
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def set_request_id(request_id: str) -> contextvars.Token:
+    """设置当前请求 ID，返回的 token 交给 reset_request_id 恢复（Flask before/teardown_request 用）"""
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token: contextvars.Token) -> None:
+    _request_id.reset(token)
+
+
+@contextlib.contextmanager
+def request_context(request_id: Optional[str] = None) -> Iterator[str]:
+    """在 with 块内设置当前请求 ID（未指定时生成一个），退出时恢复"""
+    request_id = request_id or new_request_id()
+    token = set_request_id(request_id)
+    try:
+        yield request_id
+    finally:
+        reset_request_id(token)
+
+
+def bind_context(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """包装提交到线程池的函数，让它在调用方的上下文（请求 ID）中执行"""
+    ctx = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return ctx.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+class _RequestIdFilter(logging.Filter):
+    """在业务线程中（入队之前）给日志记录补上请求 ID 和模块名（去掉 "checker." 前缀）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        record.module_name = record.name.split(".", 1)[-1]
+        return True
+
+
+class _ModuleFilter(logging.Filter):
+    def __init__(self, prefix: str):
+        super().__init__()
+        self.prefix = prefix
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        name = getattr(record, "module_name", "")
+        return name == self.prefix or name.startswith(self.prefix + ".")
+
+
+def _text_formatter() -> logging.Formatter:
+    return logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(module_name)s: %(message)s")
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "request_id": getattr(record, "request_id", "-"),
+            "logger": getattr(record, "module_name", record.name),
+            "msg": record.getMessage(),
+        }
+        # logger.info("...", extra={"fields": {...}}) 附加的结构化字段
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    log_file: Optional[str] = None,
+    fmt: Optional[str] = None,
+) -> logging.Logger:
+    """
+    配置日志输出（可重复调用，后一次覆盖前一次）
+
+    参数为 None 时读取环境变量 LOG_LEVEL / LOG_FILE / LOG_FORMAT
+    """
+    global _listener, _queue_handler
+    level = (level or os.environ.get("LOG_LEVEL") or DEFAULT_LEVEL).upper()
+    log_file = log_file if log_file is not None else os.environ.get("LOG_FILE")
+    fmt = (fmt or os.environ.get("LOG_FORMAT") or "text").lower()
+
+    formatter = _JsonFormatter() if fmt == "json" else _text_formatter()
+    handlers: list = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+        handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    for prefix, path in MODULE_LOG_FILES.items():
+        # delay=True: 没有对应模块的日志时不创建文件
+        handler = logging.FileHandler(path, encoding="utf-8", delay=True)
+        handler.setLevel(logging.INFO)
+        handler.addFilter(_ModuleFilter(prefix))
+        handler.setFormatter(formatter)
+        handlers.append(handler)
+
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(_RequestIdFilter())
+        root.addHandler(queue_handler)
+        _queue_handler = queue_handler
+        root.setLevel(getattr(logging, level, logging.INFO))
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+    return root
+
+
+def _restart_listener_in_child() -> None:
+    """
+    fork 之后子进程中只有调用 fork 的线程，父进程的写出线程不存在，记录会一直留在队列里。
+    这里换一个新队列（父进程的队列锁可能在 fork 时被写出线程持有）并重新启动写出线程
+    """
+    global _configure_lock, _listener
+    _configure_lock = threading.Lock()
+    if _listener is None or _queue_handler is None:
+        return
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
+
+
+def shutdown_logging() -> None:
+    """停止后台写出线程（写完队列中剩余的日志）"""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    模块 logger: get_logger(__name__)
+
+    第一次使用时按环境变量完成默认配置，单独运行脚本/模块时也能输出
+    """
+    if _listener is None and not logging.getLogger(ROOT_LOGGER_NAME).handlers:
+        configure_logging()
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
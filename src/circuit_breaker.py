@@ -0,0 +1,224 @@
+"""
+熔断器 + 重试预算
+
+RAGFlow / FastGPT 不可用时，原来每次检索最多等 60 秒再重试两次（固定 sleep 2 秒），
+一个报告几十次检索会一直挂到 gunicorn 杀掉 worker。这里提供：
+
+- CircuitBreaker: 按接口地址区分，连续失败 N 次后熔断（open），之后直接快速失败；
+  冷却 recovery_timeout_s 秒后进入半开（half_open），放行少量探测请求，成功则恢复
+- RetryBudget: 单次请求的总预算（最多尝试次数 + 总耗时上限）
+- call_with_retry: 指数退避 + 抖动（full jitter）重试，每次尝试的超时不超过剩余预算
+  （async_call_with_retry 为协程版本）
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求未发出"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} 熔断中，{retry_after:.0f} 秒后重试")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class RetryableError(Exception):
+    """可重试的失败（如 HTTP 5xx），会计入熔断器失败次数"""
+
+
+class CircuitBreaker:
+    """线程安全的熔断器"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        recovery_timeout_s: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout_s = recovery_timeout_s
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout_s:
+            self._state = HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def is_open(self) -> bool:
+        """熔断中（冷却期内）返回 True；半开状态视为可用"""
+        return self.state == OPEN
+
+    def before_call(self) -> None:
+        """请求前调用，不允许请求时抛出 CircuitOpenError"""
+        with self._lock:
+            state = self._current_state()
+            if state == OPEN:
+                retry_after = self.recovery_timeout_s - (time.monotonic() - self._opened_at)
+                raise CircuitOpenError(self.name, max(retry_after, 0))
+            if state == HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    raise CircuitOpenError(self.name, self.recovery_timeout_s)
+                self._half_open_calls += 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("熔断器 %s 恢复", self.name)
+            self._state = CLOSED
+            self._failures = 0
+            self._half_open_calls = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            state = self._current_state()
+            self._failures += 1
+            if state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if state != OPEN:
+                    logger.warning(
+                        "熔断器 %s 连续失败 %d 次，熔断 %.0f 秒", self.name, self._failures, self.recovery_timeout_s,
+                    )
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._half_open_calls = 0
+
+
+@dataclass
+class RetryBudget:
+    """单次请求的重试预算"""
+    max_attempts: int = 3
+    deadline_s: float = 75.0      # 包含所有尝试和退避等待的总耗时上限
+    base_delay_s: float = 0.5
+    max_delay_s: float = 4.0
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次失败后的等待时间（full jitter）"""
+        return random.uniform(0, min(self.max_delay_s, self.base_delay_s * (2 ** attempt)))
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, **kwargs: Any) -> CircuitBreaker:
+    """按接口名获取（或创建）熔断器，同一接口在进程内共享"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, **kwargs)
+            _breakers[name] = breaker
+        return breaker
+
+
+def call_with_retry(
+    fn: Callable[[float], Any],
+    breaker: CircuitBreaker,
+    budget: Optional[RetryBudget] = None,
+    retry_on: Tuple[Type[BaseException], ...] = (RetryableError,),
+    max_attempt_timeout_s: float = 60.0,
+) -> Any:
+    """
+    在熔断器保护下调用 fn(timeout)，失败时指数退避重试
+
+    :param fn: 实际请求，参数为本次尝试可用的超时时间（秒）
+    :param retry_on: 视为可重试失败的异常类型（计入熔断器）；其他异常直接抛出且不计入
+    :raises CircuitOpenError: 熔断中
+    :raises: 预算耗尽时抛出最后一次失败的异常
+    """
+    budget = budget or RetryBudget()
+    deadline = time.monotonic() + budget.deadline_s
+    attempt = 0
+
+    while True:
+        breaker.before_call()
+        remaining = deadline - time.monotonic()
+        try:
+            result = fn(max(min(max_attempt_timeout_s, remaining), 1.0))
+        except retry_on as e:
+            breaker.record_failure()
+            attempt += 1
+            if attempt >= budget.max_attempts:
+                logger.warning("%s 请求失败，已达到最大尝试次数: %s", breaker.name, e)
+                raise
+            delay = budget.backoff(attempt)
+            if time.monotonic() + delay + 1.0 >= deadline:
+                logger.warning("%s 请求失败，重试预算耗尽: %s", breaker.name, e)
+                raise
+            logger.info(
+                "%s 请求失败，%.1f 秒后重试 (%d/%d): %s", breaker.name, delay, attempt, budget.max_attempts - 1, e,
+            )
+            time.sleep(delay)
+            continue
+        except Exception:
+            # 其他异常说明接口有响应（如返回内容无法解析），不计入熔断失败
+            breaker.record_success()
+            raise
+        breaker.record_success()
+        return result
+
+
+async def async_call_with_retry(
+    fn: Callable[[float], Awaitable[Any]],
+    breaker: CircuitBreaker,
+    budget: Optional[RetryBudget] = None,
+    retry_on: Tuple[Type[BaseException], ...] = (RetryableError,),
+    max_attempt_timeout_s: float = 60.0,
+) -> Any:
+    """call_with_retry 的协程版本（退避使用 asyncio.sleep，不阻塞事件循环）"""
+    budget = budget or RetryBudget()
+    deadline = time.monotonic() + budget.deadline_s
+    attempt = 0
+
+    while True:
+        breaker.before_call()
+        remaining = deadline - time.monotonic()
+        try:
+            result = await fn(max(min(max_attempt_timeout_s, remaining), 1.0))
+        except retry_on as e:
+            breaker.record_failure()
+            attempt += 1
+            if attempt >= budget.max_attempts:
+                logger.warning("%s 请求失败，已达到最大尝试次数: %s", breaker.name, e)
+                raise
+            delay = budget.backoff(attempt)
+            if time.monotonic() + delay + 1.0 >= deadline:
+                logger.warning("%s 请求失败，重试预算耗尽: %s", breaker.name, e)
+                raise
+            logger.info(
+                "%s 请求失败，%.1f 秒后重试 (%d/%d): %s", breaker.name, delay, attempt, budget.max_attempts - 1, e,
+            )
+            await asyncio.sleep(delay)
+            continue
+        except Exception:
+            breaker.record_success()
+            raise
+        breaker.record_success()
+        return result
@@ -11,6 +11,11 @@ import requests
 from typing import Any, Optional
 from pathlib import Path
 
+from circuit_breaker import CircuitOpenError, RetryableError, RetryBudget, call_with_retry, get_breaker
+
+
+CONNECT_TIMEOUT_S = 5
+
 
 class FastGPTClient:
     """FastGPT 知识库客户端"""
@@ -23,6 +28,9 @@ class FastGPTClient:
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
+        # 同一接口地址共享熔断器；FastGPT 只作辅助查询，预算比 RAGFlow 更紧
+        self.breaker = get_breaker(f"FastGPT {api_base}")
+        self.retry_budget = RetryBudget(max_attempts=2, deadline_s=40)
     
     def search(self, query: str, limit: int = 10, similarity: float = 0.1) -> dict[str, Any]:
         """
@@ -44,12 +52,24 @@ class FastGPTClient:
             "similarity": similarity
         }
         
-        try:
+        def _post(timeout: float) -> requests.Response:
             response = requests.post(
                 search_url, 
                 json=payload, 
                 headers=self.headers, 
-                timeout=30
+                timeout=(min(CONNECT_TIMEOUT_S, timeout), timeout)
+            )
+            if response.status_code >= 500:
+                raise RetryableError(f"HTTP {response.status_code}")
+            return response
+
+        try:
+            response = call_with_retry(
+                _post,
+                self.breaker,
+                self.retry_budget,
+                retry_on=(RetryableError, requests.exceptions.ConnectionError, requests.exceptions.Timeout),
+                max_attempt_timeout_s=30,
             )
             
             if response.status_code == 200:
@@ -59,6 +79,10 @@ class FastGPTClient:
                     "error": f"请求失败: {response.status_code}",
                     "message": response.text[:200]
                 }
+        except CircuitOpenError as e:
+            return {"error": f"服务暂不可用: {e}"}
+        except RetryableError as e:
+            return {"error": f"请求失败: {e}"}
         except requests.exceptions.Timeout:
             return {"error": "请求超时"}
         except requests.exceptions.ConnectionError:
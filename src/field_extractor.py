@@ -306,3 +306,20 @@ def extract_inspection_items(report: Dict[str, Any]) -> List[Dict[str, Any]]:
             break
 
     return items
+
+
+def extract_method_standards(items: List[Dict[str, Any]]) -> List[str]:
+    """从检验项目的检测方法列中提取 GB 标准号
+
+    返回去重后的标准号列表，按在表格中出现的顺序排列（标准号中的换行、多余空格压缩为一个空格）。
+    """
+    standards: List[str] = []
+    seen = set()
+    for item in items or []:
+        method = item.get("method") or ""
+        for match in GB_REGEX.findall(method):
+            value = re.sub(r"\s+", " ", match).strip()
+            if value and value not in seen:
+                seen.add(value)
+                standards.append(value)
+    return standards
@@ -11,16 +11,22 @@ import time
 import traceback
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Callable, Optional
+
+from app_logging import bind_context, get_logger
 
 # Updated imports to use the local gb_verifier package (relative imports)
 from .config import load_mcp_url
+from .mcp_cache import get_default_cache
 from .runner import run_smoke, fetch_and_update_from_detail_page
 from .test_input import extract_gb_number
 from .validate import validate_standard_for_production_date
 from .screenshot import screenshot_detail_page
 from .download import download_standard_from_html
+from .report_store import canonical_gb_code, entry_to_standard_info, reverify_standard
+
 
+logger = get_logger(__name__)
 
 CACHE_DIR = Path("static/cache")
 CACHE_FILE = CACHE_DIR / "gb_verification.json"
@@ -40,25 +46,62 @@ def _save_cache(cache: dict):
         with open(CACHE_FILE, "w", encoding="utf-8") as f:
             json.dump(cache, f, ensure_ascii=False, indent=2)
     except Exception as e:
-        print(f"Failed to save cache: {e}")
+        logger.warning("Failed to save cache: %s", e)
 
 def _get_cache_key(gb_code: str, production_date: str) -> str:
     return f"{gb_code}_{production_date}"
 
+def build_validation_entry(
+    parsed: dict[str, Any],
+    production_date: str,
+    screenshot_path: Optional[str] = None,
+    download_path: Optional[str] = None,
+) -> dict[str, Any]:
+    """根据标准信息（status/implement_date 等）和生产日期生成单条 gb_validation 结果"""
+    validation_result = validate_standard_for_production_date(
+        production_date=production_date,
+        standard_info=parsed
+    )
+
+    return {
+        "passed": validation_result.passed,
+        "status": "valid" if validation_result.passed else (
+            "obsolete" if parsed.get("status") and "废止" in parsed.get("status", "") else "invalid"
+        ),
+        "status_text": parsed.get("status") or "未知",
+        "publish_date": parsed.get("publish_date"),
+        "implement_date": parsed.get("implement_date"),
+        "abolish_date": parsed.get("abolish_date"),
+        "detail_url": parsed.get("foodmate_detail_page_url"),
+        "screenshot_path": screenshot_path,
+        "download_path": download_path,
+        "reasons": validation_result.reasons,
+        "error": None,
+        "timestamp": time.time() # 记录缓存时间
+    }
+
 def _verify_single_code_logic(
     gb_code: str,
     production_date: str,
     mcp_url: str,
     enable_screenshot: bool,
-    enable_download: bool
+    enable_download: bool,
+    refresh: bool = False,
 ) -> dict:
-    """内部函数：执行单个 GB 标准的验证逻辑（无缓存读取，但包含结果生成）"""
+    """
+    内部函数：执行单个 GB 标准的验证逻辑（无缓存读取，但包含结果生成）
+
+    refresh: 强制重新请求 Tavily（跳过 MCP 响应缓存，并用新响应覆盖缓存）
+    """
     try:
         # 提取 GB 编号
         gb_number = extract_gb_number(gb_code)
         
         # 调用验证逻辑 (Tavily Search)
-        out, parsed = run_smoke(mcp_url, gb_number=gb_number)
+        cache = get_default_cache()
+        if refresh and cache is not None:
+            cache = cache.refreshing()
+        out, parsed = run_smoke(mcp_url, gb_number=gb_number, cache=cache)
         
         # 如果 Tavily 没找到详情页 URL，尝试本地搜索
         if not parsed.get("foodmate_detail_page_url"):
@@ -66,7 +109,7 @@ def _verify_single_code_logic(
             local_url = search_gb_detail_url(gb_number)
             if local_url:
                 parsed["foodmate_detail_page_url"] = local_url
-                print(f"Local fallback found URL for {gb_number}: {local_url}")
+                logger.info("Local fallback found URL for %s: %s", gb_number, local_url)
         
         detail_url = parsed.get("foodmate_detail_page_url")
         screenshot_path = None
@@ -103,7 +146,7 @@ def _verify_single_code_logic(
                             # 转换为相对于 static 的路径，供前端访问 (必须以 / 开头)
                             screenshot_path = "/" + ss_path.replace(os.sep, "/")
                         else:
-                            print(f"详情页截图失败: {ss_err}")
+                            logger.warning("详情页截图失败: %s", ss_err)
 
                     # 下载功能
                     if enable_download and html_content:
@@ -121,39 +164,22 @@ def _verify_single_code_logic(
                             # 转换为相对于 static 的路径
                             download_path = "/" + dl_path.replace(os.sep, "/")
                         else:
-                            print(f"标准下载失败: {dl_err}")
+                            logger.warning("标准下载失败: %s", dl_err)
 
                 elif error_msg:
-                    print(f"Warning: Failed to fetch detail page for {gb_code}: {error_msg}")
+                    logger.warning("Failed to fetch detail page for %s: %s", gb_code, error_msg)
                     
         except Exception as e:
-            print(f"Warning: Error fetching detail page for {gb_code}: {str(e)}")
-            traceback.print_exc()
+            logger.warning("Error fetching detail page for %s: %s", gb_code, e, exc_info=True)
         
-        # 执行校验
-        validation_result = validate_standard_for_production_date(
-            production_date=production_date,
-            standard_info=parsed
+        # 执行校验并格式化结果
+        return build_validation_entry(
+            parsed,
+            production_date,
+            screenshot_path=screenshot_path,
+            download_path=download_path,
         )
         
-        # 格式化结果
-        return {
-            "passed": validation_result.passed,
-            "status": "valid" if validation_result.passed else (
-                "obsolete" if parsed.get("status") and "废止" in parsed.get("status", "") else "invalid"
-            ),
-            "status_text": parsed.get("status") or "未知",
-            "publish_date": parsed.get("publish_date"),
-            "implement_date": parsed.get("implement_date"),
-            "abolish_date": parsed.get("abolish_date"),
-            "detail_url": parsed.get("foodmate_detail_page_url"),
-            "screenshot_path": screenshot_path,
-            "download_path": download_path,
-            "reasons": validation_result.reasons,
-            "error": None,
-            "timestamp": time.time() # 记录缓存时间
-        }
-        
     except Exception as e:
         return {
             "passed": False,
@@ -170,17 +196,29 @@ def verify_gb_standards(
     mcp_url: Optional[str] = None,
     config_path: str = "config.local.json",
     enable_screenshot: bool = False,
-    enable_download: bool = False
+    enable_download: bool = False,
+    on_result: Optional[Callable[[str, dict[str, Any]], None]] = None
 ) -> dict[str, dict[str, Any]]:
     """
     批量验证国标有效性 (并行 + 缓存)
+
+    on_result: 可选回调 (code, result)，每个国标得到结果（含缓存命中）后立即调用，
+               用于流式返回逐条结果
     """
+    def _emit(code: str, res: dict[str, Any]) -> None:
+        if on_result is None:
+            return
+        try:
+            on_result(code, res)
+        except Exception as e:
+            logger.warning("on_result callback failed for %s: %s", code, e)
+
     # 加载 MCP URL
     if not mcp_url:
         mcp_url = load_mcp_url(None, config_path)
     
     if not mcp_url:
-        return {
+        results = {
             code: {
                 "passed": False,
                 "status": "unknown",
@@ -190,11 +228,14 @@ def verify_gb_standards(
             }
             for code in gb_codes
         }
+        for code, res in results.items():
+            _emit(code, res)
+        return results
     
     results = {}
     codes_to_fetch = []
     
-    print(f"DEBUG: verify_gb_standards called with {len(gb_codes)} codes")
+    logger.debug("verify_gb_standards called with %d codes", len(gb_codes))
     
     # 1. 检查缓存
     cache = _load_cache()
@@ -206,21 +247,20 @@ def verify_gb_standards(
         cached_result = cache.get(key)
         
         if cached_result and (current_time - cached_result.get("timestamp", 0) < CACHE_TTL):
-            print(f"DEBUG: Cache hit for {code}")
+            logger.debug("Cache hit for %s", code)
             results[code] = cached_result
+            _emit(code, cached_result)
             # 如果缓存里没有 screenshot_path 但现在要求截图，可能需要重新跑？
             # 简化起见，如果缓存有效直接用。如果用户强行要新截图，怎么处理？
             # 暂时认为缓存优先。
         else:
-            print(f"DEBUG: Cache miss for {code}, scheduling fetch")
+            logger.debug("Cache miss for %s, scheduling fetch", code)
             codes_to_fetch.append(code)
             
     # 2. 并行处理未缓存的项目
     if codes_to_fetch:
-        print(f"Verifying {len(codes_to_fetch)} standards (parallel)...")
-        # log to file
-        with open("gb_verify.log", "a") as logf:
-            logf.write(f"[{time.ctime()}] Verifying: {codes_to_fetch}\n")
+        # INFO 及以上的记录同时写入 gb_verify.log（app_logging.MODULE_LOG_FILES）
+        logger.info("Verifying %d standards (parallel): %s", len(codes_to_fetch), codes_to_fetch)
             
         new_results = {}
         
@@ -228,7 +268,7 @@ def verify_gb_standards(
         with ThreadPoolExecutor(max_workers=2) as executor:
             future_to_code = {
                 executor.submit(
-                    _verify_single_code_logic, 
+                    bind_context(_verify_single_code_logic), 
                     code, 
                     production_date, 
                     mcp_url, 
@@ -244,14 +284,10 @@ def verify_gb_standards(
                     res = future.result()
                     new_results[code] = res
                     results[code] = res
-                    print(f"DEBUG: Finished verifying {code}, result: {res.get('status')}")
-                    with open("gb_verify.log", "a") as logf:
-                        logf.write(f"[{time.ctime()}] Finished {code}: {res.get('status')}\n")
+                    logger.info("Finished %s: %s", code, res.get('status'))
+                    _emit(code, res)
                 except Exception as e:
-                    print(f"Error verifying {code}: {e}")
-                    traceback.print_exc()
-                    with open("gb_verify.log", "a") as logf:
-                        logf.write(f"[{time.ctime()}] Error {code}: {e}\n{traceback.format_exc()}\n")
+                    logger.error("Error verifying %s: %s", code, e, exc_info=True)
                     results[code] = {
                         "passed": False,
                         "status": "error",
@@ -259,6 +295,7 @@ def verify_gb_standards(
                         "reasons": [str(e)],
                         "error": traceback.format_exc()
                     }
+                    _emit(code, results[code])
         
         # 3. 更新缓存
         if new_results:
@@ -296,3 +333,57 @@ def verify_single_gb(
         "reasons": ["未知错误"],
         "error": "No result returned"
     })
+
+
+def apply_standard_change(gb_code: str, standard_info: dict[str, Any]) -> dict[str, Any]:
+    """
+    标准状态变化后的增量处理：
+      1) 更新验证缓存中该国标（所有生产日期）的条目
+      2) 根据反向索引重算引用该国标的历史报告（不重新 OCR / RAG）
+    """
+    target = canonical_gb_code(gb_code)
+
+    cache = _load_cache()
+    cache_updated = 0
+    for key, entry in list(cache.items()):
+        code, _, production_date = key.rpartition("_")
+        if not code or canonical_gb_code(code) != target:
+            continue
+        cache[key] = build_validation_entry(
+            standard_info,
+            production_date,
+            screenshot_path=entry.get("screenshot_path"),
+            download_path=entry.get("download_path"),
+        )
+        cache_updated += 1
+    if cache_updated:
+        _save_cache(cache)
+
+    result = reverify_standard(gb_code, standard_info)
+    result["cache_updated"] = cache_updated
+    return result
+
+
+def refresh_standard(
+    gb_code: str,
+    mcp_url: Optional[str] = None,
+    config_path: str = "config.local.json",
+) -> dict[str, Any]:
+    """
+    重新抓取单个国标的最新状态，如有变化则触发增量重验证
+    """
+    if not mcp_url:
+        mcp_url = load_mcp_url(None, config_path)
+    if not mcp_url:
+        return {"gb_code": canonical_gb_code(gb_code), "error": "未配置 Tavily MCP URL"}
+
+    # 生产日期只影响 passed 判断，这里只需要标准本身的信息
+    # refresh=True: 不能用 MCP 响应缓存中（最长 TTL 6 小时）的旧结果覆盖报告
+    entry = _verify_single_code_logic(gb_code, time.strftime("%Y-%m-%d"), mcp_url, False, False, refresh=True)
+    if entry.get("status") == "error":
+        return {"gb_code": canonical_gb_code(gb_code), "error": entry.get("reasons")}
+
+    standard_info = entry_to_standard_info(entry)
+    result = apply_standard_change(gb_code, standard_info)
+    result["standard_info"] = standard_info
+    return result
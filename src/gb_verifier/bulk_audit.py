@@ -0,0 +1,448 @@
+"""
+批量复核：对大量历史 (国标号, 生产日期) 组合执行与 validate_standard_for_production_date 相同的校验
+
+标准目录（状态、实施日期）只加载一次，之后按块把国标号映射为目录下标、生产日期转为
+datetime64 数组，用布尔掩码一次性完成整块判定，结果流式写出为 CSV 或 Parquet。
+
+用法:
+    python -m gb_verifier.bulk_audit pairs.csv -o audit.csv
+    python -m gb_verifier.bulk_audit pairs.csv -o audit.parquet --format parquet
+
+输入 CSV 至少包含 code / production_date 两列（列名可通过参数修改），其余列原样透传。
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+
+from .report_store import canonical_gb_code
+from .validate import is_currently_effective, parse_flexible_date
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+DEFAULT_CATALOG_FILE = Path("static/cache/gb_verification.json")
+DEFAULT_CHUNK_SIZE = 200_000
+
+NAT = np.datetime64("NaT", "D")
+
+# 实施日期状态
+IMPL_OK = 0
+IMPL_MISSING = 1
+IMPL_INVALID = 2
+
+RESULT_COLUMNS = [
+    "passed",
+    "status",
+    "implement_date",
+    "abolish_date",
+    "unknown_standard",
+    "invalid_production_date",
+    "not_effective",
+    "missing_implement_date",
+    "invalid_implement_date",
+    "before_implement_date",
+    "abolished_before_production",
+]
+
+
+def _to_day(value: Optional[str]) -> tuple[np.datetime64, int]:
+    if not isinstance(value, str) or not value.strip():
+        return NAT, IMPL_MISSING
+    try:
+        return np.datetime64(parse_flexible_date(value), "D"), IMPL_OK
+    except ValueError:
+        return NAT, IMPL_INVALID
+
+
+@dataclass(frozen=True)
+class StandardsCatalog:
+    """按规范化国标号组织的标准目录（列式存储）"""
+    index: dict[str, int]
+    status: np.ndarray          # object, 原始状态文本
+    effective: np.ndarray       # bool, is_currently_effective(status)
+    implement_date: np.ndarray  # datetime64[D], 缺失/无法解析为 NaT
+    implement_state: np.ndarray  # int8, IMPL_OK / IMPL_MISSING / IMPL_INVALID
+    abolish_date: np.ndarray    # datetime64[D]
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @classmethod
+    def from_records(cls, records: dict[str, dict[str, Any]]) -> "StandardsCatalog":
+        """records: 国标号 -> {"status", "implement_date", "abolish_date"}"""
+        index: dict[str, int] = {}
+        status, effective, impl, impl_state, abolish = [], [], [], [], []
+        for code, info in records.items():
+            key = canonical_gb_code(code)
+            if not key or key in index:
+                continue
+            index[key] = len(status)
+            st = info.get("status")
+            status.append(st)
+            effective.append(is_currently_effective(st))
+            d, state = _to_day(info.get("implement_date"))
+            impl.append(d)
+            impl_state.append(state)
+            abolish.append(_to_day(info.get("abolish_date"))[0])
+
+        return cls(
+            index=index,
+            status=np.array(status, dtype=object),
+            effective=np.array(effective, dtype=bool),
+            implement_date=np.array(impl, dtype="datetime64[D]"),
+            implement_state=np.array(impl_state, dtype=np.int8),
+            abolish_date=np.array(abolish, dtype="datetime64[D]"),
+        )
+
+
+def load_catalog(path: str | Path = DEFAULT_CATALOG_FILE) -> StandardsCatalog:
+    """
+    加载标准目录
+
+    支持两种格式：
+      - gb_verification.json 验证缓存（键为 "<国标号>_<生产日期>"，同一国标取最新的一条）
+      - 目录文件：{"GB 2763-2021": {"status": ..., "implement_date": ..., "abolish_date": ...}, ...}
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+
+    latest: dict[str, tuple[float, dict[str, Any]]] = {}
+    for key, entry in (raw or {}).items():
+        if not isinstance(entry, dict):
+            continue
+        if "status_text" in entry:
+            # 验证缓存条目
+            code = key.rpartition("_")[0] or key
+            if entry.get("status") == "error":
+                continue
+            status_text = entry.get("status_text")
+            info = {
+                "status": status_text if status_text and status_text != "未知" else None,
+                "implement_date": entry.get("implement_date"),
+                "abolish_date": entry.get("abolish_date"),
+            }
+            ts = entry.get("timestamp", 0) or 0
+        else:
+            code, info, ts = key, entry, 0
+
+        canonical = canonical_gb_code(code)
+        if canonical not in latest or ts >= latest[canonical][0]:
+            latest[canonical] = (ts, info)
+
+    return StandardsCatalog.from_records({code: info for code, (_, info) in latest.items()})
+
+
+_catalog_cache: dict[str, tuple[float, StandardsCatalog]] = {}
+
+
+def get_catalog(path: str | Path = DEFAULT_CATALOG_FILE) -> StandardsCatalog:
+    """进程内复用已加载的目录，文件更新后自动重新加载"""
+    key = str(path)
+    mtime = Path(path).stat().st_mtime
+    cached = _catalog_cache.get(key)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    catalog = load_catalog(path)
+    _catalog_cache[key] = (mtime, catalog)
+    return catalog
+
+
+def _parse_production_dates(values: Sequence[str]) -> np.ndarray:
+    """生产日期 -> datetime64[D]，同一日期字符串只解析一次"""
+    arr = np.asarray(values, dtype=object)
+    if arr.size == 0:
+        return np.array([], dtype="datetime64[D]")
+    uniq, inverse = np.unique(arr.astype(str), return_inverse=True)
+    parsed = np.array([_to_day(u)[0] if u else NAT for u in uniq], dtype="datetime64[D]")
+    return parsed[inverse]
+
+
+def audit_pairs(
+    catalog: StandardsCatalog,
+    codes: Sequence[str],
+    production_dates: Sequence[str],
+) -> dict[str, np.ndarray]:
+    """
+    对一批 (国标号, 生产日期) 执行向量化校验
+
+    判定规则与 validate_standard_for_production_date 一致：
+      passed = 状态现行有效 且 实施日期可解析 且 生产日期 >= 实施日期
+    另外给出 abolished_before_production（生产日期晚于废止日期）供审计参考，不影响 passed。
+    """
+    n = len(codes)
+    code_arr = np.asarray(codes, dtype=object)
+    uniq, inverse = np.unique(code_arr.astype(str), return_inverse=True)
+    uniq_idx = np.array([catalog.index.get(canonical_gb_code(c), -1) for c in uniq], dtype=np.int64)
+    idx = uniq_idx[inverse] if n else np.array([], dtype=np.int64)
+
+    known = idx >= 0
+    safe_idx = np.where(known, idx, 0)
+    if len(catalog) == 0:
+        # 空目录：全部视为未知标准
+        empty_days = np.full(n, NAT, dtype="datetime64[D]")
+        effective = np.zeros(n, dtype=bool)
+        impl = empty_days
+        impl_state = np.full(n, IMPL_MISSING, dtype=np.int8)
+        abolish = empty_days
+        status = np.full(n, None, dtype=object)
+    else:
+        effective = catalog.effective[safe_idx] & known
+        impl = np.where(known, catalog.implement_date[safe_idx], NAT)
+        impl_state = np.where(known, catalog.implement_state[safe_idx], IMPL_MISSING)
+        abolish = np.where(known, catalog.abolish_date[safe_idx], NAT)
+        status = np.where(known, catalog.status[safe_idx], None)
+
+    prod = _parse_production_dates(production_dates)
+    invalid_prod = np.isnat(prod)
+
+    not_effective = ~effective
+    missing_impl = impl_state == IMPL_MISSING
+    invalid_impl = impl_state == IMPL_INVALID
+    # NaT 参与比较结果恒为 False
+    before_impl = prod < impl
+    abolished_before = prod > abolish
+
+    passed = ~(not_effective | missing_impl | invalid_impl | before_impl | invalid_prod)
+
+    return {
+        "passed": passed,
+        "status": status,
+        "implement_date": impl,
+        "abolish_date": abolish,
+        "unknown_standard": ~known,
+        "invalid_production_date": invalid_prod,
+        "not_effective": not_effective,
+        "missing_implement_date": missing_impl,
+        "invalid_implement_date": invalid_impl,
+        "before_implement_date": before_impl,
+        "abolished_before_production": abolished_before,
+    }
+
+
+def check_columns(header: Sequence[str], code_column: str, date_column: str) -> tuple[int, int]:
+    """返回国标号列、生产日期列的下标；缺少时抛出 ValueError"""
+    try:
+        return header.index(code_column), header.index(date_column)
+    except ValueError:
+        raise ValueError(f"输入缺少列: {code_column} / {date_column}（现有列: {list(header)}）")
+
+
+def read_csv_header(
+    stream: Iterable[str],
+    code_column: str = "code",
+    date_column: str = "production_date",
+) -> tuple[list[str], Iterator[list[str]]]:
+    """
+    读取并校验表头，返回 (表头, 剩余行的 csv.reader)
+
+    流式响应开始之前调用，缺列时调用方可以直接返回 400，而不是输出半截 CSV
+    """
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("输入为空")
+    check_columns(header, code_column, date_column)
+    return header, reader
+
+
+def iter_csv_chunks(
+    stream: Iterable[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    header: Optional[list[str]] = None,
+) -> Iterator[tuple[list[str], list[list[str]]]]:
+    """
+    按块读取 CSV，返回 (表头, 行列表)
+
+    header: 已由 read_csv_header 读出表头时传入，此时 stream 为剩余行的 reader
+    """
+    if header is None:
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return
+    else:
+        reader = stream
+    chunk: list[list[str]] = []
+    for row in reader:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield header, chunk
+            chunk = []
+    if chunk:
+        yield header, chunk
+
+
+def _column_as_text(values: np.ndarray) -> list[str]:
+    if values.dtype.kind == "M":
+        return ["" if np.isnat(v) else str(v) for v in values]
+    if values.dtype.kind == "b":
+        return np.where(values, "1", "0").tolist()
+    return ["" if v is None else str(v) for v in values]
+
+
+def audit_csv_chunks(
+    catalog: StandardsCatalog,
+    chunks: Iterable[tuple[list[str], list[list[str]]]],
+    code_column: str = "code",
+    date_column: str = "production_date",
+) -> Iterator[tuple[list[str], list[list[str]]]]:
+    """对 CSV 块逐块校验，返回 (输出表头, 输出行)"""
+    for header, rows in chunks:
+        ci, di = check_columns(header, code_column, date_column)
+        codes = [r[ci] if ci < len(r) else "" for r in rows]
+        dates = [r[di] if di < len(r) else "" for r in rows]
+        result = audit_pairs(catalog, codes, dates)
+
+        columns = [_column_as_text(result[c]) for c in RESULT_COLUMNS]
+        # 短行补齐到表头长度，判定列才能对齐
+        width = len(header)
+        out_rows = [
+            list(row) + [""] * (width - len(row)) + [col[i] for col in columns]
+            for i, row in enumerate(rows)
+        ]
+        yield header + RESULT_COLUMNS, out_rows
+
+
+def stream_csv(
+    catalog: StandardsCatalog,
+    stream: Iterable[str],
+    code_column: str = "code",
+    date_column: str = "production_date",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[str]:
+    """
+    逐块产生 CSV 文本（用于 HTTP 流式响应）
+
+    表头在调用时立即读取并校验（缺列时直接抛出 ValueError），之后的读取和校验在迭代时进行
+    """
+    header, reader = read_csv_header(stream, code_column, date_column)
+    chunks = iter_csv_chunks(reader, chunk_size, header=header)
+    return _iter_csv_text(audit_csv_chunks(catalog, chunks, code_column, date_column))
+
+
+def _iter_csv_text(chunks: Iterable[tuple[list[str], list[list[str]]]]) -> Iterator[str]:
+    first = True
+    for header, rows in chunks:
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if first:
+            writer.writerow(header)
+            first = False
+        writer.writerows(rows)
+        yield buf.getvalue()
+
+
+def _result_arrow_types() -> dict:
+    if not PYARROW_AVAILABLE:
+        return {}
+    return {
+        "status": pa.string(),
+        "implement_date": pa.date32(),
+        "abolish_date": pa.date32(),
+    }
+
+
+# 判定列的 Parquet 类型，未列出的均为布尔
+_RESULT_ARROW_TYPES = _result_arrow_types()
+
+
+def write_parquet(
+    catalog: StandardsCatalog,
+    stream: Iterable[str],
+    out_path: str | Path,
+    code_column: str = "code",
+    date_column: str = "production_date",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """逐块写出 Parquet（需要 pyarrow），返回行数"""
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("Parquet 输出需要 pyarrow，请运行: pip install pyarrow")
+
+    header, reader = read_csv_header(stream, code_column, date_column)
+    ci, di = check_columns(header, code_column, date_column)
+    # 固定的 schema：不能取第一块推断的类型（某一块的 status/日期列全为空时会推断成 null 类型）
+    schema = pa.schema(
+        [(h, pa.string()) for h in header]
+        + [(c, _RESULT_ARROW_TYPES.get(c, pa.bool_())) for c in RESULT_COLUMNS]
+    )
+
+    writer = pq.ParquetWriter(str(out_path), schema)
+    total = 0
+    try:
+        for _, rows in iter_csv_chunks(reader, chunk_size, header=header):
+            codes = [r[ci] if ci < len(r) else "" for r in rows]
+            dates = [r[di] if di < len(r) else "" for r in rows]
+            result = audit_pairs(catalog, codes, dates)
+
+            data = {h: [r[i] if i < len(r) else None for r in rows] for i, h in enumerate(header)}
+            for c in RESULT_COLUMNS:
+                values = result[c]
+                data[c] = values.tolist() if values.dtype.kind != "O" else list(values)
+            writer.write_table(pa.table(data, schema=schema))
+            total += len(rows)
+    finally:
+        writer.close()
+    return total
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="批量复核历史报告的 (国标号, 生产日期) 组合")
+    parser.add_argument("input", help="输入 CSV 文件，'-' 表示标准输入")
+    parser.add_argument("-o", "--output", default="-", help="输出文件，默认标准输出")
+    parser.add_argument("--format", choices=["csv", "parquet"], default=None, help="输出格式（默认按扩展名判断）")
+    parser.add_argument("--catalog", default=str(DEFAULT_CATALOG_FILE), help="标准目录（验证缓存或目录 JSON）")
+    parser.add_argument("--code-column", default="code")
+    parser.add_argument("--date-column", default="production_date")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("parquet" if str(args.output).endswith(".parquet") else "csv")
+
+    start = time.time()
+    catalog = load_catalog(args.catalog)
+    print(f"标准目录: {len(catalog)} 个国标 ({time.time() - start:.2f}s)", file=sys.stderr)
+
+    in_stream = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "parquet":
+            if args.output == "-":
+                raise SystemExit("Parquet 输出需要指定 -o 文件路径")
+            total = write_parquet(catalog, in_stream, args.output, args.code_column, args.date_column, args.chunk_size)
+        else:
+            out_stream = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+            writer = csv.writer(out_stream)
+            total = 0
+            try:
+                chunks = iter_csv_chunks(in_stream, args.chunk_size)
+                for header, rows in audit_csv_chunks(catalog, chunks, args.code_column, args.date_column):
+                    if total == 0:
+                        writer.writerow(header)
+                    writer.writerows(rows)
+                    total += len(rows)
+            finally:
+                if out_stream is not sys.stdout:
+                    out_stream.close()
+    finally:
+        if in_stream is not sys.stdin:
+            in_stream.close()
+
+    print(f"完成: {total} 行 ({time.time() - start:.2f}s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,10 @@ import re
 import urllib.request
 from typing import Optional
 
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
 
 def fetch_detail_page_content(url: str, timeout: int = 30) -> str:
     """
@@ -50,7 +54,7 @@ def fetch_detail_page_content(url: str, timeout: int = 30) -> str:
             return content
             
     except Exception as e:
-        print(f"Error fetching {url} with Playwright: {e}")
+        logger.warning("Error fetching %s with Playwright: %s", url, e)
         raise
 
 
@@ -179,7 +183,7 @@ def search_gb_detail_url(gb_number: str) -> Optional[str]:
 
     
     search_url = f"https://down.foodmate.net/standard/search.php?kw={gb_number}"
-    print(f"Searching locally (Playwright): {search_url}")
+    logger.info("Searching locally (Playwright): %s", search_url)
     
     try:
         from playwright.sync_api import sync_playwright
@@ -205,5 +209,5 @@ def search_gb_detail_url(gb_number: str) -> Optional[str]:
         return None
         
     except Exception as e:
-        print(f"Local search failed for {gb_number}: {e}")
+        logger.warning("Local search failed for %s: %s", gb_number, e)
         return None
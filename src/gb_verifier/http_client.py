@@ -1,50 +1,18 @@
 from __future__ import annotations
 
+import base64
+import http.client
 import json
-import urllib.error
+import threading
+import urllib.parse
 import urllib.request
-from typing import Any, Iterable, Optional
+from typing import Any, Iterable, Iterator, Optional
 
 
-def http_json(
-    url: str,
-    payload: dict[str, Any],
-    headers: Optional[dict[str, str]] = None,
-    timeout_s: int = 60,
-) -> tuple[int, dict[str, Any]]:
-    """
-    POST JSON and parse JSON body; if body isn't JSON, return a dict with _raw/_content_type.
+# 提前返回时读取剩余响应体的最长等待（秒），超过则丢弃连接
+DRAIN_TIMEOUT_S = 0.2
 
-    Tavily MCP requires Accept: application/json, text/event-stream
-    """
-    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-    req = urllib.request.Request(url, data=data, method="POST")
-    req.add_header("Content-Type", "application/json; charset=utf-8")
-    req.add_header("Accept", "application/json, text/event-stream")
-    # Add User-Agent to avoid 403 and mimic browser
-    req.add_header("User-Agent", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-    
-    if headers:
-        for k, v in headers.items():
-            req.add_header(k, v)
-    try:
-        with urllib.request.urlopen(req, timeout=timeout_s) as resp:
-            raw = resp.read().decode("utf-8", errors="replace")
-            content_type = resp.headers.get("Content-Type", "")
-            try:
-                return resp.getcode(), json.loads(raw)
-            except Exception as e:
-                return resp.getcode(), {
-                    "_raw": raw,
-                    "_content_type": content_type,
-                    "_json_parse_error": str(e),
-                }
-    except urllib.error.HTTPError as e:
-        raw = e.read().decode("utf-8", errors="replace")
-        try:
-            return e.code, json.loads(raw)
-        except Exception:
-            return e.code, {"_raw": raw, "_content_type": e.headers.get("Content-Type", "")}
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 
 
 def http_stream_lines(url: str, timeout_s: int = 60, headers: Optional[dict[str, str]] = None) -> Iterable[str]:
@@ -62,3 +30,254 @@ def http_stream_lines(url: str, timeout_s: int = 60, headers: Optional[dict[str,
             if not line:
                 break
             yield line.decode("utf-8", errors="replace").rstrip("\n")
+
+
+def _proxy_for(parsed: urllib.parse.SplitResult) -> Optional[urllib.parse.SplitResult]:
+    """按 HTTP(S)_PROXY / NO_PROXY 环境变量（与 urllib 相同的规则）返回代理地址，不走代理时返回 None"""
+    scheme = parsed.scheme or "http"
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(parsed.hostname or ""):
+        return None
+    if "://" not in proxy:
+        proxy = f"http://{proxy}"
+    return urllib.parse.urlsplit(proxy)
+
+
+def _proxy_headers(proxy: urllib.parse.SplitResult) -> dict[str, str]:
+    if proxy.username is None:
+        return {}
+    userinfo = f"{urllib.parse.unquote(proxy.username)}:{urllib.parse.unquote(proxy.password or '')}"
+    return {"Proxy-Authorization": "Basic " + base64.b64encode(userinfo.encode("utf-8")).decode("ascii")}
+
+
+def _request_target(parsed: urllib.parse.SplitResult, proxy: Optional[urllib.parse.SplitResult]) -> str:
+    """请求行中的目标：直连/HTTPS 隧道用路径，经 HTTP 代理转发明文请求时用完整 URL"""
+    if proxy is not None and (parsed.scheme or "http") == "http":
+        return urllib.parse.urlunsplit(parsed._replace(fragment=""))
+    path = parsed.path or "/"
+    if parsed.query:
+        path = f"{path}?{parsed.query}"
+    return path
+
+
+class _ConnectionPool:
+    """
+    按 (scheme, host, port) 复用 keep-alive 连接
+
+    http.client 连接不能被多个线程同时使用，因此每个线程各自持有一组连接
+    （verify_gb_standards 的线程池是固定大小的，连接数有上界）。
+    配置了代理时，HTTPS 通过 CONNECT 隧道（set_tunnel），HTTP 直接连到代理。
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    def _conns(self) -> dict[tuple[str, str, int], http.client.HTTPConnection]:
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = {}
+            self._local.conns = conns
+        return conns
+
+    @staticmethod
+    def _key(parsed: urllib.parse.SplitResult) -> tuple[str, str, int]:
+        scheme = parsed.scheme or "http"
+        port = parsed.port or (443 if scheme == "https" else 80)
+        return (scheme, parsed.hostname or "", port)
+
+    def get(
+        self,
+        parsed: urllib.parse.SplitResult,
+        timeout_s: float,
+        proxy: Optional[urllib.parse.SplitResult] = None,
+    ) -> tuple[http.client.HTTPConnection, bool]:
+        """返回 (连接, 是否为复用的连接)"""
+        key = self._key(parsed)
+        scheme, host, port = key
+        conns = self._conns()
+        conn = conns.get(key)
+        if conn is not None:
+            conn.timeout = timeout_s
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout_s)
+            return conn, True
+        if proxy is not None:
+            proxy_port = proxy.port or (443 if proxy.scheme == "https" else 80)
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(proxy.hostname or "", proxy_port, timeout=timeout_s)
+                conn.set_tunnel(host, port, headers=_proxy_headers(proxy))
+            else:
+                conn = http.client.HTTPConnection(proxy.hostname or "", proxy_port, timeout=timeout_s)
+        elif scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout_s)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout_s)
+        conns[key] = conn
+        return conn, False
+
+    def discard(self, parsed: urllib.parse.SplitResult) -> None:
+        conn = self._conns().pop(self._key(parsed), None)
+        if conn is not None:
+            conn.close()
+
+
+_pool = _ConnectionPool()
+
+
+def iter_sse_messages(lines: Iterable[str]) -> Iterator[dict[str, Any]]:
+    """
+    增量解析 SSE：逐行读取，遇到空行即把该事件的 data: 行合并后解析为 JSON
+
+    非 JSON / 非 dict 的事件被忽略；流结束时未以空行结尾的最后一个事件也会被解析。
+    """
+    data_lines: list[str] = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line:
+            if data_lines:
+                obj = _parse_sse_data(data_lines)
+                data_lines = []
+                if obj is not None:
+                    yield obj
+            continue
+        if line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+    if data_lines:
+        obj = _parse_sse_data(data_lines)
+        if obj is not None:
+            yield obj
+
+
+def _parse_sse_data(data_lines: list[str]) -> Optional[dict[str, Any]]:
+    data = "\n".join(data_lines).strip()
+    if not data:
+        return None
+    try:
+        obj = json.loads(data)
+    except Exception:
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+def _iter_response_lines(resp: http.client.HTTPResponse, raw_parts: list[str]) -> Iterator[str]:
+    while True:
+        line = resp.readline()
+        if not line:
+            break
+        text = line.decode("utf-8", errors="replace")
+        raw_parts.append(text)
+        yield text
+
+
+def _drain(
+    resp: http.client.HTTPResponse,
+    conn: http.client.HTTPConnection,
+    parsed: urllib.parse.SplitResult,
+) -> None:
+    """
+    读完响应体剩余部分，连接才能继续复用
+
+    只等待 DRAIN_TIMEOUT_S：服务端在返回结果后没有马上结束流时丢弃连接，不阻塞调用方
+    """
+    if resp.isclosed():
+        return
+    if conn.sock is None:
+        resp.close()
+        _pool.discard(parsed)
+        return
+    conn.sock.settimeout(DRAIN_TIMEOUT_S)
+    try:
+        resp.read()
+    except (OSError, http.client.HTTPException):
+        resp.close()
+        _pool.discard(parsed)
+
+
+def http_jsonrpc_stream(
+    url: str,
+    payload: dict[str, Any],
+    headers: Optional[dict[str, str]] = None,
+    timeout_s: int = 120,
+) -> dict[str, Any]:
+    """
+    POST 一个 JSON-RPC 请求，流式读取响应
+
+    - text/event-stream：逐帧解析 data:，收到 id 与请求一致的消息立即返回，不等待整个响应体
+    - application/json：读取完整响应体并解析
+    - 复用线程内的 keep-alive 连接；复用连接失效时自动用新连接重试一次
+    - 遵循 HTTP(S)_PROXY / NO_PROXY 环境变量
+
+    Returns:
+        {"http_status": int, "body": dict, "_transport": "sse" | "json", "_raw"?: str}
+    """
+    parsed = urllib.parse.urlsplit(url)
+    proxy = _proxy_for(parsed)
+    path = _request_target(parsed, proxy)
+
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    req_headers = {
+        "Content-Type": "application/json; charset=utf-8",
+        "Accept": "application/json, text/event-stream",
+        "User-Agent": USER_AGENT,
+        "Connection": "keep-alive",
+    }
+    if proxy is not None and (parsed.scheme or "http") == "http":
+        req_headers.update(_proxy_headers(proxy))
+    if headers:
+        req_headers.update(headers)
+
+    req_id = payload.get("id")
+
+    for attempt in range(2):
+        conn, reused = _pool.get(parsed, timeout_s, proxy)
+        try:
+            conn.request("POST", path, body=body, headers=req_headers)
+            resp = conn.getresponse()
+        except (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                http.client.ResponseNotReady, ConnectionError, BrokenPipeError):
+            _pool.discard(parsed)
+            if reused and attempt == 0:
+                continue  # 服务端已关闭空闲连接，换新连接重试
+            raise
+        except Exception:
+            _pool.discard(parsed)
+            raise
+        break
+
+    try:
+        status = resp.status
+        content_type = resp.getheader("Content-Type", "") or ""
+
+        if "text/event-stream" in content_type:
+            raw_parts: list[str] = []
+            first_msg: Optional[dict[str, Any]] = None
+            for msg in iter_sse_messages(_iter_response_lines(resp, raw_parts)):
+                if first_msg is None:
+                    first_msg = msg
+                if msg.get("id") == req_id:
+                    # 提前返回前把响应体剩余部分（含 chunked 的结束块）读完，连接才能继续复用
+                    _drain(resp, conn, parsed)
+                    return {"http_status": status, "body": msg, "_transport": "sse", "_raw": "".join(raw_parts)}
+            raw = "".join(raw_parts)
+            if first_msg is not None:
+                return {"http_status": status, "body": first_msg, "_transport": "sse", "_raw": raw}
+            return {"http_status": status, "body": {"_raw": raw, "_content_type": content_type}, "_transport": "json"}
+
+        raw = resp.read().decode("utf-8", errors="replace")
+        try:
+            parsed_body: dict[str, Any] = json.loads(raw)
+        except Exception as e:
+            # Content-Type 不准确时仍尝试按 SSE 解析
+            msgs = list(iter_sse_messages(raw.splitlines()))
+            if msgs:
+                match = next((m for m in msgs if m.get("id") == req_id), msgs[0])
+                return {"http_status": status, "body": match, "_transport": "sse", "_raw": raw}
+            parsed_body = {"_raw": raw, "_content_type": content_type, "_json_parse_error": str(e)}
+        return {"http_status": status, "body": parsed_body, "_transport": "json"}
+
+    except Exception:
+        _pool.discard(parsed)
+        raise
+    finally:
+        if resp.getheader("Connection", "").lower() == "close":
+            _pool.discard(parsed)
@@ -0,0 +1,266 @@
+"""
+国标有效性验证的异步任务
+
+提交任务后立即返回 job_id，后台线程逐条验证，每个国标完成后追加一行事件到
+static/cache/jobs/<job_id>.ndjson。事件文件即任务状态，因此：
+  - 任意 gunicorn worker 都可以按 job_id 读取/续传（不依赖进程内存）
+  - 连接断开后客户端带上已收到的 cursor（事件序号）即可从断点继续
+
+事件格式（每行一个 JSON）：
+  {"seq": 0, "type": "started", "job_id": ..., "total": 3, "owner_pid": 123, "owner_host": "..."}
+  {"seq": 1, "type": "result", "code": "GB 2763-2021", "result": {...}}
+  {"seq": 4, "type": "done", "count": 3}
+
+任务线程运行在提交任务的 worker 中。worker 被回收/杀死后任务不会再写 done，因此：
+  - 运行期间每 JOB_HEARTBEAT_S 秒更新一次事件文件的 mtime（心跳）
+  - 读取方发现属主进程已不存在（同一主机）或心跳超过 JOB_STALE_S 秒未更新时，
+    视为任务中断，以 error + done 事件结束（不写入文件）
+  - 事件流的单次长轮询最长 EVENTS_MAX_WAIT_S 秒（远小于 gunicorn timeout），
+    客户端带 cursor / Last-Event-ID 重新连接继续接收
+"""
+from __future__ import annotations
+
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from .report_store import CACHE_DIR
+
+
+JOBS_DIR = CACHE_DIR / "jobs"
+JOB_TTL_SECONDS = 86400  # 任务事件文件保留 24 小时
+JOB_HEARTBEAT_S = 10
+JOB_STALE_S = 60
+# 单次事件流请求的最长等待（gunicorn sync worker timeout 为 300 秒，每个 worker 只有 2 个线程）
+EVENTS_MAX_WAIT_S = 60
+
+_job_locks: dict[str, threading.Lock] = {}
+_job_locks_guard = threading.Lock()
+
+
+def format_validity_result(code: str, result: dict[str, Any]) -> dict[str, Any]:
+    """把 verify_gb_standards 的单条结果转换为 /api/check_gb_validity 的返回格式"""
+    return {
+        "code": code,
+        "status": result.get("status", "unknown"),
+        "status_text": result.get("status_text", "未知"),
+        "passed": result.get("passed", False),
+        "publish_date": result.get("publish_date"),
+        "implement_date": result.get("implement_date"),
+        "abolish_date": result.get("abolish_date"),
+        "detail_url": result.get("detail_url"),
+        "screenshot_path": result.get("screenshot_path"),
+        "download_path": result.get("download_path"),
+        "reasons": result.get("reasons", []),
+    }
+
+
+def _job_path(job_id: str) -> Path:
+    # job_id 来自 URL，只取文件名部分防止路径穿越
+    return JOBS_DIR / f"{Path(job_id).name}.ndjson"
+
+
+def _lock_for(job_id: str) -> threading.Lock:
+    with _job_locks_guard:
+        return _job_locks.setdefault(job_id, threading.Lock())
+
+
+def _append_event(job_id: str, event: dict[str, Any], counter: list[int]) -> None:
+    with _lock_for(job_id):
+        event = {"seq": counter[0], **event}
+        counter[0] += 1
+        with open(_job_path(job_id), "a", encoding="utf-8") as f:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+
+def _cleanup_old_jobs() -> None:
+    if not JOBS_DIR.exists():
+        return
+    cutoff = time.time() - JOB_TTL_SECONDS
+    for p in JOBS_DIR.glob("*.ndjson"):
+        try:
+            if p.stat().st_mtime < cutoff:
+                p.unlink()
+        except OSError:
+            pass
+
+
+def start_gb_validity_job(
+    gb_codes: list[str],
+    production_date: str,
+    config_path: str = "config.local.json",
+    enable_screenshot: bool = False,
+    enable_download: bool = False,
+) -> str:
+    """提交验证任务，立即返回 job_id"""
+    from . import verify_gb_standards
+
+    JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    _cleanup_old_jobs()
+
+    job_id = uuid.uuid4().hex
+    counter = [0]
+    unique_codes = list(dict.fromkeys(gb_codes))
+    _append_event(job_id, {
+        "type": "started",
+        "job_id": job_id,
+        "total": len(unique_codes),
+        "production_date": production_date,
+        "created_at": time.time(),
+        "owner_pid": os.getpid(),
+        "owner_host": socket.gethostname(),
+    }, counter)
+
+    def _on_result(code: str, result: dict[str, Any]) -> None:
+        _append_event(job_id, {"type": "result", "code": code, "result": format_validity_result(code, result)}, counter)
+
+    stop_heartbeat = threading.Event()
+
+    def _heartbeat() -> None:
+        while not stop_heartbeat.wait(JOB_HEARTBEAT_S):
+            try:
+                os.utime(_job_path(job_id))
+            except OSError:
+                pass
+
+    def _run() -> None:
+        try:
+            results = verify_gb_standards(
+                gb_codes=unique_codes,
+                production_date=production_date,
+                config_path=config_path,
+                enable_screenshot=enable_screenshot,
+                enable_download=enable_download,
+                on_result=_on_result,
+            )
+            _append_event(job_id, {"type": "done", "count": len(results)}, counter)
+        except Exception as e:
+            _append_event(job_id, {"type": "error", "error": str(e), "traceback": traceback.format_exc()}, counter)
+            _append_event(job_id, {"type": "done", "count": 0}, counter)
+        finally:
+            stop_heartbeat.set()
+            with _job_locks_guard:
+                _job_locks.pop(job_id, None)
+
+    threading.Thread(target=_heartbeat, name=f"gb-job-hb-{job_id[:8]}", daemon=True).start()
+    threading.Thread(target=_run, name=f"gb-job-{job_id[:8]}", daemon=True).start()
+    return job_id
+
+
+def job_exists(job_id: str) -> bool:
+    return _job_path(job_id).exists()
+
+
+def _owner_alive(started: dict[str, Any]) -> Optional[bool]:
+    """属主进程是否存活；不在本机或无法判断时返回 None"""
+    pid = started.get("owner_pid")
+    if not pid or started.get("owner_host") != socket.gethostname():
+        return None
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # 进程存在但无权限发信号
+    return True
+
+
+def stale_reason(job_id: str, started: Optional[dict[str, Any]]) -> Optional[str]:
+    """未完成的任务是否已中断（属主进程退出或心跳超时），返回原因；仍在运行时返回 None"""
+    if started and _owner_alive(started) is False:
+        return f"任务执行进程 {started.get('owner_pid')} 已退出"
+    try:
+        idle = time.time() - _job_path(job_id).stat().st_mtime
+    except OSError:
+        return "任务事件文件不存在"
+    if idle > JOB_STALE_S:
+        return f"任务心跳已 {int(idle)} 秒未更新"
+    return None
+
+
+def read_job_events(job_id: str, cursor: int = 0) -> list[dict[str, Any]]:
+    """读取 seq >= cursor 的全部已有事件（不等待）"""
+    path = _job_path(job_id)
+    if not path.exists():
+        return []
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break  # 正在写入的半行
+            try:
+                ev = json.loads(line)
+            except ValueError:
+                continue
+            if ev.get("seq", 0) >= cursor:
+                events.append(ev)
+    return events
+
+
+def iter_job_events(
+    job_id: str,
+    cursor: int = 0,
+    poll_interval: float = 0.3,
+    timeout_s: float = EVENTS_MAX_WAIT_S,
+    heartbeat_s: Optional[float] = 15,
+) -> Iterator[Optional[dict[str, Any]]]:
+    """
+    从 cursor 开始持续产出事件，直到 done 事件、任务中断或超时
+
+    长时间无新事件时产出 None 作为心跳（调用方可写出注释行保持连接）。
+    超时返回时任务可能仍在运行，客户端用最后收到的 seq + 1 作为 cursor 重新请求。
+    """
+    path = _job_path(job_id)
+    deadline = time.time() + timeout_s
+    last_emit = time.time()
+    last_stale_check = 0.0
+    offset = 0
+    pending = ""
+    started: Optional[dict[str, Any]] = None
+    next_seq = cursor
+
+    while time.time() < deadline:
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                f.seek(offset)
+                chunk = f.read()
+                offset = f.tell()
+            pending += chunk
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    ev = json.loads(line)
+                except ValueError:
+                    continue
+                if ev.get("type") == "started":
+                    started = ev
+                if ev.get("seq", 0) < cursor:
+                    continue
+                next_seq = ev.get("seq", 0) + 1
+                last_emit = time.time()
+                yield ev
+                if ev.get("type") == "done":
+                    return
+
+        if time.time() - last_stale_check >= JOB_HEARTBEAT_S:
+            last_stale_check = time.time()
+            reason = stale_reason(job_id, started)
+            if reason:
+                yield {"seq": next_seq, "type": "error", "error": reason, "stale": True}
+                yield {"seq": next_seq + 1, "type": "done", "count": 0, "stale": True}
+                return
+
+        if heartbeat_s and time.time() - last_emit >= heartbeat_s:
+            last_emit = time.time()
+            yield None
+        time.sleep(poll_interval)
@@ -0,0 +1,184 @@
+"""
+MCP tools/call 原始响应缓存
+
+键为 (工具名, 规范化参数)，每条缓存一个 JSON 文件：static/cache/mcp/<sha1>.json
+  - 正常模式：TTL 内命中直接返回，未命中才请求 Tavily 并写入缓存
+  - 回放模式 (replay=True)：只读缓存、忽略 TTL、不发起任何网络请求，
+    用于修改 foodmate_extract 的解析规则后离线重跑 run_smoke
+  - 刷新模式 (refresh=True)：tools/call 不读缓存、总是请求 Tavily，并用新响应覆盖缓存，
+    用于 refresh_standard 强制重新抓取标准状态
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from app_logging import get_logger
+
+from .mcp_client import McpConnection, jsonrpc
+from .report_store import CACHE_DIR
+
+logger = get_logger(__name__)
+
+MCP_CACHE_DIR = CACHE_DIR / "mcp"
+DEFAULT_TTL_S = 6 * 3600
+
+# tools/list 不是 tools/call，但回放时同样需要工具列表（build_tool_args 依赖 inputSchema）
+TOOLS_LIST_KEY = "__tools_list__"
+
+_SEARCH_KW_PATTERN = re.compile(r"search\.php\?kw=([^&\s\"']+)")
+
+
+def canonical_arguments(arguments: Optional[dict[str, Any]]) -> str:
+    return json.dumps(arguments or {}, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def cache_key(tool: str, arguments: Optional[dict[str, Any]]) -> str:
+    raw = f"{tool}\n{canonical_arguments(arguments)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _is_cacheable(resp: dict[str, Any]) -> bool:
+    if resp.get("http_status") != 200:
+        return False
+    body = resp.get("body")
+    if not isinstance(body, dict) or body.get("error") is not None:
+        return False
+    result = body.get("result")
+    if not isinstance(result, dict) or result.get("isError"):
+        return False
+    return True
+
+
+class McpResponseCache:
+    """MCP 原始响应缓存（进程间通过文件共享）"""
+
+    def __init__(
+        self,
+        cache_dir: str | Path = MCP_CACHE_DIR,
+        ttl_s: float = DEFAULT_TTL_S,
+        replay: bool = False,
+        refresh: bool = False,
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.ttl_s = ttl_s
+        self.replay = replay
+        self.refresh = refresh and not replay
+        self.hits = 0
+        self.misses = 0
+
+    def refreshing(self) -> "McpResponseCache":
+        """同一缓存目录的刷新模式副本"""
+        return McpResponseCache(self.cache_dir, ttl_s=self.ttl_s, refresh=True)
+
+    def _path(self, tool: str, arguments: Optional[dict[str, Any]]) -> Path:
+        return self.cache_dir / f"{cache_key(tool, arguments)}.json"
+
+    def get(self, tool: str, arguments: Optional[dict[str, Any]]) -> Optional[dict[str, Any]]:
+        path = self._path(tool, arguments)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except Exception:
+            return None
+        if not self.replay and time.time() - entry.get("created_at", 0) > self.ttl_s:
+            return None
+        return entry.get("response")
+
+    def put(self, tool: str, arguments: Optional[dict[str, Any]], response: dict[str, Any]) -> None:
+        if self.replay or not _is_cacheable(response):
+            return
+        # _raw 与 body 内容重复，不落盘
+        stored = {k: v for k, v in response.items() if k != "_raw"}
+        entry = {
+            "tool": tool,
+            "arguments": arguments or {},
+            "created_at": time.time(),
+            "response": stored,
+        }
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self._path(tool, arguments)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning("Failed to save MCP cache: %s", e)
+
+    def _miss_response(self, tool: str) -> dict[str, Any]:
+        return {"http_status": None, "body": {}, "_transport": "replay-miss", "_tool": tool}
+
+    def call_tool(
+        self,
+        get_conn: Optional[Callable[[], McpConnection]],
+        req_id: int,
+        tool: str,
+        arguments: dict[str, Any],
+    ) -> dict[str, Any]:
+        """带缓存的 tools/call；get_conn 仅在未命中时调用（延迟建立连接）"""
+        cached = None if self.refresh else self.get(tool, arguments)
+        if cached is not None:
+            self.hits += 1
+            return {**cached, "_cache": "hit"}
+        self.misses += 1
+        if self.replay or get_conn is None:
+            return self._miss_response(tool)
+        resp = jsonrpc(get_conn(), req_id=req_id, method="tools/call", params={"name": tool, "arguments": arguments})
+        self.put(tool, arguments, resp)
+        return resp
+
+    def list_tools(self, get_conn: Optional[Callable[[], McpConnection]], req_id: int) -> dict[str, Any]:
+        """带缓存的 tools/list"""
+        cached = self.get(TOOLS_LIST_KEY, None)
+        if cached is not None:
+            self.hits += 1
+            return {**cached, "_cache": "hit"}
+        self.misses += 1
+        if self.replay or get_conn is None:
+            return self._miss_response(TOOLS_LIST_KEY)
+        resp = jsonrpc(get_conn(), req_id=req_id, method="tools/list", params={})
+        self.put(TOOLS_LIST_KEY, None, resp)
+        return resp
+
+    def cached_gb_numbers(self) -> list[str]:
+        """从缓存的 tavily_extract 参数（搜索页 URL）中枚举已缓存的国标编号"""
+        numbers: set[str] = set()
+        if not self.cache_dir.exists():
+            return []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except Exception:
+                continue
+            for url in (entry.get("arguments") or {}).get("urls") or []:
+                m = _SEARCH_KW_PATTERN.search(str(url))
+                if m:
+                    numbers.add(m.group(1))
+        return sorted(numbers)
+
+
+_default_cache: Optional[McpResponseCache] = None
+
+
+def get_default_cache() -> Optional[McpResponseCache]:
+    """
+    生产环境默认缓存
+
+    环境变量：MCP_CACHE_TTL_S（秒，默认 6 小时），MCP_CACHE_DISABLED=1 关闭缓存
+    """
+    global _default_cache
+    if os.environ.get("MCP_CACHE_DISABLED") == "1":
+        return None
+    if _default_cache is None:
+        ttl = float(os.environ.get("MCP_CACHE_TTL_S", DEFAULT_TTL_S))
+        _default_cache = McpResponseCache(ttl_s=ttl)
+    return _default_cache
@@ -5,7 +5,7 @@ import time
 from dataclasses import dataclass
 from typing import Any, Optional
 
-from .http_client import http_json, http_stream_lines
+from .http_client import http_jsonrpc_stream, http_stream_lines, iter_sse_messages
 
 
 @dataclass
@@ -15,21 +15,7 @@ class McpConnection:
 
 
 def parse_sse_message_json(raw: str) -> list[dict[str, Any]]:
-    out: list[dict[str, Any]] = []
-    for line in raw.splitlines():
-        line = line.strip()
-        if not line.startswith("data:"):
-            continue
-        data = line[len("data:") :].strip()
-        if not data:
-            continue
-        try:
-            obj = json.loads(data)
-            if isinstance(obj, dict):
-                out.append(obj)
-        except Exception:
-            continue
-    return out
+    return list(iter_sse_messages(raw.splitlines()))
 
 
 def try_direct_jsonrpc(mcp_url: str) -> Optional[McpConnection]:
@@ -43,13 +29,13 @@ def try_direct_jsonrpc(mcp_url: str) -> Optional[McpConnection]:
             "capabilities": {},
         },
     }
-    status, body = http_json(mcp_url, init_req, timeout_s=60)
-    if status == 200 and isinstance(body, dict) and "result" in body:
+    try:
+        resp = http_jsonrpc_stream(mcp_url, init_req, timeout_s=60)
+    except Exception:
+        return None
+    body = resp.get("body")
+    if resp.get("http_status") == 200 and isinstance(body, dict) and body.get("result") is not None:
         return McpConnection(post_url=mcp_url, headers={})
-    if status == 200 and isinstance(body, dict) and isinstance(body.get("_raw"), str):
-        msgs = parse_sse_message_json(body["_raw"])
-        if any(isinstance(m, dict) and m.get("result") is not None for m in msgs):
-            return McpConnection(post_url=mcp_url, headers={})
     return None
 
 
@@ -89,16 +75,8 @@ def jsonrpc(conn: McpConnection, req_id: int, method: str, params: Optional[dict
     payload: dict[str, Any] = {"jsonrpc": "2.0", "id": req_id, "method": method}
     if params is not None:
         payload["params"] = params
-    status, body = http_json(conn.post_url, payload, headers=conn.headers, timeout_s=120)
-
-    if isinstance(body, dict) and isinstance(body.get("_raw"), str):
-        msgs = parse_sse_message_json(body["_raw"])
-        for m in msgs:
-            if m.get("id") == req_id:
-                return {"http_status": status, "body": m, "_transport": "sse", "_raw": body.get("_raw")}
-        if msgs:
-            return {"http_status": status, "body": msgs[0], "_transport": "sse", "_raw": body.get("_raw")}
-    return {"http_status": status, "body": body, "_transport": "json"}
+    # 流式解析 SSE，匹配到 req_id 的消息即返回；连接按线程复用
+    return http_jsonrpc_stream(conn.post_url, payload, headers=conn.headers, timeout_s=120)
 
 
 def find_tool(tools: list[dict[str, Any]], name: str) -> Optional[dict[str, Any]]:
@@ -0,0 +1,111 @@
+"""
+离线回放：只使用 MCP 原始响应缓存重跑 run_smoke 的解析逻辑
+
+修改 foodmate_extract 中的日期/状态规则后，可以在不访问 Tavily 的情况下
+批量查看解析结果的变化。
+
+用法:
+    python -m gb_verifier.replay 2763 23200.113
+    python -m gb_verifier.replay --all -o replay_results.json
+    python -m gb_verifier.replay --all --compare static/cache/gb_verification.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Optional
+
+from .mcp_cache import MCP_CACHE_DIR, McpResponseCache
+from .runner import run_smoke
+from .test_input import extract_gb_number
+
+
+PARSED_FIELDS = ("publish_date", "implement_date", "abolish_date", "status", "foodmate_detail_page_url")
+
+
+def replay_standards(gb_numbers: list[str], cache: McpResponseCache) -> dict[str, dict[str, Any]]:
+    """对每个国标编号用缓存重跑 run_smoke，返回 {gb_number: parsed}"""
+    results: dict[str, dict[str, Any]] = {}
+    for gb_number in gb_numbers:
+        try:
+            _, parsed = run_smoke(None, gb_number=gb_number, cache=cache)
+            results[gb_number] = parsed
+        except Exception as e:
+            results[gb_number] = {"gb_number": gb_number, "error": str(e)}
+    return results
+
+
+def _load_previous(path: str) -> dict[str, dict[str, Any]]:
+    """从验证缓存中取每个国标编号最新的一条结果，用于对比"""
+    with open(path, "r", encoding="utf-8") as f:
+        cache = json.load(f)
+    previous: dict[str, tuple[float, dict[str, Any]]] = {}
+    for key, entry in cache.items():
+        code = key.rpartition("_")[0] or key
+        number = extract_gb_number(code)
+        ts = entry.get("timestamp", 0) or 0
+        if number not in previous or ts >= previous[number][0]:
+            previous[number] = (ts, {
+                "publish_date": entry.get("publish_date"),
+                "implement_date": entry.get("implement_date"),
+                "abolish_date": entry.get("abolish_date"),
+                "status": entry.get("status_text"),
+                "foodmate_detail_page_url": entry.get("detail_url"),
+            })
+    return {k: v for k, (_, v) in previous.items()}
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="使用 MCP 响应缓存离线重跑国标信息解析")
+    parser.add_argument("gb_numbers", nargs="*", help="国标编号，如 2763 或 'GB 2763-2021'")
+    parser.add_argument("--all", action="store_true", help="回放缓存中的全部国标")
+    parser.add_argument("--cache-dir", default=str(MCP_CACHE_DIR))
+    parser.add_argument("-o", "--output", help="结果写入 JSON 文件（默认打印）")
+    parser.add_argument("--compare", help="与验证缓存（gb_verification.json）对比，只输出有变化的字段")
+    args = parser.parse_args(argv)
+
+    cache = McpResponseCache(cache_dir=args.cache_dir, replay=True)
+    gb_numbers = [extract_gb_number(n) for n in args.gb_numbers]
+    if args.all:
+        gb_numbers.extend(n for n in cache.cached_gb_numbers() if n not in gb_numbers)
+    if not gb_numbers:
+        raise SystemExit("请指定国标编号或使用 --all")
+
+    start = time.time()
+    results = replay_standards(gb_numbers, cache)
+    elapsed = time.time() - start
+
+    output: dict[str, Any] = results
+    if args.compare:
+        previous = _load_previous(args.compare)
+        diffs: dict[str, Any] = {}
+        for number, parsed in results.items():
+            old = previous.get(number)
+            if old is None:
+                continue
+            changed = {
+                field: {"before": old.get(field), "after": parsed.get(field)}
+                for field in PARSED_FIELDS
+                if old.get(field) != parsed.get(field)
+            }
+            if changed:
+                diffs[number] = changed
+        output = diffs
+
+    text = json.dumps(output, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    print(
+        f"回放 {len(results)} 个国标，用时 {elapsed:.2f}s（缓存命中 {cache.hits}，未命中 {cache.misses}）",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
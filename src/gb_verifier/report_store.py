@@ -0,0 +1,271 @@
+"""
+报告验证结果持久化 + 国标反向索引
+
+- 每份报告的处理结果保存为 static/cache/reports/<report_id>.json
+- 反向索引 static/cache/gb_report_index.json: 规范化国标号 -> [report_id, ...]
+
+当某个国标状态变化（例如 GB 2763-2021 被废止）时，只需根据反向索引找到引用它的报告，
+重新计算对应的 gb_validation 条目和汇总状态，不需要重新 OCR / RAG。
+
+反向索引和报告文件的读-改-写在进程内用线程锁、跨 gunicorn worker 用文件锁
+（single_flight.interprocess_lock）串行化，避免并发保存时互相覆盖索引更新。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+from single_flight import interprocess_lock
+
+
+CACHE_DIR = Path("static/cache")
+REPORTS_DIR = CACHE_DIR / "reports"
+INDEX_FILE = CACHE_DIR / "gb_report_index.json"
+LOCK_DIR = CACHE_DIR / "locks"
+
+# 报告中国标相关问题的前缀（由 build_gb_issues 生成，重算时整体替换）
+GB_ISSUE_PREFIXES = ("国标验证失败:", "检测方法标准 ")
+COMPLIANCE_ISSUE_PREFIX = "[合规性]"
+
+_DASH_PATTERN = re.compile(r"\s*[—\-‑–－]\s*")
+_PREFIX_PATTERN = re.compile(r"^(GB/T|GBT|GB)\s*", re.IGNORECASE)
+
+_lock = threading.Lock()
+
+
+@contextmanager
+def _store_lock() -> Iterator[None]:
+    """报告存储的写锁（进程内 + 跨进程）"""
+    with _lock, interprocess_lock(LOCK_DIR, "gb_report_store"):
+        yield
+
+
+def canonical_gb_code(code: str) -> str:
+    """
+    规范化国标号，用作反向索引的键
+
+    'gb 2763 — 2021' -> 'GB 2763-2021'
+    'GB/T5009.3-2016' -> 'GB/T 5009.3-2016'
+    """
+    if not code:
+        return ""
+    s = re.sub(r"\s+", " ", code.strip())
+    s = _DASH_PATTERN.sub("-", s)
+    m = _PREFIX_PATTERN.match(s)
+    if m:
+        prefix = m.group(1).upper()
+        if prefix == "GBT":
+            prefix = "GB/T"
+        s = f"{prefix} {s[m.end():].strip()}"
+    return s
+
+
+def compute_report_id(file_path: str | Path) -> str:
+    """根据文件内容生成报告 ID（同名不同内容的报告不会互相覆盖）"""
+    h = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+
+def build_gb_issues(report_codes: Iterable[str], gb_validation: dict[str, dict[str, Any]]) -> list[str]:
+    """
+    根据 gb_validation 生成报告的国标相关问题
+
+    report_codes 为报告正文中的国标号，gb_validation 中其余的视为检测方法标准。
+    """
+    report_codes = list(report_codes or [])
+    issues: list[str] = []
+
+    failed_gb_codes = [
+        code for code in report_codes
+        if code in gb_validation and not gb_validation[code].get("passed", False)
+    ]
+    if failed_gb_codes:
+        issues.append(f"国标验证失败: {', '.join(failed_gb_codes)}")
+
+    for code, validation in gb_validation.items():
+        if code in report_codes:
+            continue
+        if not validation.get("passed", False):
+            status_text = validation.get("status_text", "未知")
+            issues.append(f"检测方法标准 {code} 无效 ({status_text})")
+
+    return issues
+
+
+def merge_issues(issues: list[str], gb_issues: list[str]) -> list[str]:
+    """用新的国标问题替换 issues 中原有的国标问题，保持 基础问题 -> 国标 -> 合规性 的顺序"""
+    base = [i for i in issues if not i.startswith(GB_ISSUE_PREFIXES) and not i.startswith(COMPLIANCE_ISSUE_PREFIX)]
+    compliance = [i for i in issues if i.startswith(COMPLIANCE_ISSUE_PREFIX)]
+    return base + list(gb_issues) + compliance
+
+
+def _write_json_atomic(path: Path, data: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _load_json(path: Path, default: Any) -> Any:
+    if path.exists():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return default
+    return default
+
+
+def _report_path(report_id: str) -> Path:
+    return REPORTS_DIR / f"{report_id}.json"
+
+
+def load_index() -> dict[str, list[str]]:
+    return _load_json(INDEX_FILE, {})
+
+
+def load_report(report_id: str) -> Optional[dict[str, Any]]:
+    return _load_json(_report_path(report_id), None)
+
+
+def save_report(report_id: str, result: dict[str, Any]) -> None:
+    """
+    保存单份报告的处理结果，并更新反向索引
+
+    result 为 process_single_file 的返回值（包含 summary / issues / status）。
+    """
+    summary = result.get("summary") or {}
+    record = {
+        "report_id": report_id,
+        "saved_at": time.time(),
+        **result,
+    }
+    codes = {canonical_gb_code(c) for c in (summary.get("gb_validation") or {}).keys()}
+    codes.discard("")
+
+    with _store_lock():
+        _write_json_atomic(_report_path(report_id), record)
+
+        index = load_index()
+        # 先移除旧的引用（同一报告重新处理时国标集合可能变化）
+        for code in list(index.keys()):
+            if report_id in index[code] and code not in codes:
+                index[code].remove(report_id)
+                if not index[code]:
+                    del index[code]
+        for code in codes:
+            ids = index.setdefault(code, [])
+            if report_id not in ids:
+                ids.append(report_id)
+        _write_json_atomic(INDEX_FILE, index)
+
+
+def get_reports_for_standard(gb_code: str) -> list[str]:
+    """返回引用了该国标（报告正文或检测方法）的报告 ID 列表"""
+    return list(load_index().get(canonical_gb_code(gb_code), []))
+
+
+def reverify_report(
+    record: dict[str, Any],
+    gb_code: str,
+    standard_info: dict[str, Any],
+) -> bool:
+    """
+    使用新的标准信息重算单份报告中该国标的 gb_validation 条目和汇总状态
+
+    返回 True 表示报告内容有变化。
+    """
+    from . import build_validation_entry
+
+    summary = record.get("summary") or {}
+    gb_validation: dict[str, dict[str, Any]] = summary.get("gb_validation") or {}
+    production_date = summary.get("production_date")
+    if not production_date:
+        return False
+
+    target = canonical_gb_code(gb_code)
+    changed = False
+    for code, old_entry in list(gb_validation.items()):
+        if canonical_gb_code(code) != target:
+            continue
+        new_entry = build_validation_entry(
+            standard_info,
+            production_date,
+            screenshot_path=old_entry.get("screenshot_path"),
+            download_path=old_entry.get("download_path"),
+        )
+        if not new_entry.get("detail_url"):
+            new_entry["detail_url"] = old_entry.get("detail_url")
+        if any(new_entry.get(k) != old_entry.get(k) for k in ("passed", "status", "status_text", "implement_date", "abolish_date", "reasons")):
+            changed = True
+        gb_validation[code] = new_entry
+
+    if not changed:
+        return False
+
+    summary["gb_validation"] = gb_validation
+    summary["regulatory_basis_consistent"] = (
+        all(r.get("passed", False) for r in gb_validation.values()) if gb_validation else None
+    )
+
+    gb_issues = build_gb_issues(summary.get("gb_codes") or [], gb_validation)
+    issues = merge_issues(record.get("issues") or [], gb_issues)
+    record["summary"] = summary
+    record["issues"] = issues
+    record["issue_count"] = len(issues)
+    record["status"] = "error" if issues else "success"
+    record["reverified_at"] = time.time()
+    return True
+
+
+def reverify_standard(gb_code: str, standard_info: dict[str, Any]) -> dict[str, Any]:
+    """
+    标准状态变化后的增量重验证
+
+    Args:
+        gb_code: 状态发生变化的国标号（任意写法，内部规范化）
+        standard_info: 新的标准信息，字段同 run_smoke 的 parsed（status/implement_date/...）
+
+    Returns:
+        {"gb_code": ..., "affected": N, "updated": [report_id, ...]}
+    """
+    report_ids = get_reports_for_standard(gb_code)
+    updated: list[str] = []
+
+    for report_id in report_ids:
+        with _store_lock():
+            record = load_report(report_id)
+            if not record:
+                continue
+            if reverify_report(record, gb_code, standard_info):
+                _write_json_atomic(_report_path(report_id), record)
+                updated.append(report_id)
+
+    return {
+        "gb_code": canonical_gb_code(gb_code),
+        "affected": len(report_ids),
+        "updated": updated,
+    }
+
+
+def entry_to_standard_info(entry: dict[str, Any]) -> dict[str, Any]:
+    """把 gb_validation 条目还原成 run_smoke 风格的标准信息"""
+    status_text = entry.get("status_text")
+    return {
+        "status": status_text if status_text and status_text != "未知" else None,
+        "publish_date": entry.get("publish_date"),
+        "implement_date": entry.get("implement_date"),
+        "abolish_date": entry.get("abolish_date"),
+        "foodmate_detail_page_url": entry.get("detail_url"),
+    }
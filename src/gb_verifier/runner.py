@@ -3,7 +3,7 @@ from __future__ import annotations
 import json
 import os
 import re
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 from .foodmate_extract import (
     extract_abolish_date_from_detail_page,
@@ -13,7 +13,8 @@ from .foodmate_extract import (
     extract_status_from_any,
 )
 from .html_extractor import extract_standard_info_from_html, fetch_detail_page_content
-from .mcp_client import build_tool_args, connect, find_tool, jsonrpc, pick_search_tool
+from .mcp_cache import McpResponseCache, get_default_cache
+from .mcp_client import McpConnection, build_tool_args, connect, find_tool, jsonrpc, pick_search_tool
 
 
 def _safe_get_raw_content(resp: Optional[dict[str, Any]]) -> Optional[str]:
@@ -36,32 +37,65 @@ def _safe_get_url(resp: Optional[dict[str, Any]]) -> Optional[str]:
         return None
 
 
-def run_smoke(mcp_url: str, gb_number: str) -> tuple[dict[str, Any], dict[str, Any]]:
+def _call_tool(
+    get_conn: Optional[Callable[[], McpConnection]],
+    cache: Optional[McpResponseCache],
+    req_id: int,
+    name: str,
+    arguments: dict[str, Any],
+) -> dict[str, Any]:
+    if cache is not None:
+        return cache.call_tool(get_conn, req_id, name, arguments)
+    return jsonrpc(get_conn(), req_id=req_id, method="tools/call", params={"name": name, "arguments": arguments})
+
+
+def run_smoke(
+    mcp_url: Optional[str],
+    gb_number: str,
+    cache: Optional[McpResponseCache] = None,
+) -> tuple[dict[str, Any], dict[str, Any]]:
     """
     Returns:
       - out: full trace (MCP raw responses + parsed_standard_info)
       - parsed: compact user-friendly structure
+
+    cache: tools/call 原始响应缓存，默认使用 get_default_cache()；
+           cache.replay 为 True 时只读缓存，不连接 MCP（离线重跑解析逻辑）
     """
+    if cache is None:
+        cache = get_default_cache()
+    replay = cache is not None and cache.replay
     query = (
         f"GB {gb_number} 食品安全国家标准 食品中农药最大残留限量 "
         f"标准状态 发布日期 实施日期 "
         f"site:down.foodmate.net/standard/sort"
     )
 
-    conn = connect(mcp_url)
-
-    init_resp = jsonrpc(
-        conn,
-        req_id=1,
-        method="initialize",
-        params={
-            "protocolVersion": "2024-11-05",
-            "clientInfo": {"name": "verifier2-mcp", "version": "0.1.0"},
-            "capabilities": {},
-        },
-    )
+    # 延迟建立 MCP 连接：全部命中缓存时不需要连接和 initialize
+    conn_state: dict[str, McpConnection] = {}
+
+    def get_conn() -> McpConnection:
+        if "conn" not in conn_state:
+            conn = connect(mcp_url)
+            jsonrpc(
+                conn,
+                req_id=1,
+                method="initialize",
+                params={
+                    "protocolVersion": "2024-11-05",
+                    "clientInfo": {"name": "verifier2-mcp", "version": "0.1.0"},
+                    "capabilities": {},
+                },
+            )
+            conn_state["conn"] = conn
+        return conn_state["conn"]
 
-    tools_resp = jsonrpc(conn, req_id=2, method="tools/list", params={})
+    conn_factory: Optional[Callable[[], McpConnection]] = None if replay else get_conn
+
+    if cache is not None:
+        tools_resp = cache.list_tools(conn_factory, req_id=2)
+    else:
+        tools_resp = jsonrpc(get_conn(), req_id=2, method="tools/list", params={})
     tools = (((tools_resp.get("body") or {}).get("result") or {}).get("tools")) if isinstance(tools_resp.get("body"), dict) else None
     if not isinstance(tools, list):
         tools = []
@@ -79,7 +113,7 @@ def run_smoke(mcp_url: str, gb_number: str) -> tuple[dict[str, Any], dict[str, A
 
     if tool_name and chosen_tool:
         tool_args = build_tool_args(chosen_tool, query=query)
-        search_resp = jsonrpc(conn, req_id=3, method="tools/call", params={"name": tool_name, "arguments": tool_args})
+        search_resp = _call_tool(conn_factory, cache, 3, tool_name, tool_args)
 
         # Deterministic search page URL
         search_page_url = f"https://down.foodmate.net/standard/search.php?kw={gb_number}"
@@ -87,13 +121,13 @@ def run_smoke(mcp_url: str, gb_number: str) -> tuple[dict[str, Any], dict[str, A
         extract_tool = find_tool(tools, "tavily_extract")
         if extract_tool:
             extract_args = {"urls": [search_page_url], "format": "markdown", "extract_depth": "advanced", "include_images": True}
-            extract_resp = jsonrpc(conn, req_id=4, method="tools/call", params={"name": "tavily_extract", "arguments": extract_args})
+            extract_resp = _call_tool(conn_factory, cache, 4, "tavily_extract", extract_args)
 
             extract_args_alt = {"urls": [search_page_url], "format": "markdown", "extract_depth": "basic"}
-            extract_resp_alt = jsonrpc(conn, req_id=7, method="tools/call", params={"name": "tavily_extract", "arguments": extract_args_alt})
+            extract_resp_alt = _call_tool(conn_factory, cache, 7, "tavily_extract", extract_args_alt)
 
             extract_args_text = {"urls": [search_page_url], "format": "text", "extract_depth": "basic"}
-            extract_resp_text = jsonrpc(conn, req_id=8, method="tools/call", params={"name": "tavily_extract", "arguments": extract_args_text})
+            extract_resp_text = _call_tool(conn_factory, cache, 8, "tavily_extract", extract_args_text)
 
             # Find detail URL from extracted pages (prefer markdown advanced -> alt -> text)
             detail_url = None
@@ -110,7 +144,7 @@ def run_smoke(mcp_url: str, gb_number: str) -> tuple[dict[str, Any], dict[str, A
                 if fb_tool:
                     fb_query = f"GB {gb_number} site:down.foodmate.net/standard/sort"
                     fb_args = build_tool_args(fb_tool, query=fb_query)
-                    fallback_search_resp = jsonrpc(conn, req_id=5, method="tools/call", params={"name": "tavily_search", "arguments": fb_args})
+                    fallback_search_resp = _call_tool(conn_factory, cache, 5, "tavily_search", fb_args)
                     try:
                         fb_results = (
                             (((fallback_search_resp.get("body") or {}).get("result") or {}).get("structuredContent") or {}).get("results")
@@ -126,13 +160,9 @@ def run_smoke(mcp_url: str, gb_number: str) -> tuple[dict[str, Any], dict[str, A
 
             if detail_url:
                 extract_detail_args = {"urls": [detail_url], "format": "markdown", "extract_depth": "advanced", "include_images": True}
-                extract_detail_resp = jsonrpc(
-                    conn, req_id=6, method="tools/call", params={"name": "tavily_extract", "arguments": extract_detail_args}
-                )
+                extract_detail_resp = _call_tool(conn_factory, cache, 6, "tavily_extract", extract_detail_args)
                 extract_detail_text_args = {"urls": [detail_url], "format": "text", "extract_depth": "basic"}
-                extract_detail_text = jsonrpc(
-                    conn, req_id=9, method="tools/call", params={"name": "tavily_extract", "arguments": extract_detail_text_args}
-                )
+                extract_detail_text = _call_tool(conn_factory, cache, 9, "tavily_extract", extract_detail_text_args)
 
     # -------- parsed output --------
     parsed: dict[str, Any] = {
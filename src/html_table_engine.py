@@ -0,0 +1,233 @@
+"""
+HTML 表格快速解析引擎
+
+RAGFlow 返回的 chunk 是形如 <table><caption>..</caption><tr><th>..</th></tr><tr><td rowspan="2">..</td>..</table>
+的简单 HTML。这里不构建完整 DOM 树，而是：
+
+- 安装了 lxml 时：用 lxml（libxml2，C 实现）解析，再按行列遍历
+- 未安装时：用一个正则标签扫描器流式读取 <table>/<tr>/<td>/<th>/<br> 标签
+
+两种后端都把 rowspan/colspan 展开成规整的二维网格（合并单元格的值复制到它覆盖的每个格子），
+并返回 chunk 中的所有表格（跨页拆开的细则表常常一个 chunk 里有两张）。
+"""
+from __future__ import annotations
+
+import html
+import re
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import lxml.html as lxml_html
+    from lxml import etree as lxml_etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# 一张表 = 若干行，每行 = 若干单元格文本（已展开合并单元格，行长度已补齐）
+Grid = List[List[str]]
+
+# 单个合并单元格的最大跨度（防止异常的 rowspan="10000" 撑爆网格）
+MAX_SPAN = 200
+
+_WS_RE = re.compile(r"\s+")
+_TAG_RE = re.compile(r"<(/?)([a-zA-Z][a-zA-Z0-9]*)([^>]*)>|<!--.*?-->", re.S)
+_SPAN_ATTR_RE = re.compile(r"""\b(rowspan|colspan)\s*=\s*["']?\s*(\d+)""", re.I)
+_TABLE_TAGS = ("<table", "<TABLE")
+
+
+def clean_cell_text(text: str) -> str:
+    """合并空白（含换行）并去除首尾空白"""
+    if not text:
+        return ""
+    return _WS_RE.sub(" ", text).strip()
+
+
+def _span(value: Optional[str]) -> int:
+    try:
+        return min(max(int(value), 1), MAX_SPAN)
+    except (TypeError, ValueError):
+        return 1
+
+
+class _GridBuilder:
+    """按行接收单元格，展开 rowspan/colspan 生成网格"""
+
+    __slots__ = ("rows", "_pending", "_row", "_col")
+
+    def __init__(self):
+        self.rows: Grid = []
+        # 列号 -> (剩余行数, 文本)：来自上方单元格的 rowspan
+        self._pending: Dict[int, Tuple[int, str]] = {}
+        self._row: Optional[List[str]] = None
+        self._col = 0
+
+    def start_row(self):
+        if self._row is not None:
+            self.end_row()
+        self._row = []
+        self._col = 0
+
+    def _fill_pending(self):
+        row = self._row
+        while True:
+            carried = self._pending.get(self._col)
+            if carried is None:
+                return
+            remaining, text = carried
+            row.append(text)
+            if remaining <= 1:
+                del self._pending[self._col]
+            else:
+                self._pending[self._col] = (remaining - 1, text)
+            self._col += 1
+
+    def add_cell(self, text: str, rowspan: int = 1, colspan: int = 1):
+        if self._row is None:
+            self.start_row()
+        self._fill_pending()
+        for _ in range(colspan):
+            self._row.append(text)
+            if rowspan > 1:
+                self._pending[self._col] = (rowspan - 1, text)
+            self._col += 1
+
+    def end_row(self):
+        if self._row is None:
+            return
+        self._fill_pending()
+        # 行尾之后仍有被上方 rowspan 占据的列
+        if self._pending:
+            last = max(self._pending)
+            while self._col <= last:
+                if self._col in self._pending:
+                    self._fill_pending()
+                else:
+                    self._row.append("")
+                    self._col += 1
+        if self._row:
+            self.rows.append(self._row)
+        self._row = None
+
+    def finish(self) -> Grid:
+        self.end_row()
+        # 剩余的 rowspan 超出了表格实际行数，忽略
+        width = max((len(r) for r in self.rows), default=0)
+        for r in self.rows:
+            if len(r) < width:
+                r.extend([""] * (width - len(r)))
+        return self.rows
+
+
+def _extract_tables_regex(html_content: str) -> List[Grid]:
+    """标准库后端：正则扫描标签，流式构建网格（支持嵌套表，内层表单独输出）"""
+    tables: List[Optional[Grid]] = []
+    stack: List[Tuple[_GridBuilder, int]] = []   # (构建器, 在 tables 中的位置)，保证按开始标签顺序输出
+    cell_parts: Optional[List[str]] = None   # 当前单元格的文本片段
+    cell_spans = (1, 1)
+    cell_depth = 0                           # 当前单元格所属表格在 stack 中的深度
+
+    def close_cell():
+        nonlocal cell_parts
+        if cell_parts is not None:
+            text = clean_cell_text(html.unescape("".join(cell_parts)))
+            stack[cell_depth - 1][0].add_cell(text, *cell_spans)
+            cell_parts = None
+
+    pos = 0
+    for m in _TAG_RE.finditer(html_content):
+        if cell_parts is not None and m.start() > pos:
+            cell_parts.append(html_content[pos:m.start()])
+        pos = m.end()
+        tag = m.group(2)
+        if tag is None:   # 注释
+            continue
+        tag = tag.lower()
+        closing = m.group(1) == "/"
+
+        if tag == "table":
+            if closing:
+                if stack:
+                    if cell_depth == len(stack):
+                        close_cell()
+                    builder, index = stack.pop()
+                    tables[index] = builder.finish()
+            else:
+                close_cell()   # 嵌套表之前的单元格文字先落盘
+                stack.append((_GridBuilder(), len(tables)))
+                tables.append(None)
+        elif not stack:
+            continue
+        elif tag in ("td", "th"):
+            if cell_depth == len(stack):
+                close_cell()
+            if not closing:
+                rowspan = colspan = 1
+                for name, value in _SPAN_ATTR_RE.findall(m.group(3)):
+                    if name.lower() == "rowspan":
+                        rowspan = _span(value)
+                    else:
+                        colspan = _span(value)
+                cell_parts, cell_spans, cell_depth = [], (rowspan, colspan), len(stack)
+        elif tag == "tr":
+            if cell_depth == len(stack):
+                close_cell()
+            if closing:
+                stack[-1][0].end_row()
+            else:
+                stack[-1][0].start_row()
+        elif tag in ("br", "p", "div", "li") and cell_parts is not None:
+            cell_parts.append(" ")
+        elif tag == "caption" and cell_depth == len(stack):
+            close_cell()
+
+    # 未闭合的表格（chunk 截断）仍然输出
+    while stack:
+        if cell_depth == len(stack):
+            close_cell()
+        builder, index = stack.pop()
+        tables[index] = builder.finish()
+    return tables
+
+
+def _extract_tables_lxml(html_content: str) -> List[Grid]:
+    """lxml 后端"""
+    try:
+        root = lxml_html.fragment_fromstring(html_content, create_parent="div")
+    except (lxml_etree.ParserError, ValueError):
+        return []
+    # text_content() 会把 <br> 两侧的文字直接拼在一起，这里补一个空格，与标准库后端一致
+    for br in root.iter("br"):
+        br.tail = " " + (br.tail or "")
+    tables: List[Grid] = []
+    for table in root.iter("table"):
+        builder = _GridBuilder()
+        for tr in table.iter("tr"):
+            # 只处理属于当前表的行（嵌套表的行由内层表自己处理）
+            if next(tr.iterancestors("table"), None) is not table:
+                continue
+            builder.start_row()
+            for cell in tr:
+                if cell.tag not in ("td", "th"):
+                    continue
+                builder.add_cell(
+                    clean_cell_text(cell.text_content()),
+                    _span(cell.get("rowspan")),
+                    _span(cell.get("colspan")),
+                )
+            builder.end_row()
+        tables.append(builder.finish())
+    return tables
+
+
+def extract_tables(html_content: str) -> List[Grid]:
+    """
+    提取 HTML 中的所有表格，rowspan/colspan 展开为规整网格
+
+    Returns:
+        按表格在文档中出现顺序排列的网格列表；没有表格时返回 []
+    """
+    if not html_content or not any(t in html_content for t in _TABLE_TAGS):
+        return []
+    if LXML_AVAILABLE:
+        return _extract_tables_lxml(html_content)
+    return _extract_tables_regex(html_content)
@@ -1,7 +1,55 @@
-﻿from bs4 import BeautifulSoup
-from typing import List, Dict, Any, Optional
+﻿from typing import List, Dict, Any, Optional, Tuple
+import functools
 import re
 
+from app_logging import get_logger
+from html_table_engine import extract_tables
+
+logger = get_logger(__name__)
+
+
+# ----------------------------------------------------------------------
+# find_inspection_items 的筛选规则（模块加载时编译一次）
+# ----------------------------------------------------------------------
+
+# 列名映射
+_NAME_COLUMNS = ("检验项目", "项目名称", "项目")
+_BASIS_COLUMNS = ("依据法律法规", "依据法律法规或标准", "检验依据")
+_METHOD_COLUMNS = ("检测方法", "检验方法")
+
+# 项目名称黑名单（表头说明、备注、占位符、目录、引用词等）
+_NAME_BLACKLIST_WORDS = (
+    "注", "备注", "说明", "▲", "★", "类别", "分类", "序号", "检测项目",
+    "无", "见下表", "如", "同", "及", "等",  # 单字或连接词
+    "目录", "页码", "页", "表", "附录", "参考", "依据", "标准", "方法", "单位", "限量", "指标",
+    "共", "第", "见", "参见", "详见", "参照",  # 引用词
+    "补充", "额外", "蔬菜",  # 过滤"额外补充"、"蔬菜/补充"等
+)
+# 所有黑名单词合并为一个预编译的交替正则，在 C 实现的 re 引擎中一次扫描完成
+# （比纯 Python 的 AhoCorasick 逐字符状态转移快一个数量级）
+_NAME_BLACKLIST_RE = re.compile("|".join(map(re.escape, _NAME_BLACKLIST_WORDS)))
+
+# 标准号前缀
+_STD_PREFIXES = ("GB", "NY", "SN", "DB", "GH", "QB", "SB", "SC", "HG", "LY", "WB", "WM", "T/", "Q/", "JJG", "ISO")
+
+_SINGLE_LETTER_RE = re.compile(r'^[a-zA-Z]$')
+_SERIAL_RE = re.compile(r'^[\d\.\)\、]+$')
+_WORD_CHAR_RE = re.compile(r'[\u4e00-\u9fa5A-Za-z0-9]')
+_CJK_RE = re.compile(r'[\u4e00-\u9fa5]')
+
+# 拆分片段的备注性文字
+_PART_INVALID_RE = re.compile(
+    r'不检测|不适用|视产品|而定|以.*为主要原料'
+    r'|^[a-z]\.$'   # 单字母加点(如 "b.", "c.")
+    r'|^[a-z]、$'   # 单字母加顿号
+)
+_OPEN_PARENS = ('(', '（')
+_CLOSE_PARENS = (')', '）')
+
+# 检测方法中的标准号(可能包含年份)，如 "GB 23200.19"、"NY/T 761-2008"
+_METHOD_STANDARD_RE = re.compile(r'(?:GB|NY|SN|GH)(?:/T)?\s*\d+(?:\.\d+)*(?:-\d{4})?')
+
+
 class HtmlTableParser:
     """
     负责解析 RAGFlow 返回的 HTML 表格数据
@@ -12,64 +60,55 @@ class HtmlTableParser:
         """
         解析 HTML 表格，返回结构化的数据列表
         每一行转换为一个字典，键为表头
+
+        chunk 中的每张表都会解析（各自以首行为表头）；rowspan/colspan 已展开，
+        合并单元格的值会出现在它覆盖的每一行（见 html_table_engine）
         """
         if not html_content:
             return []
 
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            table = soup.find('table')
-            
-            if not table:
-                return []
-                
-            # 提取表头
-            headers = []
-            header_row = table.find('tr')
-            if header_row:
-                # 尝试查找 th
-                th_cells = header_row.find_all('th')
-                if not th_cells:
-                    # 如果没有 th，尝试用第一行 td 作为表头
-                    th_cells = header_row.find_all('td')
-                
-                headers = [HtmlTableParser._clean_text(th.get_text()) for th in th_cells]
-            
-            # 如果没找到表头，或者是无效表格
-            if not headers:
-                return []
-
-            results = []
-            # 遍历数据行 (跳过第一行如果它是表头)
-            rows = table.find_all('tr')
-            start_idx = 1 if rows and rows[0] == header_row else 0
-            
-            for row in rows[start_idx:]:
-                cells = row.find_all('td')
-                if not cells:
-                    continue
-                    
-                # 处理合并单元格（简单版本：暂不处理复杂的 rowspan/colspan 逻辑，这就需要更复杂的算法）
-                # RAGFlow 返回的表格通常已经展平或者比较简单
-                # 这里我们假设简单的对应关系
-                
-                row_data = {}
-                for i, cell in enumerate(cells):
-                    if i < len(headers):
-                        key = headers[i]
-                        value = HtmlTableParser._clean_text(cell.get_text())
-                        row_data[key] = value
-                
-                # 只有当行内有实质内容时才添加
-                if any(row_data.values()):
-                    results.append(row_data)
-                    
-            return results
-
+            tables = extract_tables(html_content)
         except Exception as e:
-            print(f"HTML 表格解析错误: {e}")
+            logger.warning("HTML 表格解析错误: %s", e)
             return []
 
+        results = []
+        for grid in tables:
+            results.extend(HtmlTableParser._grid_to_rows(grid))
+        return results
+
+    @staticmethod
+    def _grid_to_rows(grid: List[List[str]]) -> List[Dict[str, str]]:
+        """网格首行作为表头，其余每行转换为 {表头: 值}"""
+        if not grid:
+            return []
+        header_cells = grid[0]
+        if not any(header_cells):
+            return []
+
+        # colspan 展开后的表头会重复，后出现的加序号区分，避免同名列互相覆盖
+        headers = []
+        seen = {}
+        for h in header_cells:
+            if h in seen:
+                seen[h] += 1
+                headers.append(f"{h}#{seen[h]}")
+            else:
+                seen[h] = 1
+                headers.append(h)
+
+        results = []
+        for cells in grid[1:]:
+            # 跨页续表在 chunk 中间重复出现的表头行
+            if cells == header_cells:
+                continue
+            row_data = dict(zip(headers, cells))
+            # 只有当行内有实质内容时才添加
+            if any(row_data.values()):
+                results.append(row_data)
+        return results
+
     @staticmethod
     def _clean_text(text: str) -> str:
         """
@@ -85,253 +124,204 @@ class HtmlTableParser:
         text = re.sub(r'\s+', ' ', text)
         return text
 
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _resolve_columns(keys: Tuple[str, ...]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """
+        按表头确定 (项目名称列, 依据列, 方法列)，同一张表的所有行只计算一次
+
+        名称列取第一个匹配的表头；依据/方法列与原逐行查找一致，取最后一个匹配的表头
+        """
+        name_key = next((k for k in keys if any(t in k for t in _NAME_COLUMNS)), None)
+        basis_key = method_key = None
+        for key in keys:
+            if any(t in key for t in _BASIS_COLUMNS):
+                basis_key = key
+            if any(t in key for t in _METHOD_COLUMNS):
+                method_key = key
+        return name_key, basis_key, method_key
+
+    @staticmethod
+    def _reject_reason(raw_name: str) -> Optional[str]:
+        """
+        项目名称筛选，返回过滤原因（None 表示保留）；原因为空字符串时不打印调试信息
+        """
+        name = raw_name.strip()
+
+        # 过滤逻辑 1: 名称太短或太长
+        if not raw_name or len(name) < 2:
+            return ""
+        if len(name) > 50:  # 过滤掉长句子和说明文字
+            return f"过滤掉过长项目名称({len(name)}字符): {name[:30]}..."
+
+        # 过滤逻辑 2: 包含无效关键字 (说明行, 占位符, 目录等)，一次扫描匹配全部黑名单
+        if _NAME_BLACKLIST_RE.search(raw_name):
+            return f"过滤掉包含无效关键字的项目: {name}"
+
+        # 过滤逻辑 3: 排除纯数字
+        if name.isdigit():
+            return ""
+
+        # 过滤逻辑 4: 排除纯英文字母序号(如 "a", "b", "c")
+        if _SINGLE_LETTER_RE.match(name):
+            return f"过滤掉单字母序号: {name}"
+
+        # 过滤逻辑 5: 以标准前缀开头的通常是标准依据,不是项目名称
+        # 很多时候表格解析错误,把第三列放到了第一列
+        if name.upper().startswith(_STD_PREFIXES):
+            return f"过滤掉标准号形式的项目名称: {name}"
+
+        # 排除类似 "4.1" 或 "1)" 这样的序号
+        if _SERIAL_RE.match(name):
+            return ""
+
+        # 排除仅包含特殊符号的
+        if not _WORD_CHAR_RE.search(raw_name):
+            return ""
+
+        # 过滤逻辑 6: 必须包含至少2个中文字符(有效的检验项目名称通常是中文)
+        # 例外:允许化学物质英文名称(如 "DDT", "BHC")，但必须是大写字母且长度在2-10之间
+        if len(_CJK_RE.findall(name)) < 2 and not (name.isupper() and 2 <= len(name) <= 10):
+            return f"过滤掉中文字符不足的项目: {name}"
+
+        return None
+
+    @staticmethod
+    def _is_valid_part(p: str) -> bool:
+        """拆分多项目单元格时，判断单个片段是否是有效的项目名称"""
+        # 基本长度检查
+        if len(p) < 2 or p.isdigit():
+            return False
+
+        opens = p.startswith(_OPEN_PARENS)
+        closes = p.endswith(_CLOSE_PARENS)
+        # 过滤括号片段(如 "计)"、"量)"、"红）c")；完整的括号表达式(如 "（以Pb计）")保留
+        if closes and not opens:
+            return False
+        # 过滤以括号开头但不完整的片段(如 "（以Pb")
+        if opens and not closes:
+            return False
+
+        # 过滤纯符号或单字符
+        if len(p.strip('()（）')) < 2:
+            return False
+
+        # 过滤备注性文字
+        return _PART_INVALID_RE.search(p) is None
+
     @staticmethod
     def find_inspection_items(parsed_table: List[Dict[str, str]]) -> List[Dict[str, Any]]:
         """
         从解析后的表格中提取检验项目信息
         需要识别特定的列名，如 "检验项目", "依据法律法规", "检测方法" 等
+
+        筛选规则预编译在模块级（黑名单词合并成一个正则分支 + 其他正则），每行只扫描一遍
         """
         items = []
-        
-        # 定义可能的列名映射
-        col_map = {
-            "name": ["检验项目", "项目名称", "项目"],
-            "basis": ["依据法律法规", "依据法律法规或标准", "检验依据"],
-            "method": ["检测方法", "检验方法"]
-        }
-        
-        # 定义需要排除的无效行关键字 (防止将表头说明、备注等误认为项目)
-        invalid_keywords = ["注", "备注", "说明", "▲", "★", "类别", "分类", "序号"]
-        
+
         for row in parsed_table:
-            item = {}
-            found_name = False
-            
-            # 查找检验项目名称
-            item_name_key = None
-            for key in row.keys():
-                for target in col_map["name"]:
-                    if target in key:
-                        item_name_key = key
-                        break
-                if item_name_key:
-                    break
-            
-            if item_name_key:
-                raw_name = row[item_name_key]
-                raw_name_stripped = raw_name.strip()
-                
-                # 过滤逻辑 1: 名称太短或太长
-                if not raw_name or len(raw_name_stripped) < 2:
-                    continue
-                if len(raw_name_stripped) > 50:  # 新增:过滤掉长句子和说明文字
-                    print(f"DEBUG 筛选: 过滤掉过长项目名称({len(raw_name_stripped)}字符): {raw_name_stripped[:30]}...")
-                    continue
-                    
-                # 过滤逻辑 2: 包含无效关键字 (说明行, 占位符, 目录等)
-                # 扩展黑名单 - 添加"补充"相关词汇
-                invalid_keywords = [
-                    "注", "备注", "说明", "▲", "★", "类别", "分类", "序号", "检测项目",
-                    "无", "见下表", "如", "同", "及", "等",  # 单字或连接词
-                    "目录", "页码", "页", "表", "附录", "参考", "依据", "标准", "方法", "单位", "限量", "指标",  # 新增
-                    "共", "第", "见", "参见", "详见", "参照",  # 新增:引用词
-                    "补充", "额外", "蔬菜",  # 新增:过滤"额外补充"、"蔬菜/补充"等
-                ]
-                
-                if any(kw in raw_name for kw in invalid_keywords):
-                    print(f"DEBUG 筛选: 过滤掉包含无效关键字的项目: {raw_name_stripped}")
-                    continue
-                
-                # 过滤逻辑 3: 排除纯数字
-                if raw_name_stripped.isdigit():
-                    continue
-                
-                # 过滤逻辑 4: 排除纯英文字母序号(如 "a", "b", "c")
-                if re.match(r'^[a-zA-Z]$', raw_name_stripped):
-                    print(f"DEBUG 筛选: 过滤掉单字母序号: {raw_name_stripped}")
-                    continue
-                
-                # 过滤逻辑 5: 以标准前缀开头的通常是标准依据,不是项目名称
-                # 很多时候表格解析错误,把第三列放到了第一列
-                std_prefixes = ("GB", "NY", "SN", "DB", "GH", "QB", "SB", "SC", "HG", "LY", "WB", "WM", "T/", "Q/", "JJG", "ISO")
-                if raw_name_stripped.upper().startswith(std_prefixes):
-                     print(f"DEBUG: Filtered out standard-like item name: {raw_name_stripped}")
-                     continue
-
-                # 排除类似 "4.1" 或 "1)" 这样的序号
-                if re.match(r'^[\d\.\)\、]+$', raw_name_stripped):
-                    continue
-
-                # 排除仅包含特殊符号的
-                if not re.search(r'[\u4e00-\u9fa5A-Za-z0-9]', raw_name):
-                     continue
-                
-                # 过滤逻辑 6: 必须包含至少2个中文字符(有效的检验项目名称通常是中文)
-                chinese_chars = re.findall(r'[\u4e00-\u9fa5]', raw_name_stripped)
-                if len(chinese_chars) < 2:
-                    # 例外:允许化学物质英文名称(如 "DDT", "BHC")
-                    # 但必须是大写字母且长度在2-10之间
-                    if not (raw_name_stripped.isupper() and 2 <= len(raw_name_stripped) <= 10):
-                        print(f"DEBUG 筛选: 过滤掉中文字符不足的项目: {raw_name_stripped}")
-                        continue
-
-                item["item_name"] = raw_name
-                found_name = True
-            
-            if not found_name:
+            name_key, basis_key, method_key = HtmlTableParser._resolve_columns(tuple(row.keys()))
+            if not name_key:
                 continue
-                
-            # 查找依据
-            for key in row.keys():
-                for target in col_map["basis"]:
-                    if target in key:
-                        raw_basis = row[key]
-                        # 清理重复的标准号 - 使用简化方法
-                        if raw_basis:
-                            # split()会自动处理多个空格,返回非空元素列表
-                            parts = raw_basis.split()
-                            # 去重
-                            unique_parts = []
-                            seen = set()
-                            for part in parts:
-                                if part not in seen:
-                                    unique_parts.append(part)
-                                    seen.add(part)
-                            item["standard_basis"] = " ".join(unique_parts)
-                        else:
-                            item["standard_basis"] = ""
-                        break
-            
+
+            raw_name = row[name_key]
+            reason = HtmlTableParser._reject_reason(raw_name)
+            if reason is not None:
+                if reason:
+                    logger.debug("筛选: %s", reason)
+                continue
+
+            item = {"item_name": raw_name}
+
+            # 查找依据：清理重复的标准号（split() 会自动处理多个空格）
+            if basis_key:
+                raw_basis = row[basis_key]
+                item["standard_basis"] = " ".join(dict.fromkeys(raw_basis.split())) if raw_basis else ""
+
             # 查找方法
-            for key in row.keys():
-                for target in col_map["method"]:
-                    if target in key:
-                        item["test_method"] = row[key]
-                        break
-            
+            if method_key:
+                item["test_method"] = row[method_key]
+
             # 补充默认值
             item.setdefault("standard_basis", "")
             item.setdefault("test_method", "")
-            
+
             items.append(item)
-        
+
         # 后处理：拆分包含多个项目名称的单元格
         # 例如："阿维菌素 哒螨灵" 应该拆分为两个独立项目
         expanded_items = []
         for item in items:
             item_name = item.get("item_name", "")
-            
+
             # 检测是否包含多个项目名称（通过空格分隔，且每个部分长度>=2）
             parts = item_name.split()
-            
+
             # 如果只有一个部分，直接保留
             if len(parts) <= 1:
                 expanded_items.append(item)
                 continue
-            
-            # 检查是否所有部分都是有效的项目名称(长度>=2且不是纯数字)
-            # 增强过滤:排除括号片段、备注等
-            valid_parts = []
-            for p in parts:
-                # 基本长度检查
-                if len(p) < 2 or p.isdigit():
-                    continue
-                
-                # 过滤括号片段(如 "计)"、"量)"、"红）c")
-                if p.endswith(')') or p.endswith('）'):
-                    # 如果是完整的括号表达式(如 "（以Pb计）")则保留
-                    if not (p.startswith('(') or p.startswith('（')):
-                        continue
-                
-                # 过滤以括号开头但不完整的片段(如 "（以Pb")
-                if (p.startswith('(') or p.startswith('（')) and not (p.endswith(')') or p.endswith('）')):
-                    continue
-                
-                # 过滤纯符号或单字符
-                if len(p.strip('()（）')) < 2:
-                    continue
-                
-                # 过滤备注性文字
-                invalid_patterns = [
-                    '不检测', '不适用', '视产品', '而定', '以.*为主要原料',
-                    '^[a-z]\.$',  # 单字母加点(如 "b.", "c.")
-                    '^[a-z]、$',  # 单字母加顿号
-                ]
-                is_invalid = False
-                for pattern in invalid_patterns:
-                    if re.search(pattern, p):
-                        is_invalid = True
-                        break
-                if is_invalid:
-                    continue
-                
-                # 通过所有检查,添加到有效列表
-                valid_parts.append(p)
-            
+
+            valid_parts = [p for p in parts if HtmlTableParser._is_valid_part(p)]
+
             if len(valid_parts) <= 1:
                 # 只有一个有效部分，保留原项目
                 expanded_items.append(item)
-            else:
-                # 有多个有效部分，拆分为独立项目
-                print(f"DEBUG 拆分: 检测到多个项目名称，开始拆分: {valid_parts}")
-                
-                # 同时尝试拆分标准依据和检测方法
-                standard_basis = item.get("standard_basis", "")
-                test_method = item.get("test_method", "")
-                
-                basis_parts = standard_basis.split() if standard_basis else []
-                
-                # 智能拆分检测方法
-                # 检测方法通常包含多个 GB 标准，用空格分隔
-                # 例如: "GB 23200.19 GB 23200.20 GB 23200.121"
-                method_parts = []
-                if test_method:
-                    # 按空格分隔,但保留 GB 标准的完整性
-                    # 例如: "GB 23200.19" 应该作为一个整体
-                    # 匹配 GB/NY/SN 等标准号(可能包含年份)
-                    gb_pattern = r'(?:GB|NY|SN|GH)(?:/T)?\s*\d+(?:\.\d+)*(?:-\d{4})?'
-                    method_parts = re.findall(gb_pattern, test_method)
-                    
-                    # 调试输出
-                    print(f"DEBUG 拆分: 原始方法='{test_method}'")
-                    print(f"DEBUG 拆分: 提取到 {len(method_parts)} 个方法: {method_parts}")
-                    print(f"DEBUG 拆分: 项目数量={len(valid_parts)}, 方法数量={len(method_parts)}")
-                
-                # 如果标准依据的数量与项目名称数量匹配，则一一对应
-                # 否则，所有拆分项目共享相同的标准依据
-                for i, part in enumerate(valid_parts):
-                    # 分配标准依据
-                    if len(basis_parts) == len(valid_parts):
-                        item_basis = basis_parts[i]
-                    else:
-                        item_basis = standard_basis
-                    
-                    # 分配检测方法
-                    # 策略1: 如果方法数量 >= 项目数量，尝试分配
-                    # 策略2: 否则，共享所有方法
-                    if len(method_parts) >= len(valid_parts):
-                        # 尝试为每个项目分配对应的方法
-                        # 简单策略：平均分配
-                        methods_per_item = len(method_parts) // len(valid_parts)
-                        start_idx = i * methods_per_item
-                        end_idx = start_idx + methods_per_item
-                        if i == len(valid_parts) - 1:  # 最后一个项目获取剩余所有方法
-                            end_idx = len(method_parts)
-                        item_method = " ".join(method_parts[start_idx:end_idx])
-                        print(f"DEBUG 拆分: 项目 '{part}' 分配方法: {item_method}")
-                    else:
-                        # 共享所有方法
-                        item_method = test_method
-                        print(f"DEBUG 拆分: 项目 '{part}' 共享所有方法（方法数量不足）")
-                    
-                    new_item = {
-                        "item_name": part,
-                        "standard_basis": item_basis,
-                        "test_method": item_method,
-                        # 保留其他字段（如来源信息）
-                        **{k: v for k, v in item.items() if k not in ["item_name", "standard_basis", "test_method"]}
-                    }
-                    expanded_items.append(new_item)
-
-            
+                continue
+
+            # 有多个有效部分，拆分为独立项目
+            logger.debug("拆分: 检测到多个项目名称，开始拆分: %s", valid_parts)
+
+            # 同时尝试拆分标准依据和检测方法
+            standard_basis = item.get("standard_basis", "")
+            test_method = item.get("test_method", "")
+
+            basis_parts = standard_basis.split() if standard_basis else []
+
+            # 智能拆分检测方法
+            # 检测方法通常包含多个 GB 标准，用空格分隔
+            # 例如: "GB 23200.19 GB 23200.20 GB 23200.121"，"GB 23200.19" 应该作为一个整体
+            method_parts = []
+            if test_method:
+                method_parts = _METHOD_STANDARD_RE.findall(test_method)
+
+                logger.debug("拆分: 原始方法='%s', 提取到 %d 个方法: %s, 项目数量=%d",
+                             test_method, len(method_parts), method_parts, len(valid_parts))
+
+            # 如果标准依据的数量与项目名称数量匹配，则一一对应
+            # 否则，所有拆分项目共享相同的标准依据
+            for i, part in enumerate(valid_parts):
+                # 分配标准依据
+                if len(basis_parts) == len(valid_parts):
+                    item_basis = basis_parts[i]
+                else:
+                    item_basis = standard_basis
+
+                # 分配检测方法
+                # 策略1: 如果方法数量 >= 项目数量，尝试分配
+                # 策略2: 否则，共享所有方法
+                if len(method_parts) >= len(valid_parts):
+                    # 尝试为每个项目分配对应的方法
+                    # 简单策略：平均分配
+                    methods_per_item = len(method_parts) // len(valid_parts)
+                    start_idx = i * methods_per_item
+                    end_idx = start_idx + methods_per_item
+                    if i == len(valid_parts) - 1:  # 最后一个项目获取剩余所有方法
+                        end_idx = len(method_parts)
+                    item_method = " ".join(method_parts[start_idx:end_idx])
+                    logger.debug("拆分: 项目 '%s' 分配方法: %s", part, item_method)
+                else:
+                    # 共享所有方法
+                    item_method = test_method
+                    logger.debug("拆分: 项目 '%s' 共享所有方法（方法数量不足）", part)
+
+                new_item = {
+                    "item_name": part,
+                    "standard_basis": item_basis,
+                    "test_method": item_method,
+                    # 保留其他字段（如来源信息）
+                    **{k: v for k, v in item.items() if k not in ["item_name", "standard_basis", "test_method"]}
+                }
+                expanded_items.append(new_item)
+
         return expanded_items
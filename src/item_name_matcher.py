@@ -2,8 +2,29 @@
 """
 检验项目名称匹配辅助函数
 处理括号说明、多物质合并等复杂情况
+
+检验项目词典 data/item_aliases.json（GB 2763 农药名称 + 常见污染物/添加剂/兽药/微生物指标及别名，
+如 克百威/呋喃丹）编译成 Aho-Corasick 自动机：
+- 合并的名称按词典做最大匹配切分（"阿维菌素哒螨灵" -> 阿维菌素 / 哒螨灵）
+- 能完全由词典词组成的名称映射为规范项目 ID 集合，两个名称都能映射时按 ID 集合是否相交判断匹配
+  （"甲氨基阿维菌素苯甲酸盐" 不再因为包含 "阿维菌素" 而误匹配），否则退回到子串匹配
 """
+import json
 import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+from aho_corasick import AhoCorasick
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+ITEM_ALIASES_FILE = Path(__file__).resolve().parent / "data" / "item_aliases.json"
+
+# 名称中允许出现在词典词之间的连接符（"甲拌磷和克百威"、"土霉素/金霉素/四环素"）
+_JOINER_CHARS = set("和及与、/，,;；+")
 
 def normalize_item_name(name: str) -> str:
     """
@@ -62,7 +83,13 @@ def extract_item_names(text: str) -> list:
             if len(parts) > 1:
                 return parts
     
-    # 尝试识别常见农药名称模式
+    # 按检验项目词典做最大匹配切分
+    dictionary = get_item_dictionary()
+    if dictionary is not None:
+        parts = dictionary.split(text)
+        return parts if len(parts) > 1 else [text]
+
+    # 词典不可用时: 尝试识别常见农药名称模式
     # 如果包含多个常见后缀,可能是多个物质
     common_suffixes = ['菌素', '灵', '磷', '威', '酯', '醇', '胺', '酮']
     
@@ -94,6 +121,7 @@ def fuzzy_match_item_name(report_name: str, required_name: str) -> bool:
     模糊匹配检验项目名称
     
     匹配规则:
+    0. 两个名称都能映射到词典中的规范项目时，按规范项目 ID 是否相交判断（别名: "呋喃丹" 匹配 "克百威"）
     1. 标准化后完全匹配
     2. 包含关系 (处理详细表述 vs 简化表述)
     3. 提取多个名称后任一匹配 (处理表格解析错误)
@@ -103,29 +131,187 @@ def fuzzy_match_item_name(report_name: str, required_name: str) -> bool:
     - "阿维菌素哒螨灵" 匹配 "阿维菌素" ✓
     - "阿维菌素哒螨灵" 匹配 "哒螨灵" ✓
     """
-    # 标准化
-    norm_report = normalize_item_name(report_name)
-    norm_required = normalize_item_name(required_name)
-    
-    # 1. 完全匹配
-    if norm_report == norm_required:
-        return True
-    
-    # 2. 包含关系
-    if norm_required in norm_report or norm_report in norm_required:
-        return True
-    
-    # 3. 提取多个名称后匹配
-    report_names = extract_item_names(norm_report)
-    required_names = extract_item_names(norm_required)
-    
-    for rn in report_names:
-        for req_n in required_names:
-            # 标准化后再比较
-            rn_norm = normalize_item_name(rn)
-            req_norm = normalize_item_name(req_n)
-            
-            if rn_norm == req_norm or rn_norm in req_norm or req_norm in rn_norm:
-                return True
-    
-    return False
+    return _MatchKey(report_name).matches(_MatchKey(required_name))
+
+
+class ItemDictionary:
+    """
+    检验项目词典（构建后只读，线程安全）
+
+    每个规范项目的 ID 为其在 items 中的下标；名称和别名按 normalize_item_name 标准化后作为模式串
+    """
+
+    def __init__(self, items: Sequence[Dict[str, object]]):
+        self.names: List[str] = []
+        keys: Dict[str, int] = {}
+        for item_id, item in enumerate(items):
+            self.names.append(str(item["name"]))
+            for alias in [item["name"], *item.get("aliases", [])]:
+                key = normalize_item_name(str(alias))
+                # 标准化后重名（"2甲4氯(钠)" -> "2甲4氯"）时保留先出现的项目
+                if key:
+                    keys.setdefault(key, item_id)
+        self._keys = keys
+        self._automaton = AhoCorasick(keys)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def split(self, text: str) -> List[str]:
+        """最大匹配切分出的词典词（原文片段）"""
+        return [text[start:end] for start, end, _ in self._automaton.segment(text)]
+
+    def resolve(self, name: str) -> Optional[FrozenSet[int]]:
+        """
+        名称 -> 规范项目 ID 集合；名称中有词典以外的内容（连接符除外）时返回 None
+        """
+        norm = normalize_item_name(name)
+        if not norm:
+            return None
+        item_id = self._keys.get(norm)
+        if item_id is not None:
+            return frozenset((item_id,))
+        segments = self._automaton.segment(norm)
+        if not segments:
+            return None
+        covered = sum(end - start for start, end, _ in segments)
+        if covered + sum(1 for ch in norm if ch in _JOINER_CHARS) != len(norm):
+            return None
+        return frozenset(item_id for _, _, item_id in segments)
+
+
+_item_dictionary: Optional[ItemDictionary] = None
+_item_dictionary_loaded = False
+_item_dictionary_lock = threading.Lock()
+
+
+def get_item_dictionary() -> Optional[ItemDictionary]:
+    """加载检验项目词典单例；词典文件不存在或损坏时返回 None（退回到子串/后缀规则）"""
+    global _item_dictionary, _item_dictionary_loaded
+    if _item_dictionary_loaded:
+        return _item_dictionary
+    with _item_dictionary_lock:
+        if not _item_dictionary_loaded:
+            try:
+                with open(ITEM_ALIASES_FILE, "r", encoding="utf-8") as f:
+                    _item_dictionary = ItemDictionary(json.load(f)["items"])
+            except Exception as e:
+                logger.warning("检验项目词典加载失败，使用子串匹配: %s", e)
+                _item_dictionary = None
+            _item_dictionary_loaded = True
+        return _item_dictionary
+
+
+def _contains_either(a: str, b: str) -> bool:
+    return a == b or a in b or b in a
+
+
+class _MatchKey:
+    """一个项目名称的预处理结果：标准化名称、拆分出的各物质名称、规范项目 ID（各只计算一次）"""
+
+    __slots__ = ("name", "norm", "parts", "ids")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.norm = normalize_item_name(name)
+        self.parts = [normalize_item_name(p) for p in extract_item_names(self.norm)]
+        dictionary = get_item_dictionary()
+        self.ids = dictionary.resolve(self.norm) if dictionary is not None else None
+
+    def strings(self) -> List[str]:
+        return [self.norm, *self.parts]
+
+    def matches(self, other: "_MatchKey") -> bool:
+        """fuzzy_match_item_name 的匹配规则"""
+        if self.ids is not None and other.ids is not None:
+            return not self.ids.isdisjoint(other.ids)
+        if _contains_either(self.norm, other.norm):
+            return True
+        return any(_contains_either(a, b) for a in self.parts for b in other.parts)
+
+
+@dataclass
+class ItemMatchResult:
+    """报告项目与细则项目的匹配结果"""
+    matched: List[Tuple[str, str]] = field(default_factory=list)   # (细则名称, 报告名称)
+    missing: List[str] = field(default_factory=list)               # 细则有但报告没有
+    extra: List[str] = field(default_factory=list)                 # 报告有但细则没有
+
+
+class ItemMatcher:
+    """
+    细则项目 × 报告项目的批量匹配（替代 fuzzy_match_item_name 的两层循环）
+
+    每个名称只标准化/拆分/查词典一次；用规范项目 ID 和字符 2-gram 倒排索引生成候选，只对候选调用精确判断。
+    两个字符串存在包含关系时，较短的一方（长度 >= 2）的任一 2-gram 必然同时出现在双方中，
+    所以候选集合不会漏掉任何匹配；长度为 1 / 0 的名称单独处理。
+    匹配语义与 fuzzy_match_item_name 完全一致：
+      - 细则项目按顺序取报告中第一个匹配的项目（报告项目顺序）
+      - 与任何细则项目都不匹配的报告项目为多余项目
+    """
+
+    def __init__(self, required_names: Sequence[str]):
+        self.required = [_MatchKey(name) for name in required_names]
+        self._bigrams: Dict[str, Set[int]] = {}
+        self._chars: Dict[str, Set[int]] = {}
+        self._short: Dict[str, Set[int]] = {}    # 单字名称（按该字索引）
+        self._empty: Set[int] = set()            # 标准化后为空的名称，与任何名称都匹配
+        self._ids: Dict[int, Set[int]] = {}      # 规范项目 ID（别名匹配没有公共子串）
+        for idx, key in enumerate(self.required):
+            for item_id in key.ids or ():
+                self._ids.setdefault(item_id, set()).add(idx)
+            for text in key.strings():
+                if not text:
+                    self._empty.add(idx)
+                elif len(text) == 1:
+                    self._short.setdefault(text, set()).add(idx)
+                for ch in text:
+                    self._chars.setdefault(ch, set()).add(idx)
+                for i in range(len(text) - 1):
+                    self._bigrams.setdefault(text[i:i + 2], set()).add(idx)
+
+    def _candidates(self, key: _MatchKey) -> Set[int]:
+        strings = key.strings()
+        if any(not text for text in strings):
+            return set(range(len(self.required)))
+        candidates = set(self._empty)
+        for item_id in key.ids or ():
+            candidates |= self._ids.get(item_id, set())
+        for text in strings:
+            if len(text) == 1:
+                # 报告侧单字名称: 细则名称包含该字即可能匹配
+                candidates |= self._chars.get(text, set())
+            for ch in text:
+                # 细则侧单字名称: 报告名称包含该字即可能匹配
+                candidates |= self._short.get(ch, set())
+            for i in range(len(text) - 1):
+                candidates |= self._bigrams.get(text[i:i + 2], set())
+        return candidates
+
+    def relation(self, report_names: Sequence[str]) -> List[List[int]]:
+        """每个报告项目匹配的细则项目下标（升序）"""
+        result = []
+        for name in report_names:
+            key = _MatchKey(name)
+            result.append(sorted(i for i in self._candidates(key) if key.matches(self.required[i])))
+        return result
+
+    def match(self, report_names: Sequence[str]) -> ItemMatchResult:
+        """一次计算 matched / missing / extra"""
+        report_names = list(report_names)
+        relation = self.relation(report_names)
+
+        first_report: Dict[int, int] = {}
+        for report_idx, required_ids in enumerate(relation):
+            for req_idx in required_ids:
+                first_report.setdefault(req_idx, report_idx)
+
+        result = ItemMatchResult()
+        for req_idx, key in enumerate(self.required):
+            report_idx = first_report.get(req_idx)
+            if report_idx is None:
+                result.missing.append(key.name)
+            else:
+                result.matched.append((key.name, report_names[report_idx]))
+        result.extra = [name for name, required_ids in zip(report_names, relation) if not required_ids]
+        return result
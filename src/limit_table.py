@@ -0,0 +1,312 @@
+"""
+GB 2763 限量证据结构化解析与批量合规判定
+
+原来的做法是在整段限量 chunk 文本中找第一个 "≤数字" 作为限量，经常取到同一 chunk 中
+其他食品（甚至其他农药）的限量，也不区分 mg/kg / μg/kg，造成误判 "超标"。这里：
+
+- parse_limit_rows: 限量证据（RAGFlow 检索到的 GB 2763 chunk，HTML 表格或文本；
+  或本地索引渲染的证据）解析为 LimitRow(食品/类别, 数值, 单位, 比较方式, 所属农药)，
+  同一 chunk 只解析一次（进程内 LRU）
+- select_limit: 按 具体食品名 -> 所属大类 的顺序选出适用的那一行，"(黄瓜除外)" 的行不用于黄瓜
+- check_limits: 报告检测值与限量换算到同一单位后，一份报告的全部项目用 NumPy 一次比对
+"""
+from __future__ import annotations
+
+import functools
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from html_table_engine import extract_tables
+
+
+# 比较方式
+CMP_MAX = "max"   # ≤ 限量（GB 2763 的最大残留限量，没有符号时默认）
+CMP_LT = "lt"     # < 限量
+CMP_MIN = "min"   # ≥ 下限
+CMP_ND = "nd"     # 不得检出
+
+_CMP_CODES = {CMP_MAX: 1, CMP_LT: 2, CMP_MIN: 3, CMP_ND: 4}
+_CMP_SIGNS = {"≤": CMP_MAX, "<=": CMP_MAX, "<": CMP_LT, "≥": CMP_MIN, ">=": CMP_MIN}
+
+DEFAULT_UNIT = "mg/kg"   # GB 2763 的限量单位
+
+# 规范化单位 -> (量纲, 换算到该量纲基准单位的系数)；基准: 质量分数 mg/kg，质量浓度 mg/L
+UNIT_FACTORS: Dict[str, Tuple[str, float]] = {
+    "mg/kg": ("mass", 1.0),
+    "ppm": ("mass", 1.0),
+    "μg/g": ("mass", 1.0),
+    "μg/kg": ("mass", 1e-3),
+    "ppb": ("mass", 1e-3),
+    "ng/g": ("mass", 1e-3),
+    "mg/g": ("mass", 1e3),
+    "g/kg": ("mass", 1e3),
+    "mg/100g": ("mass", 10.0),
+    "g/100g": ("mass", 1e4),
+    "%": ("mass", 1e4),
+    "mg/l": ("volume", 1.0),
+    "μg/l": ("volume", 1e-3),
+    "μg/ml": ("volume", 1.0),
+    "mg/ml": ("volume", 1e3),
+    "g/l": ("volume", 1e3),
+    "mg/100ml": ("volume", 10.0),
+}
+
+_UNIT_PATTERN = r"(?:[mμu]?g|ng)\s*/\s*(?:100\s*)?(?:kg|g|ml|l)(?![a-z])|ppm|ppb|%"
+_UNIT_RE = re.compile(_UNIT_PATTERN, re.I)
+# 表头中的单位: "最大残留限量,mg/kg"、"限量/(mg/kg)"
+_HEADER_UNIT_RE = re.compile(r"限量[^\n\d]{0,4}?[,，/(（]\s*\(?\s*(" + _UNIT_PATTERN + ")", re.I)
+
+# 一行中的 "食品 [比较符] 数值 [单位]" 或 "食品 不得检出"，一行可以有多组
+_ROW_RE = re.compile(
+    r"(?P<food>[\u4e00-\u9fa5][^\d≤≥<>]*?)\s*"
+    r"(?:(?P<nd>不得检出)|(?P<cmp>≤|<=|≥|>=|<)?\s*(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>" + _UNIT_PATTERN + r")?)",
+    re.I,
+)
+# 表号、标准号不是限量数值（"表10"、"GB 2763-2021"）
+_REFERENCE_RE = re.compile(r"表\s*\d+(?:\s*\(续\))?|(?:GB|NY|SN)(?:/T)?\s*\d+(?:\.\d+)*(?:\s*[-—]\s*\d{4})?", re.I)
+# GB 2763 中每种农药的章节标题 "4.10 阿维菌素(abamectin)"（"4.10.1 主要用途" 这类小节不算）
+_SECTION_RE = re.compile(r"^\s*4\.\d+(?![\d.])\s*([\u4e00-\u9fa5][^\s(]*)")
+_BARE_VALUE_RE = re.compile(r"^\s*(?:≤|<=|<)?\s*\d+(?:\.\d+)?\s*(?:" + _UNIT_PATTERN + r")?\s*$", re.I)
+_CJK_RE = re.compile(r"[\u4e00-\u9fa5]")
+_TABLE_SPLIT_RE = re.compile(r"(<table.*?</table>)", re.S | re.I)
+_TAG_RE = re.compile(r"<[^>]+>")
+_EXCLUDE_RE = re.compile(r"\(([^()]*)除外\)")
+_FOOD_STRIP_RE = re.compile(r"[\s:：,，、∗*]+$|^[\s:：,，、∗*]+")
+
+_ND_WORDS = ("未检出", "不得检出")
+# "ND"、"N.D." 只按独立的词匹配，"endosulfan"、"indoxacarb" 这类单词中的 nd 不算
+_ND_TOKEN_RE = re.compile(r"(?<![A-Za-z])N\.?D\.?(?![A-Za-z])", re.I)
+_CENSORED_PREFIXES = ("<", "小于", "低于")
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?(?:[eE]-?\d+)?")
+
+
+def normalize_unit(text: Optional[str]) -> Optional[str]:
+    """
+    单位规范化: "μg/kg"、"ug/kg"、"µg / kg" -> "μg/kg"；"mg/L" -> "mg/l"
+    无法识别时返回 None
+    """
+    if not text:
+        return None
+    unit = unicodedata.normalize("NFKC", text).strip().lower().replace(" ", "")
+    unit = unit.replace("µ", "μ")
+    if unit.startswith("ug"):
+        unit = "μ" + unit[1:]
+    return unit if unit in UNIT_FACTORS else None
+
+
+@dataclass(frozen=True)
+class LimitRow:
+    """限量表中的一行"""
+    food: str                     # 食品类别/名称，如 "瓜类蔬菜"、"柑橘类水果(柑、橘、橙除外)"
+    value: float
+    value_text: str               # 原始数值文本，展示时保留 "0.020" 这类写法
+    unit: str                     # 规范化单位
+    comparator: str               # CMP_*
+    sign: str = ""                # 原始比较符（GB 2763 表格中通常没有）
+    section: Optional[str] = None  # 所属农药章节（文本 chunk 中可识别时）
+
+    def describe(self) -> str:
+        """用于展示的限量文本: "0.02 mg/kg"、"≤0.5 mg/kg"、"不得检出" """
+        if self.comparator == CMP_ND:
+            return "不得检出"
+        return f"{self.sign}{self.value_text} {self.unit}"
+
+    def excludes(self, food_name: str) -> bool:
+        """该行是否明确排除了某种食品（"瓜类蔬菜(黄瓜除外)"）"""
+        return any(food_name in m.group(1) for m in _EXCLUDE_RE.finditer(self.food))
+
+
+@dataclass(frozen=True)
+class Measurement:
+    """报告中的检测值"""
+    value: float                  # "<0.01"、"未检出"、"ND" 记为 0
+    unit: Optional[str]           # 规范化单位；报告未写单位时为 None（按限量单位比较）
+    text: str
+    unit_known: bool = True       # 报告写了单位但无法识别（如 "CFU/g"）时为 False，不做比较
+
+
+def _content_lines(content: str) -> List[str]:
+    """按出现顺序展开为文本行：表格每行拼成一行，表格以外的文字（标题、章节名）按原有换行"""
+    lines: List[str] = []
+    for i, part in enumerate(_TABLE_SPLIT_RE.split(content)):
+        if i % 2:
+            for grid in extract_tables(part):
+                lines.extend(" ".join(cell for cell in row if cell) for row in grid)
+        else:
+            lines.extend(_TAG_RE.sub(" ", part).split("\n"))
+    return lines
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_limit_rows(content: str) -> Tuple[LimitRow, ...]:
+    """
+    把一段限量证据解析为 LimitRow 序列（按出现顺序）
+
+    单位优先取行内单位，其次取表头 "最大残留限量,mg/kg" 中的单位，都没有时为 mg/kg
+    """
+    if not content:
+        return ()
+    text = unicodedata.normalize("NFKC", content)
+    header_unit = _HEADER_UNIT_RE.search(text)
+    default_unit = normalize_unit(header_unit.group(1)) if header_unit else None
+    default_unit = default_unit or DEFAULT_UNIT
+
+    rows: List[LimitRow] = []
+    section: Optional[str] = None
+    pending_food = ""   # 只有食品名、数值在下一行的行（PDF 文本中长类别名常被折行）
+    for line in _content_lines(text):
+        header = _SECTION_RE.match(line)
+        if header:
+            section = header.group(1)
+            pending_food = ""
+            continue
+        line = _REFERENCE_RE.sub(" ", line)
+        if pending_food and _BARE_VALUE_RE.match(line):
+            line = f"{pending_food} {line}"
+        matches = list(_ROW_RE.finditer(line))
+        pending_food = line.strip() if not matches and _CJK_RE.search(line) else ""
+        for m in matches:
+            food = _FOOD_STRIP_RE.sub("", m.group("food"))
+            if not food:
+                continue
+            if m.group("nd"):
+                rows.append(LimitRow(food, 0.0, "", default_unit, CMP_ND, section=section))
+                continue
+            unit = normalize_unit(m.group("unit")) if m.group("unit") else default_unit
+            if unit is None:
+                continue
+            sign = m.group("cmp") or ""
+            rows.append(LimitRow(
+                food=food,
+                value=float(m.group("value")),
+                value_text=m.group("value"),
+                unit=unit,
+                comparator=_CMP_SIGNS.get(sign, CMP_MAX),
+                sign="≤" if sign == "<=" else ("≥" if sign == ">=" else sign),
+                section=section,
+            ))
+    return tuple(rows)
+
+
+def select_limit(
+    rows: Sequence[LimitRow],
+    food_candidates: Sequence[str],
+    item_name: Optional[str] = None,
+) -> Optional[LimitRow]:
+    """
+    选出适用于该食品的限量行
+
+    :param food_candidates: 从具体到宽泛的食品名称（["黄瓜", "瓜类蔬菜"]）
+    :param item_name: 检验项目；chunk 中能识别农药章节时，只使用该项目章节内的行
+                      （没有章节标题的行视为上一个表的续表，项目章节不在 chunk 中时使用）
+    """
+    if not rows or not food_candidates:
+        return None
+    if item_name:
+        own = [r for r in rows if r.section and item_name in r.section]
+        rows = own or [r for r in rows if r.section is None]
+
+    food_name = food_candidates[0]
+    usable = [r for r in rows if not r.excludes(food_name)]
+    for candidate in food_candidates:
+        if not candidate:
+            continue
+        # 先精确匹配（整个类别名或其中一个词），再包含匹配（"瓜类蔬菜(黄瓜除外)" 已排除）
+        for row in usable:
+            if row.food == candidate or candidate in row.food.split():
+                return row
+        for row in usable:
+            if candidate in _EXCLUDE_RE.sub("", row.food):
+                return row
+    return None
+
+
+def parse_measurement(value_text: Optional[str], unit_text: Optional[str] = None) -> Optional[Measurement]:
+    """
+    解析报告检测值
+
+    "0.052" -> 0.052；"<0.01"、"未检出"、"ND" -> 0（视为未检出/合规边界）
+    单位取检测值中自带的单位，其次取报告的计量单位列
+    """
+    if value_text is None:
+        return None
+    text = str(value_text).strip()
+    if not text:
+        return None
+
+    normalized = unicodedata.normalize("NFKC", text)
+    inline_unit = _UNIT_RE.search(normalized)
+    unit_source = inline_unit.group(0) if inline_unit else (unit_text or "").strip()
+    unit = normalize_unit(unit_source) if unit_source else None
+    unit_known = not unit_source or unit is not None
+    display = text if inline_unit or not unit_source else f"{text} {unit_source}"
+
+    if any(w in normalized for w in _ND_WORDS) or _ND_TOKEN_RE.search(normalized):
+        return Measurement(0.0, unit, display, unit_known)
+    if normalized.startswith(_CENSORED_PREFIXES):
+        return Measurement(0.0, unit, display, unit_known)
+    match = _NUMBER_RE.search(normalized)
+    if not match:
+        return None
+    return Measurement(float(match.group(0)), unit, display, unit_known)
+
+
+def check_limits(
+    measurements: Sequence[Optional[Measurement]],
+    limits: Sequence[Optional[LimitRow]],
+) -> List[Optional[str]]:
+    """
+    批量合规判定（NumPy 一次比对）
+
+    返回与输入等长的列表：None 表示合规或无法判断（缺少检测值/限量、量纲不一致），
+    否则为问题描述
+    """
+    n = len(measurements)
+    values = np.full(n, np.nan)
+    bounds = np.full(n, np.nan)
+    codes = np.zeros(n, dtype=np.int8)
+
+    for i, (m, limit) in enumerate(zip(measurements, limits)):
+        if m is None or limit is None or not m.unit_known:
+            continue
+        codes[i] = _CMP_CODES[limit.comparator]
+        values[i] = m.value
+        if limit.comparator == CMP_ND:
+            continue
+        dimension, limit_factor = UNIT_FACTORS[limit.unit]
+        if m.unit is None:
+            factor = limit_factor          # 报告未写单位，按限量单位理解
+        else:
+            m_dimension, factor = UNIT_FACTORS[m.unit]
+            if m_dimension != dimension:
+                codes[i] = 0
+                continue
+        values[i] = m.value * factor
+        bounds[i] = limit.value * limit_factor
+
+    measured = ~np.isnan(values)
+    comparable = measured & ~np.isnan(bounds)
+    with np.errstate(invalid="ignore"):
+        # 换算后的浮点误差不算超标（0.02 mg/kg 与 20 μg/kg）
+        equal = np.isclose(values, bounds, rtol=1e-9, atol=0.0)
+        over = (
+            (comparable & (codes == _CMP_CODES[CMP_MAX]) & (values > bounds) & ~equal)
+            | (comparable & (codes == _CMP_CODES[CMP_LT]) & ((values > bounds) | equal))
+        )
+        under = comparable & (codes == _CMP_CODES[CMP_MIN]) & (values < bounds) & ~equal
+        detected = measured & (codes == _CMP_CODES[CMP_ND]) & (values > 0)
+
+    issues: List[Optional[str]] = [None] * n
+    for i in np.flatnonzero(over | under | detected):
+        m, limit = measurements[i], limits[i]
+        if detected[i]:
+            issues[i] = f"要求不得检出，实际检出 {m.text}"
+        elif over[i]:
+            issues[i] = f"超标 (实测 {m.text} > 限量 {limit.describe()})"
+        else:
+            issues[i] = f"低于下限 (实测 {m.text} < 下限 {limit.describe()})"
+    return issues
@@ -0,0 +1,12 @@
+"""
+本地离线索引
+
+由仓库附带的标准文件离线构建，替代运行时的 RAGFlow 检索（RAGFlow 仅作为兜底）：
+
+- gb2763_index: GB 2763-2021 最大残留限量（农药 × 食品 -> 限量值），
+  构建: python -m local_index.gb2763_index
+- rules_index: 食品安全监督抽检实施细则检验项目表（食品 -> 检验项目、依据、方法、页码），
+  构建: python -m local_index.rules_index
+- bm25_retriever: 知识库 PDF 的本地 BM25 检索引擎（RAGFlowClient 兼容接口），
+  配置 RAGFLOW_BACKEND=local 时由 get_ragflow_client 返回
+"""
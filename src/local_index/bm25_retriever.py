@@ -0,0 +1,424 @@
+"""
+本地 BM25 检索引擎（RAGFlow 兼容接口）
+
+离线运行或需要低延迟时替代 RAGFlow 服务：直接对知识库 PDF 分块建立倒排索引，
+检索结果与 RAGFlowClient._process_results 的格式完全一致
+（content / score / chunk_id / doc_name / document_id / page_num），调用方无需改动。
+
+- 分块: 按页提取文本块，累积到约 CHUNK_CHARS 个字符为一个 chunk；
+  tables="html" 的文档用 PyMuPDF find_tables 把表格单独切成 HTML 表格 chunk（同 RAGFlow 的表格解析），
+  tables="text" 的文档（GB 2763 限量表为多行单元格）按版面行提取文本（"黄瓜 0.02"），便于逐行提取限量
+- 分词: 中文按字的 1-gram + 2-gram，英文/数字按连续串（"GB 23200.8" -> "gb", "23200.8"），
+  另加汉字 + 编号（"表10"），表号检索不会匹配到所有含 "10" 的 chunk
+- 打分: BM25（k1=1.2, b=0.75），倒排表按 CSR 存成 NumPy 数组，每个词项的权重在建索引时预先算好，
+  检索只是若干次数组切片累加，单次检索在毫秒级
+- score: 除以本次检索的最高分，归一化到 0~1（与 RAGFlow similarity 的量级一致，
+  similarity_threshold 按归一化后的分数过滤）
+
+分块结果缓存在 static/cache/local_retrieval/<document_id>.json（PDF 修改后自动重新分块），
+倒排索引在进程启动后首次检索时构建。
+
+配置（config.local.json）:
+    "RAGFLOW_BACKEND": "local",
+    "RAGFLOW_LOCAL_DATASETS": {"<细则知识库 ID>": ["static/files/2025年食品安全监督抽检实施细则.pdf"],
+                               "<国标知识库 ID>": [{"path": "static/files/GB 2763-2021.pdf", "tables": "text"}]}
+未配置 RAGFLOW_LOCAL_DATASETS 时使用仓库附带的两个 PDF（知识库 ID 取 RAGFLOW_KB_ID / RAGFLOW_KB_ID_GB）。
+"""
+from __future__ import annotations
+
+import hashlib
+import html
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app_logging import get_logger
+from ragflow_cache import CACHE_DIR, _load_json, _write_json_atomic
+from local_index.gb2763_index import GB2763_PDF, normalize_text
+from local_index.rules_index import RULES_PDF
+
+logger = get_logger(__name__)
+
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+
+CHUNKS_DIR = CACHE_DIR / "local_retrieval"
+CHUNK_SCHEMA_VERSION = 3
+CHUNK_CHARS = 600
+
+DEFAULT_RULES_KB_ID = "local-rules"
+DEFAULT_GB_KB_ID = "local-gb"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_CJK_RUN_RE = re.compile(r"[一-鿿]+")
+_WORD_RE = re.compile(r"[a-z0-9]+(?:[./][a-z0-9]+)*")
+# 汉字 + 编号（"表10"、"表34-15"），避免表号查询退化成匹配所有含 "10" 的 chunk
+_NUMBERED_RE = re.compile(r"[一-鿿]\s?[0-9]+(?:[.-][0-9]+)*")
+# PDF 私有区字形（目次的点线引导符等），normalize_text 之后仍残留的部分
+_PRIVATE_USE_RE = re.compile("[\U00100000-\U0010fffd]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """中文 1-gram + 2-gram，英文/数字整串，汉字 + 编号（HTML 标签不参与分词）"""
+    text = normalize_text(_TAG_RE.sub(" ", text)).lower()
+    tokens: List[str] = []
+    for run in _CJK_RUN_RE.findall(text):
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    tokens.extend(_WORD_RE.findall(text))
+    tokens.extend(t.replace(" ", "") for t in _NUMBERED_RE.findall(text))
+    return tokens
+
+
+def document_id(path: Path) -> str:
+    return "local-" + hashlib.sha1(Path(path).name.encode("utf-8")).hexdigest()[:16]
+
+
+# ---------------------------------------------------------------------- 分块
+
+def _table_html(rows: List[List[Optional[str]]]) -> str:
+    parts = ["<table>"]
+    for i, row in enumerate(rows):
+        tag = "th" if i == 0 else "td"
+        cells = ("".join((c or "").split()) if i == 0 else " ".join((c or "").split()) for c in row)
+        parts.append("<tr>" + "".join(f"<{tag}>{html.escape(c)}</{tag}>" for c in cells) + "</tr>")
+    parts.append("</table>")
+    return "".join(parts)
+
+
+def _layout_lines(page: Any, tolerance: float = 3.0) -> List[Tuple[float, str]]:
+    """
+    按版面行提取文本：纵向中心相近的词（跨列）合并为一行
+    GB 2763 限量表的 "食品类别/名称" 与 "限量" 是两列，合并后为 "黄瓜 0.02"，便于逐行提取限量
+    """
+    words = sorted(page.get_text("words"), key=lambda w: ((w[1] + w[3]) / 2, w[0]))
+    lines: List[Tuple[float, List[Any]]] = []
+    for word in words:
+        center = (word[1] + word[3]) / 2
+        if lines and abs(center - lines[-1][0]) <= tolerance:
+            lines[-1][1].append(word)
+        else:
+            lines.append((center, [word]))
+    result = []
+    for center, line_words in lines:
+        text = " ".join(w[4] for w in sorted(line_words, key=lambda w: w[0]))
+        text = _PRIVATE_USE_RE.sub("", normalize_text(text)).strip()
+        if text:
+            result.append((center, text))
+    return result
+
+
+def _block_pieces(page: Any) -> List[Tuple[float, str, bool]]:
+    """文本块 + HTML 表格，按纵向位置排列 [(y, 文本, 是否表格)]"""
+    table_boxes: List[Tuple[Tuple[float, float, float, float], str]] = []
+    if "序号" in page.get_text():
+        for found in page.find_tables().tables:
+            rows = found.extract()
+            if rows:
+                table_boxes.append((tuple(found.bbox), _table_html(rows)))
+
+    pieces: List[Tuple[float, str, bool]] = []
+    for block in page.get_text("blocks"):
+        cx, cy = (block[0] + block[2]) / 2, (block[1] + block[3]) / 2
+        if any(x0 <= cx <= x1 and y0 <= cy <= y1 for (x0, y0, x1, y1), _ in table_boxes):
+            continue
+        text = _PRIVATE_USE_RE.sub("", normalize_text(block[4])).strip()
+        if text:
+            pieces.append((block[1], text, False))
+    pieces.extend((box[1], content, True) for box, content in table_boxes)
+    pieces.sort(key=lambda p: p[0])
+    return pieces
+
+
+def chunk_pdf(pdf_path: Path, tables: str = "html", chunk_chars: int = CHUNK_CHARS) -> List[Dict[str, Any]]:
+    """
+    PDF -> chunks [{"content", "page_num"}]
+
+    :param tables: "html" 表格单独成块（表格上方的表题并入该块）；"text" 按版面行提取（表格各列合并为一行）
+    """
+    if not PYMUPDF_AVAILABLE:
+        raise RuntimeError("本地检索引擎分块需要 PyMuPDF (pip install pymupdf)")
+
+    chunks: List[Dict[str, Any]] = []
+    doc = fitz.open(str(pdf_path))
+    try:
+        for page_index in range(doc.page_count):
+            page = doc[page_index]
+            page_num = page_index + 1
+            if tables == "text":
+                pieces = [(y, text, False) for y, text in _layout_lines(page)]
+            else:
+                pieces = _block_pieces(page)
+
+            buffer: List[str] = []
+            for _, text, is_table in pieces:
+                if is_table:
+                    # 表题（紧挨着表格的上一段文本）与表格放在同一个 chunk
+                    caption = buffer.pop() if buffer and buffer[-1].startswith("表") else ""
+                    if buffer:
+                        chunks.append({"content": "\n".join(buffer), "page_num": page_num})
+                        buffer = []
+                    chunks.append({"content": f"{caption}\n{text}" if caption else text, "page_num": page_num})
+                    continue
+                if buffer and sum(len(t) for t in buffer) + len(text) > chunk_chars:
+                    chunks.append({"content": "\n".join(buffer), "page_num": page_num})
+                    buffer = []
+                buffer.append(text)
+            if buffer:
+                chunks.append({"content": "\n".join(buffer), "page_num": page_num})
+    finally:
+        doc.close()
+    return chunks
+
+
+def load_document_chunks(pdf_path: Path, tables: str = "html") -> List[Dict[str, Any]]:
+    """读取分块缓存；PDF 修改（大小/修改时间变化）或分块规则变化后重新分块"""
+    pdf_path = Path(pdf_path)
+    stat = pdf_path.stat()
+    signature = [CHUNK_SCHEMA_VERSION, stat.st_size, int(stat.st_mtime), tables, CHUNK_CHARS]
+    cache_path = CHUNKS_DIR / f"{document_id(pdf_path)}.json"
+    cached = _load_json(cache_path, None)
+    if cached and cached.get("signature") == signature:
+        return cached["chunks"]
+
+    start = time.time()
+    chunks = chunk_pdf(pdf_path, tables=tables)
+    logger.info("本地检索分块: %s -> %d 个 chunk (%.1fs)", pdf_path.name, len(chunks), time.time() - start)
+    try:
+        _write_json_atomic(cache_path, {"signature": signature, "chunks": chunks})
+    except Exception as e:
+        logger.warning("本地检索分块缓存保存失败: %s", e)
+    return chunks
+
+
+# ---------------------------------------------------------------------- 索引
+
+class BM25Index:
+    """
+    BM25 倒排索引（构建后只读，线程安全）
+
+    postings 按 CSR 存放: 词项 t 的文档为 doc_ids[offsets[t]:offsets[t+1]]，
+    对应的 BM25 权重（idf × tf 饱和项）为 weights[offsets[t]:offsets[t+1]]
+    """
+
+    def __init__(self, texts: Sequence[str], k1: float = BM25_K1, b: float = BM25_B):
+        n_docs = len(texts)
+        doc_len = np.zeros(n_docs, dtype=np.float32)
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_len[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf))
+
+        avgdl = float(doc_len.mean()) if n_docs else 1.0
+        norm = k1 * (1 - b + b * doc_len / max(avgdl, 1.0))
+
+        self.n_docs = n_docs
+        self.vocab: Dict[str, int] = {}
+        offsets = [0]
+        doc_ids: List[int] = []
+        tfs: List[int] = []
+        for term_id, (term, plist) in enumerate(postings.items()):
+            self.vocab[term] = term_id
+            doc_ids.extend(d for d, _ in plist)
+            tfs.extend(tf for _, tf in plist)
+            offsets.append(len(doc_ids))
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)
+
+        tf_arr = np.asarray(tfs, dtype=np.float32)
+        df = np.diff(self.offsets).astype(np.float32)
+        idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        term_of_posting = np.repeat(np.arange(len(df)), np.diff(self.offsets))
+        self.weights = (idf[term_of_posting] * tf_arr * (k1 + 1) / (tf_arr + norm[self.doc_ids])).astype(np.float32)
+
+    def scores(self, query: str, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """query 对全部文档的 BM25 分数（mask 为 False 的文档置 0）"""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            lo, hi = self.offsets[term_id], self.offsets[term_id + 1]
+            # 同一词项的 postings 中文档不重复，可以直接花式索引累加
+            scores[self.doc_ids[lo:hi]] += self.weights[lo:hi]
+        if mask is not None:
+            scores[~mask] = 0
+        return scores
+
+
+# ---------------------------------------------------------------------- 客户端
+
+class LocalRetrievalClient:
+    """
+    与 RAGFlowClient 接口兼容的本地检索客户端
+
+    query / query_adaptive / find_document_ids / is_available 以及 query_inspection_items 等
+    便捷方法的语义与 RAGFlowClient 相同；服务端过滤参数中 document_ids / similarity_threshold / top_k
+    在本地生效，vector_similarity_weight / keyword 没有对应概念，忽略
+    """
+
+    def __init__(self, datasets: Dict[str, List[Dict[str, Any]]], kb_id: str):
+        """
+        :param datasets: {知识库 ID: [{"path": PDF 路径, "tables": "html" | "text"}, ...]}
+        :param kb_id: 默认检索的知识库 ID（细则知识库）
+        """
+        self.kb_id = kb_id
+        self.datasets = datasets
+        # 与 RAGFlowClient 一致的属性：本地检索不需要结果缓存
+        self.cache = None
+        self._index: Optional[BM25Index] = None
+        self._index_lock = threading.Lock()
+        self._chunks: List[Dict[str, Any]] = []
+        self._dataset_of: Optional[np.ndarray] = None
+        self._document_of: Optional[np.ndarray] = None
+        self._dataset_codes: Dict[str, int] = {}
+        self._document_codes: Dict[str, int] = {}
+        self._document_names: Dict[str, str] = {}
+        logger.info("LocalRetrievalClient 初始化: KB_ID=%s, 知识库=%s", self.kb_id, list(datasets))
+
+    def _ensure_index(self) -> BM25Index:
+        with self._index_lock:
+            if self._index is not None:
+                return self._index
+            start = time.time()
+            chunks: List[Dict[str, Any]] = []
+            dataset_of: List[int] = []
+            document_of: List[int] = []
+            for dataset_id, documents in self.datasets.items():
+                dataset_code = self._dataset_codes.setdefault(dataset_id, len(self._dataset_codes))
+                for spec in documents:
+                    path = Path(spec["path"])
+                    if not path.exists():
+                        logger.warning("本地检索: 文档不存在，跳过 %s", path)
+                        continue
+                    doc_id = document_id(path)
+                    doc_code = self._document_codes.setdefault(doc_id, len(self._document_codes))
+                    self._document_names[doc_id] = path.name
+                    for n, chunk in enumerate(load_document_chunks(path, spec.get("tables", "html"))):
+                        chunks.append({
+                            "content": chunk["content"],
+                            "chunk_id": f"{doc_id}-{n}",
+                            "doc_name": path.name,
+                            "document_id": doc_id,
+                            "page_num": chunk["page_num"],
+                        })
+                        dataset_of.append(dataset_code)
+                        document_of.append(doc_code)
+            self._chunks = chunks
+            self._dataset_of = np.asarray(dataset_of, dtype=np.int32)
+            self._document_of = np.asarray(document_of, dtype=np.int32)
+            self._index = BM25Index([c["content"] for c in chunks])
+            logger.info(
+                "本地检索索引构建完成: %d 个 chunk, %d 个词项 (%.1fs)",
+                len(chunks), len(self._index.vocab), time.time() - start,
+            )
+            return self._index
+
+    # ------------------------------------------------------------------ RAGFlowClient 接口
+
+    def query_inspection_items(self, food_name: str, custom_query: str = None) -> List[Dict[str, Any]]:
+        return self.query(custom_query if custom_query else f"{food_name}检验项目")
+
+    def query_test_methods(self, item_name: str) -> List[Dict[str, Any]]:
+        return self.query(f"{item_name}检测方法")
+
+    def query_gb_standards(self, standard_num: str) -> List[Dict[str, Any]]:
+        return self.query(f"GB {standard_num}")
+
+    def query_standard_limit(self, standard_code: str, item_name: str, kb_id: str = None) -> List[Dict[str, Any]]:
+        return self.query(f"{standard_code} {item_name} 标准限量 指标要求", dataset_ids=[kb_id] if kb_id else None)
+
+    def query_standard_indicators(self, food_name: str, item_name: str, standard_code: str = None, kb_id: str = None) -> List[Dict[str, Any]]:
+        return self.query_standard_limit(standard_code if standard_code else "GB 2763", item_name, kb_id=kb_id)
+
+    def query(self, question: str, dataset_ids: List[str] = None, page_size: int = 30,
+              similarity_threshold: Optional[float] = None, top_k: Optional[int] = None,
+              document_ids: Optional[List[str]] = None, **_ignored: Any) -> List[Dict[str, Any]]:
+        """
+        BM25 检索，返回格式同 RAGFlowClient.query（按分数降序）
+
+        :param top_k: 参与排序的候选数（同 RAGFlow，结果数仍由 page_size 决定）
+        """
+        index = self._ensure_index()
+        if not index.n_docs:
+            return []
+
+        target_ids = [d for d in (dataset_ids or []) if d] or [self.kb_id]
+        mask = np.isin(self._dataset_of, [self._dataset_codes.get(d, -1) for d in target_ids])
+        if document_ids:
+            mask &= np.isin(self._document_of, [self._document_codes.get(d, -1) for d in document_ids])
+        scores = index.scores(question, mask)
+
+        limit = min(page_size, top_k or page_size, index.n_docs)
+        top = np.argpartition(-scores, limit - 1)[:limit] if limit < index.n_docs else np.arange(index.n_docs)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        best = float(scores[top[0]]) if len(top) else 0.0
+        if best <= 0:
+            return []
+
+        results = []
+        for doc in top:
+            score = float(scores[doc]) / best
+            if scores[doc] <= 0 or (similarity_threshold is not None and score < similarity_threshold):
+                break
+            results.append({**self._chunks[doc], "score": round(score, 4)})
+        return results
+
+    def query_adaptive(
+        self,
+        question: str,
+        accept: Callable[[Dict[str, Any]], bool],
+        min_usable: int = 1,
+        page_sizes: Sequence[int] = (5, 10, 20, 30),
+        dataset_ids: List[str] = None,
+        **filters: Any,
+    ) -> List[Dict[str, Any]]:
+        """本地检索没有网络开销，直接按最大一档返回（结果与逐档扩大一致）"""
+        return self.query(question, dataset_ids=dataset_ids, page_size=max(page_sizes), **filters)
+
+    def find_document_ids(self, dataset_id: str, keyword: str) -> List[str]:
+        self._ensure_index()
+        return [
+            doc_id for doc_id, name in self._document_names.items()
+            if keyword in name and any(document_id(Path(s["path"])) == doc_id for s in self.datasets.get(dataset_id, []))
+        ]
+
+    def is_available(self) -> bool:
+        return True
+
+    def bump_dataset_version(self, dataset_id: str, version: str = None) -> Optional[str]:
+        return None
+
+
+def _dataset_specs(config: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    configured = config.get("RAGFLOW_LOCAL_DATASETS")
+    if not configured:
+        configured = {
+            config.get("RAGFLOW_KB_ID") or DEFAULT_RULES_KB_ID: [str(RULES_PDF)],
+            config.get("RAGFLOW_KB_ID_GB") or DEFAULT_GB_KB_ID: [{"path": str(GB2763_PDF), "tables": "text"}],
+        }
+    return {
+        dataset_id: [spec if isinstance(spec, dict) else {"path": spec} for spec in documents]
+        for dataset_id, documents in configured.items()
+    }
+
+
+def create_local_retrieval_client(config: Dict[str, Any]) -> LocalRetrievalClient:
+    """RAGFLOW_BACKEND=local 时由 get_ragflow_client 调用"""
+    datasets = _dataset_specs(config)
+    kb_id = config.get("RAGFLOW_KB_ID") or next(iter(datasets))
+    return LocalRetrievalClient(datasets, kb_id)
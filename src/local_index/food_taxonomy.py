@@ -0,0 +1,386 @@
+"""
+GB 2763-2021 附录 A 食品分类索引
+
+限量表中的很多限量是按类别给出的（"瓜类蔬菜 0.5"、"柑橘类水果(柑、橘、橙除外) 1"），
+核验某种食品的限量需要知道它属于哪些类别。原来 ragflow_verifier.FOOD_CATEGORY_MAPPING
+只手写了约 20 种蔬菜，其余食品查不到类别。
+
+附录 A "食品类别及测定部位" 给出了完整的分类（大类 -> 类别 -> 小类 -> 食品），离线解析为：
+
+    nodes:   {名称: 上级名称 或 null}      （"黄瓜" -> "瓜类蔬菜" -> "蔬菜"）
+    aliases: {俗名/别名: 名称}             （"土豆" -> "马铃薯"、"西红柿" -> "番茄"）
+
+保存在 src/data/food_taxonomy.json（随仓库发布）。加载后所有名称、别名编译进一个 Aho-Corasick
+自动机（字典树 + 失配指针），并预先算好每个节点的上级链：
+
+    FoodTaxonomy.categories("精品黄瓜") -> ["精品黄瓜", "黄瓜", "瓜类蔬菜", "蔬菜"]
+
+一次扫描食品名称（O(名称长度)）取最长的词典词（长度相同取靠后的，中文名称的中心词在后）。
+同一名称在附录中出现两次（如 "豌豆" 既是杂粮也是豆类蔬菜）时保留先出现的位置。
+
+重新生成（需要 PyMuPDF）：
+
+    python -m local_index.food_taxonomy [--pdf static/files/GB 2763-2021.pdf]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app_logging import get_logger
+from aho_corasick import AhoCorasick
+from local_index.gb2763_index import GB2763_PDF
+
+logger = get_logger(__name__)
+
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+
+FOOD_TAXONOMY_FILE = Path(__file__).resolve().parent.parent / "data" / "food_taxonomy.json"
+
+# 附录 A 表 A.1 的表头
+_APPENDIX_HEADER = ("食品类别", "类别说明", "测定部位")
+
+# 俗名 -> 附录 A 中的名称（附录中没有、报告中常见的叫法）
+COMMON_ALIASES = {
+    "土豆": "马铃薯",
+    "洋芋": "马铃薯",
+    "西葡芦": "西葫芦",
+    "西红柿": "番茄",
+    "圣女果": "樱桃番茄",
+    "青椒": "甜椒",
+    "彩椒": "甜椒",
+    "生菜": "叶用莴苣",
+    "莴笋": "茎用莴苣",
+    "豆角": "菜豆",
+    "四季豆": "菜豆",
+    "白菜": "大白菜",
+    "油菜": "普通白菜",
+    "上海青": "普通白菜",
+    "芥菜": "叶芥菜",
+    "花菜": "花椰菜",
+    "西兰花": "青花菜",
+    "包菜": "结球甘蓝",
+    "卷心菜": "结球甘蓝",
+    "香菜": "芫荽",
+    "红薯": "甘薯",
+    "地瓜": "甘薯",
+    "番薯": "甘薯",
+    "芒果": "杧果",
+    "蜜柚": "柚",
+    "橘子": "橘",
+    "橙子": "橙",
+    "金桔": "金橘",
+    "鲜枣": "枣(鲜)",
+    "冬枣": "枣(鲜)",
+    "黄桃": "桃",
+    "蜜桃": "桃",
+    "提子": "葡萄",
+    "奇异果": "猕猴桃",
+    "面粉": "小麦粉",
+    "佛手瓜": "小型瓜类",
+    "柑橘": "柑橘类水果",
+}
+
+# 类别说明中的分组标签，不是食品类别（"皮可食"、"皮不可食"）
+_SKIP_LABELS = {"皮可食", "皮不可食"}
+
+_INLINE_LABEL_RE = re.compile(r"^([^、:()]{1,8}):(.*)$")
+_CATEGORY_RE = re.compile(r"^(.+?)\((.+)\)$")
+_CHILDREN_PAREN_RE = re.compile(r"^(.+?)\(((?:包括)?[^()]*(?:、|和)[^()]*)\)$")
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", text or ""))
+
+
+def _split_members(text: str) -> List[str]:
+    """按顿号拆分食品列表（括号内的顿号不拆），去掉结尾的 "等" """
+    members, depth, current = [], 0, []
+    for ch in text:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth = max(depth - 1, 0)
+        if ch == "、" and depth == 0:
+            members.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    members.append("".join(current))
+    result = []
+    for m in members:
+        m = m.strip()
+        if m.endswith("等") and len(m) > 1:
+            m = m[:-1]
+        if m:
+            result.append(m)
+    return result
+
+
+# ---------------------------------------------------------------------- 构建
+
+class _Builder:
+    def __init__(self):
+        self.nodes: Dict[str, Optional[str]] = {}
+
+    def add(self, name: str, parent: Optional[str]) -> Optional[str]:
+        """添加节点，返回节点名称；已存在的名称保留先出现的位置"""
+        name = _normalize(name)
+        if not name:
+            return None
+        if name not in self.nodes and name != parent:
+            self.nodes[name] = parent
+        return name
+
+    def add_member(self, member: str, parent: str, meat: bool) -> None:
+        # "普通白菜(小白菜、小油菜、青菜)"、"葡萄(鲜食葡萄和酿酒葡萄)"：括号中是下级食品
+        match = _CHILDREN_PAREN_RE.match(member)
+        if match:
+            node = self.add(match.group(1), parent)
+            inner = match.group(2)
+            if inner.startswith("包括"):
+                inner = inner[2:]
+            for child in re.split(r"[、和]", inner):
+                self.add(child, node)
+            return
+        if meat and not member.endswith("肉"):
+            member += "肉"   # "猪、牛、山羊...肉等"
+        self.add(member, parent)
+
+
+def _category_chain(cell: str) -> List[str]:
+    """第一列: "蔬菜\\n(瓜类)" -> ["蔬菜", "瓜类蔬菜"]；"水果(浆果和其他小型类水果)" -> ["水果", "浆果和其他小型类水果"]"""
+    text = _normalize(cell)
+    match = _CATEGORY_RE.match(text)
+    if not match:
+        return [text]
+    top, sub = match.group(1), match.group(2)
+    return [top, sub if sub.endswith(top) else sub + top]
+
+
+def _add_description(builder: _Builder, category: str, top: str, cell: str) -> None:
+    """第二列: 可选的分组标签 + 食品列表（可带 "小型果:" 这类行内标签），PDF 中在任意位置折行"""
+    lines = [line.strip() for line in (cell or "").split("\n") if line.strip()]
+    if not lines:
+        return
+    group = category
+    first = _normalize(lines[0])
+    if len(lines) > 1 and "、" not in first and ":" not in first:
+        if first not in _SKIP_LABELS:
+            # 调味料的分组在限量表中写作 "叶类调味料"、"种子类调味料"
+            label = first + top if top == "调味料" else first
+            # 与其他大类的分组重名（药用植物的 "根茎类"）时加上大类前缀
+            if builder.nodes.get(label, category) != category:
+                label = top + label
+            group = builder.add(label, category)
+        lines = lines[1:]
+
+    # 折行的文字拼接回去，行内标签开始新的一段
+    segments: List[Tuple[Optional[str], str]] = []
+    for line in lines:
+        line = _normalize(line)
+        inline = _INLINE_LABEL_RE.match(line)
+        if inline:
+            segments.append((inline.group(1), inline.group(2)))
+        elif segments:
+            segments[-1] = (segments[-1][0], segments[-1][1] + line)
+        else:
+            segments.append((None, line))
+
+    # 动物源性食品: 肉类按 "猪肉"、"牛肉" 收录；内脏、脂肪、生乳列出的是部位/畜种，不收录
+    animal = top == "动物源性食品"
+    meat = animal and "肉类" in group
+    if animal and not meat:
+        return
+    for label, text in segments:
+        parent = group
+        if label and label not in _SKIP_LABELS:
+            parent = builder.add(label, group)
+        for member in _split_members(text):
+            builder.add_member(member, parent, meat)
+
+
+def build_food_taxonomy(pdf_path: Path = GB2763_PDF) -> Dict[str, Any]:
+    """解析 GB 2763 附录 A 表 A.1"""
+    if not PYMUPDF_AVAILABLE:
+        raise RuntimeError("构建食品分类需要 PyMuPDF (pip install PyMuPDF)")
+    builder = _Builder()
+    doc = fitz.open(str(pdf_path))
+    try:
+        chain: List[str] = []
+        for page in doc:
+            # 只有带表 A.1 表头的页才做表格识别（find_tables 较慢）
+            text = _normalize(page.get_text())
+            if not all(h in text for h in _APPENDIX_HEADER):
+                if chain:
+                    break
+                continue
+            appendix_tables = [
+                rows for rows in (t.extract() for t in page.find_tables().tables)
+                if rows and tuple(_normalize(c or "") for c in rows[0][:3]) == _APPENDIX_HEADER
+            ]
+            for rows in appendix_tables:
+                for row in rows[1:]:
+                    if row[0]:
+                        chain = _category_chain(row[0])
+                        parent = None
+                        for name in chain:
+                            parent = builder.add(name, parent)
+                    if chain and len(row) > 1:
+                        _add_description(builder, chain[-1], chain[0], row[1] or "")
+    finally:
+        doc.close()
+
+    aliases = {
+        _normalize(alias): _normalize(name)
+        for alias, name in COMMON_ALIASES.items()
+        if _normalize(name) in builder.nodes and _normalize(alias) not in builder.nodes
+    }
+    return {
+        "version": 1,
+        "source": Path(pdf_path).name,
+        "description": "GB 2763-2021 附录 A 食品类别及测定部位：nodes 为 {名称: 上级名称}，aliases 为 {俗名: 名称}",
+        "nodes": builder.nodes,
+        "aliases": aliases,
+    }
+
+
+# ---------------------------------------------------------------------- 查询
+
+class FoodTaxonomy:
+    """食品分类（只读，线程安全）"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.parents: Dict[str, Optional[str]] = dict(data.get("nodes") or {})
+        self.aliases: Dict[str, str] = {
+            k: v for k, v in (data.get("aliases") or {}).items() if v in self.parents
+        }
+
+        # 预先算好每个节点的上级链（由细到粗）
+        self._chains: Dict[str, Tuple[str, ...]] = {}
+        for name in self.parents:
+            chain, node, seen = [], name, set()
+            while node and node not in seen:
+                seen.add(node)
+                chain.append(node)
+                node = self.parents.get(node)
+            self._chains[name] = tuple(chain)
+
+        # 名称 / 别名 / 去掉 "(鲜)" 等限定语的名称（不产生歧义时）-> 节点
+        keys: Dict[str, str] = {name: name for name in self.parents}
+        bases: Dict[str, List[str]] = {}
+        for name in self.parents:
+            base = re.sub(r"\([^()]*\)$", "", name)
+            if base and base != name:
+                bases.setdefault(base, []).append(name)
+        for base, names in bases.items():
+            if base not in keys and len(names) == 1:
+                keys[base] = names[0]
+        for alias, name in self.aliases.items():
+            keys.setdefault(alias, name)
+        self._keys = keys
+        self._matcher = AhoCorasick(keys)
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def resolve(self, food_name: str) -> Optional[str]:
+        """
+        食品名称 -> 分类中的节点
+
+        精确匹配名称/别名，否则取名称中最长的词典词（"精品黄瓜" -> 黄瓜，"有机小白菜" -> 小白菜）
+        """
+        name = _normalize(food_name)
+        if not name:
+            return None
+        exact = self._keys.get(name)
+        if exact:
+            return exact
+        best: Optional[Tuple[int, int, str]] = None
+        for start, end, node in self._matcher.iter_matches(name):
+            # 单字只在整个名称就是该字时使用（"桃" 不应命中 "核桃仁"）
+            if end - start < 2:
+                continue
+            candidate = (end - start, end, node)
+            if best is None or candidate > best:
+                best = candidate
+        return best[2] if best else None
+
+    def ancestors(self, node: str) -> List[str]:
+        """节点本身及其上级，由细到粗"""
+        return list(self._chains.get(node, ()))
+
+    def categories(self, food_name: str) -> List[str]:
+        """
+        食品名称及其所属类别，由细到粗；分类中找不到时只返回原名称
+
+        categories("黄瓜") -> ["黄瓜", "瓜类蔬菜", "蔬菜"]
+        """
+        node = self.resolve(food_name)
+        if not node:
+            return [food_name]
+        chain = self.ancestors(node)
+        return chain if chain[0] == food_name else [food_name, *chain]
+
+
+_taxonomy: Optional[FoodTaxonomy] = None
+_taxonomy_loaded = False
+_taxonomy_lock = threading.Lock()
+
+
+def get_food_taxonomy(path: Path = FOOD_TAXONOMY_FILE) -> Optional[FoodTaxonomy]:
+    """加载食品分类单例；文件不存在或损坏时返回 None（调用方回退到内置映射）"""
+    global _taxonomy, _taxonomy_loaded
+    if _taxonomy_loaded:
+        return _taxonomy
+    with _taxonomy_lock:
+        if not _taxonomy_loaded:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    _taxonomy = FoodTaxonomy(json.load(f))
+                logger.info("已加载食品分类: %d 个节点", len(_taxonomy))
+            except Exception as e:
+                logger.warning("食品分类加载失败，使用内置映射: %s", e)
+                _taxonomy = None
+            _taxonomy_loaded = True
+        return _taxonomy
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="解析 GB 2763 附录 A，生成食品分类数据文件")
+    parser.add_argument("--pdf", default=str(GB2763_PDF), help="GB 2763-2021 PDF 路径")
+    parser.add_argument("--output", default=str(FOOD_TAXONOMY_FILE), help="输出文件")
+    args = parser.parse_args()
+
+    data = build_food_taxonomy(Path(args.pdf))
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    # 每个节点一行，便于审阅 diff
+    nodes = ",\n".join(
+        f"  {json.dumps(k, ensure_ascii=False)}: {json.dumps(v, ensure_ascii=False)}" for k, v in data["nodes"].items()
+    )
+    aliases = ",\n".join(
+        f"  {json.dumps(k, ensure_ascii=False)}: {json.dumps(v, ensure_ascii=False)}" for k, v in data["aliases"].items()
+    )
+    with open(output, "w", encoding="utf-8") as f:
+        f.write("{\n")
+        for key in ("version", "source", "description"):
+            f.write(f" {json.dumps(key)}: {json.dumps(data[key], ensure_ascii=False)},\n")
+        f.write(f' "nodes": {{\n{nodes}\n }},\n')
+        f.write(f' "aliases": {{\n{aliases}\n }}\n')
+        f.write("}\n")
+    print(f"食品分类已生成: {len(data['nodes'])} 个节点, {len(data['aliases'])} 个别名 -> {output}")
+
+
+if __name__ == "__main__":
+    main()
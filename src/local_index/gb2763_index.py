@@ -0,0 +1,448 @@
+"""
+GB 2763-2021 最大残留限量本地索引
+
+原来每个匹配项目的限量核验都要两次 RAGFlow 检索（目次 -> "表{n}"，再检索表格），
+然后用正则在表格文本里找食品的限量值。仓库中已经附带 static/files/GB 2763-2021.pdf，
+这里离线解析一次，得到结构化的限量表：
+
+    items:  {农药名: 表号}                              （即目次 4.N 名称 -> 表N）
+    tables: {表号: {"item", "page", "rows": [[类别, 食品, 限量值, 单位, 标记, 页码], ...]}}
+
+结果保存到 static/cache/gb2763_mrl_index.json，限量核验变成内存字典查找，
+索引中没有的项目再回退到 RAGFlow 检索。
+
+构建索引（需要 PyMuPDF）：
+
+    python -m local_index.gb2763_index [--pdf static/files/GB 2763-2021.pdf]
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app_logging import get_logger
+from ragflow_cache import CACHE_DIR, _load_json, _write_json_atomic
+
+logger = get_logger(__name__)
+
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+
+GB2763_PDF = Path("static/files/GB 2763-2021.pdf")
+GB2763_INDEX_FILE = CACHE_DIR / "gb2763_mrl_index.json"
+GB2763_DOC_NAME = "GB 2763-2021.pdf"
+
+# 解析规则变化时递增，旧索引需要重新构建
+INDEX_SCHEMA_VERSION = 1
+
+FLAG_TEMPORARY = "temporary"  # ∗ 该限量为临时限量
+
+# 行的字段顺序
+ROW_CATEGORY, ROW_FOOD, ROW_VALUE, ROW_UNIT, ROW_FLAGS, ROW_PAGE = range(6)
+
+_SECTION_RE = re.compile(r"^4\.(\d+)(?![\d.])\s*(.*)$")
+_TABLE_RE = re.compile(r"^表(\d+)(\(续\))?$")
+_VALUE_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*(\(.*\))?\s*(∗)?$")
+_UNIT_RE = re.compile(r"最大残留限量\s*[,，]\s*(\S+)")
+_EXCLUDE_RE = re.compile(r"\(([^()]*)除外\)")
+_PAGE_NUMBER_RE = re.compile(r"^\d+$")
+
+TEMPORARY_MARK = "∗"
+
+# PDF 字体中缺失、提取时被丢掉的字（标题在缺字处折行，如 "4.128" / "草酸(propaquizafop)"）
+MISSING_GLYPH = "噁"
+
+
+def normalize_text(text: str) -> str:
+    """PDF 文本规范化：私有区小数点、全角字符（NFKC）"""
+    text = text.replace("\U001001b0", ".").replace("Ｇ", "-")
+    return unicodedata.normalize("NFKC", text)
+
+
+def strip_english_name(heading: str) -> str:
+    """
+    去掉标题中的英文名：
+    "阿维菌素(abamectin)" -> "阿维菌素"；"2甲4氯(钠)[MCPA(sodium)]" -> "2甲4氯(钠)"
+    """
+    for i, ch in enumerate(heading):
+        if ch in "([" and i > 0 and i + 1 < len(heading) and heading[i + 1].isascii() and heading[i + 1].isalnum():
+            return heading[:i].strip()
+    return heading.strip()
+
+
+def _base_name(food: str) -> str:
+    """去掉括号中的限定说明：'柑橘类水果(柑、橘、橙除外)' -> '柑橘类水果'"""
+    return re.sub(r"\([^()]*\)", "", food).strip()
+
+
+def _excluded(food: str) -> List[str]:
+    """'(柑、橘、橙除外)' -> ['柑', '橘', '橙']"""
+    names: List[str] = []
+    for group in _EXCLUDE_RE.findall(food):
+        names.extend(n.strip() for n in re.split(r"[、,，和及]", group) if n.strip())
+    return names
+
+
+# ---------------------------------------------------------------------- 解析
+
+def _is_mark_block(block: Tuple[Any, ...], text: str, width: float) -> bool:
+    """限量值右侧单独的临时限量标记（个别页面的 ∗ 被识别成小写字母）"""
+    return text == TEMPORARY_MARK or (len(text) == 1 and text.islower() and block[0] > width * 0.7)
+
+
+def _pdf_lines(pdf_path: Path) -> List[Tuple[int, str]]:
+    """
+    按阅读顺序提取 (页码, 行)，去掉页眉和页脚页码
+
+    临时限量标记 ∗ 是单独的文本块，与所在行的纵坐标几乎相同，排序后可能出现在该行之前，
+    这里按纵向重叠合并到对应的 "食品\n限量值" 块末尾（"0.2 ∗"）。
+    """
+    doc = fitz.open(str(pdf_path))
+    lines: List[Tuple[int, str]] = []
+    try:
+        for page_index in range(doc.page_count):
+            page = doc[page_index]
+            height, width = page.rect.height, page.rect.width
+            blocks: List[List[Any]] = []
+            marks: List[Tuple[float, float]] = []
+            for block in page.get_text("blocks", sort=True):
+                y0, y1, text = block[1], block[3], normalize_text(block[4]).strip()
+                if not text:
+                    continue
+                if text.startswith("GB2763") and y0 < height * 0.1:
+                    continue
+                if y0 > height * 0.92 and all(_PAGE_NUMBER_RE.match(t.strip()) for t in text.split("\n") if t.strip()):
+                    continue
+                if _is_mark_block(block, text, width):
+                    marks.append((y0, y1))
+                    continue
+                blocks.append([y0, y1, text])
+
+            for y0, y1 in marks:
+                overlap = [(min(y1, b[1]) - max(y0, b[0]), b) for b in blocks if _VALUE_RE.match(b[2].split("\n")[-1])]
+                overlap = [o for o in overlap if o[0] > 0]
+                if overlap:
+                    target = max(overlap, key=lambda o: o[0])[1]
+                    target[2] += " " + TEMPORARY_MARK
+
+            for _, _, text in blocks:
+                for line in text.split("\n"):
+                    line = line.strip()
+                    if line:
+                        lines.append((page_index + 1, line))
+    finally:
+        doc.close()
+    return lines
+
+
+def parse_gb2763_lines(lines: Sequence[Tuple[int, str]]) -> Dict[str, Any]:
+    """
+    解析第 4 章（技术要求）的文本行
+
+    每个项目的结构：
+        4.N 名称(english)
+        4.N.4 最大残留限量:应符合表N的规定.
+        表N / 表N(续)
+        食品类别/名称 / 最大残留限量,mg/kg
+        大类（无数值） | 食品 + 数值 [+ ∗]
+        4.N.5 检测方法:...
+    """
+    # 目次中的 "4.N" 也满足标题格式，从正文 "4 技术要求"（第一个 "4.1.1" 之前的最后一处）开始解析
+    first_sub = next((i for i, (_, line) in enumerate(lines) if line.startswith("4.1.1")), len(lines))
+    starts = [i for i, (_, line) in enumerate(lines[:first_sub]) if re.match(r"^4\s*技术要求$", line)]
+    start = starts[-1] if starts else None
+    if start is None:
+        raise ValueError("未找到 GB 2763 第 4 章（技术要求）")
+
+    sections: Dict[str, str] = {}
+    tables: Dict[str, Dict[str, Any]] = {}
+
+    table: Optional[Dict[str, Any]] = None
+    category = ""
+    unit = "mg/kg"
+    pending_name: List[str] = []  # 跨行的食品名称
+
+    def _close_table() -> None:
+        nonlocal table, pending_name
+        table = None
+        pending_name = []
+
+    i = start + 1
+    n = len(lines)
+    while i < n:
+        page, line = lines[i]
+        i += 1
+
+        heading = _SECTION_RE.match(line)
+        if heading:
+            # "4.N 名称" 是项目标题（"4.N.x" 不匹配）；表号与条号相同（标准中 "应符合表N的规定" 有笔误）
+            name = heading.group(2)
+            if "(" not in name and i < n and _is_cjk(lines[i][1][:1]):
+                name = f"{name}{MISSING_GLYPH}{lines[i][1]}"
+                i += 1
+            _close_table()
+            sections[heading.group(1)] = strip_english_name(name)
+            continue
+        if line.startswith("4.") or line.startswith("附录"):
+            _close_table()
+            if line.startswith("附录"):
+                break
+            continue
+
+        marker = _TABLE_RE.match(line)
+        if marker:
+            number = marker.group(1)
+            table = tables.setdefault(number, {"item": sections.get(number, ""), "page": page, "rows": []})
+            pending_name = []
+            if not marker.group(2):
+                category = ""
+            continue
+
+        if table is None:
+            continue
+
+        if line.startswith("食品类别"):
+            continue
+        unit_match = _UNIT_RE.search(line)
+        if unit_match:
+            unit = unit_match.group(1).rstrip(".")
+            continue
+        if line.startswith(TEMPORARY_MARK):
+            # 表下方的说明 "∗ 该限量为临时限量."
+            continue
+        if line.startswith("注"):
+            _close_table()
+            continue
+
+        value = _VALUE_RE.match(line)
+        if value:
+            if not pending_name:
+                continue
+            food = "".join(pending_name)
+            pending_name = []
+            flags: List[str] = []
+            if value.group(2):
+                flags.append(value.group(2).strip("()"))
+            if value.group(3):
+                flags.append(FLAG_TEMPORARY)
+            table["rows"].append([category, food, value.group(1), unit, flags, page])
+            continue
+
+        # 非数值行：下一行是数值则为食品名称，否则为大类标题
+        next_line = lines[i][1] if i < n else ""
+        if _VALUE_RE.match(next_line):
+            pending_name.append(line)
+        elif pending_name or _is_continued_name(line, next_line):
+            # 食品名称折行（括号未闭合）
+            pending_name.append(line)
+        else:
+            category = line
+
+    items: Dict[str, str] = {}
+    for number, info in tables.items():
+        if info["item"]:
+            items.setdefault(info["item"], number)
+    return {"items": items, "tables": tables}
+
+
+def _is_cjk(ch: str) -> bool:
+    return bool(ch) and "\u4e00" <= ch <= "\u9fff"
+
+
+def _is_continued_name(line: str, next_line: str) -> bool:
+    return line.count("(") > line.count(")") and bool(next_line)
+
+
+def build_gb2763_index(pdf_path: Path = GB2763_PDF) -> Dict[str, Any]:
+    """解析 PDF，返回可直接保存为 JSON 的索引"""
+    if not PYMUPDF_AVAILABLE:
+        raise RuntimeError("构建 GB 2763 索引需要 PyMuPDF (pip install pymupdf)")
+    parsed = parse_gb2763_lines(_pdf_lines(Path(pdf_path)))
+    return {
+        "schema_version": INDEX_SCHEMA_VERSION,
+        "source": Path(pdf_path).name,
+        "created_at": time.time(),
+        **parsed,
+    }
+
+
+# ---------------------------------------------------------------------- 查询
+
+class GB2763Index:
+    """GB 2763 限量索引（只读，线程安全）"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.source = data.get("source", GB2763_DOC_NAME)
+        self.items: Dict[str, str] = data.get("items", {})
+        self.tables: Dict[str, Dict[str, Any]] = data.get("tables", {})
+        # 名称规范化（去空格、全角）后的别名，兼容细则中的写法差异
+        self._normalized = {self._key(name): name for name in self.items}
+
+    @staticmethod
+    def _key(name: str) -> str:
+        return re.sub(r"\s+", "", normalize_text(name or ""))
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def table_number(self, item_name: str) -> Optional[str]:
+        """项目 -> 表号（目次查找）"""
+        name = self._normalized.get(self._key(item_name))
+        return self.items.get(name) if name else None
+
+    def lookup(self, item_name: str, food_name: str, categories: Sequence[str] = ()) -> Optional[Dict[str, Any]]:
+        """
+        查找项目在食品上的限量
+
+        匹配顺序：食品名称（"黄瓜"、"枣(鲜)" 按 "枣"）-> 所属大类（如 "瓜类蔬菜"，
+        "柑橘类水果(柑、橘、橙除外)" 这类行会排除括号中列出的食品）
+
+        :param categories: 食品所属的大类，由细到粗
+        :return: {"item", "table", "page", "category", "food", "value", "unit", "flags"} 或 None
+        """
+        number = self.table_number(item_name)
+        if not number:
+            return None
+        table = self.tables.get(number) or {}
+        rows = table.get("rows", [])
+
+        for name in [food_name, *categories]:
+            row = self._match_row(rows, name, food_name)
+            if row:
+                return {
+                    "item": table.get("item") or item_name,
+                    "table": number,
+                    "page": row[ROW_PAGE] if len(row) > ROW_PAGE else table.get("page"),
+                    "category": row[ROW_CATEGORY],
+                    "food": row[ROW_FOOD],
+                    "value": row[ROW_VALUE],
+                    "unit": row[ROW_UNIT],
+                    "flags": list(row[ROW_FLAGS]),
+                }
+        return None
+
+    @staticmethod
+    def _match_row(rows: List[List[Any]], name: str, food_name: str) -> Optional[List[Any]]:
+        for row in rows:
+            if row[ROW_FOOD] == name:
+                return row
+        for row in rows:
+            if _base_name(row[ROW_FOOD]) == name and food_name not in _excluded(row[ROW_FOOD]):
+                return row
+        return None
+
+    def table_rows(self, number: str) -> List[List[Any]]:
+        return (self.tables.get(number) or {}).get("rows", [])
+
+
+def render_limit_evidence(hit: Dict[str, Any], doc_name: str = GB2763_DOC_NAME) -> Dict[str, Any]:
+    """
+    把索引查询结果转换成与 RAGFlow 检索一致的限量证据
+    （content / extracted_limit / chunk_id / page_num / doc_name）
+    """
+    flags = hit.get("flags") or []
+    note = "（临时限量）" if FLAG_TEMPORARY in flags else ""
+    extra = "".join(f"（{f}）" for f in flags if f != FLAG_TEMPORARY)
+    food = f"{hit['category']} {hit['food']}" if hit.get("category") else hit["food"]
+    content = (
+        f"GB 2763-2021 表{hit['table']} {hit['item']}最大残留限量\n"
+        f"{food} ≤{hit['value']} {hit['unit']}{extra}{note}"
+    )
+    return {
+        "content": content,
+        "extracted_limit": f"{hit['value']} {hit['unit']}",
+        "chunk_id": f"gb2763-local-{hit['table']}",
+        "page_num": hit.get("page"),
+        "doc_name": doc_name,
+        "source": "local_index",
+    }
+
+
+_index: Optional[GB2763Index] = None
+_index_mtime = 0.0
+_index_lock = threading.Lock()
+
+
+def load_gb2763_index(path: Path = GB2763_INDEX_FILE) -> Optional[GB2763Index]:
+    """加载索引（文件更新后自动重新加载）；索引文件不存在或版本不符时返回 None"""
+    global _index, _index_mtime
+    path = Path(path)
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return None
+    with _index_lock:
+        if _index is None or mtime != _index_mtime:
+            data = _load_json(path, None)
+            if not data or data.get("schema_version") != INDEX_SCHEMA_VERSION:
+                logger.warning("GB 2763 限量索引不可用，请运行 python -m local_index.gb2763_index 重新构建: %s", path)
+                _index_mtime = mtime
+                _index = None
+                return None
+            _index = GB2763Index(data)
+            _index_mtime = mtime
+            logger.info("已加载 GB 2763 限量索引: %d 个项目", len(_index))
+        return _index
+
+
+def get_gb2763_index(config: Dict[str, Any]) -> Optional[GB2763Index]:
+    """
+    获取 GB 2763 限量索引
+
+    GB2763_INDEX_DISABLED: true 关闭（全部使用 RAGFlow 检索）
+    GB2763_INDEX_FILE: 索引文件路径
+    GB2763_INDEX_AUTO_BUILD: 索引文件不存在时是否从 PDF 自动构建（默认 true，需要 PyMuPDF）
+    """
+    if config.get("GB2763_INDEX_DISABLED"):
+        return None
+    path = Path(config.get("GB2763_INDEX_FILE", GB2763_INDEX_FILE))
+    if not path.exists() and config.get("GB2763_INDEX_AUTO_BUILD", True):
+        _auto_build(path, Path(config.get("GB2763_PDF", GB2763_PDF)))
+    return load_gb2763_index(path)
+
+
+_auto_build_tried = False
+
+
+def _auto_build(path: Path, pdf_path: Path) -> None:
+    """首次使用时构建索引（每个进程只尝试一次，失败后回退到 RAGFlow 检索）"""
+    global _auto_build_tried
+    with _index_lock:
+        if _auto_build_tried or path.exists():
+            return
+        _auto_build_tried = True
+        if not PYMUPDF_AVAILABLE or not pdf_path.exists():
+            return
+        try:
+            logger.info("GB 2763 限量索引不存在，正在从 %s 构建...", pdf_path)
+            _write_json_atomic(path, build_gb2763_index(pdf_path))
+        except Exception as e:
+            logger.error("GB 2763 限量索引构建失败: %s", e)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="解析 GB 2763 PDF，生成本地最大残留限量索引")
+    parser.add_argument("--pdf", default=str(GB2763_PDF), help="GB 2763 PDF 路径")
+    parser.add_argument("--output", default=str(GB2763_INDEX_FILE), help="索引文件路径")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    data = build_gb2763_index(Path(args.pdf))
+    _write_json_atomic(Path(args.output), data)
+    rows = sum(len(t["rows"]) for t in data["tables"].values())
+    print(f"GB 2763 限量索引: {len(data['items'])} 个项目, {len(data['tables'])} 个表, {rows} 条限量, "
+          f"耗时 {time.time() - start:.1f}s -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
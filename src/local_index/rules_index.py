@@ -0,0 +1,392 @@
+"""
+食品安全监督抽检实施细则 检验项目本地索引
+
+每份报告原来都要先检索细则知识库（query_adaptive "黄瓜 检验项目表 必检项目 限量指标"），
+再用 BeautifulSoup 解析返回的 HTML 表格。细则每年才更新一次，仓库中附带
+static/files/2025年食品安全监督抽检实施细则.pdf，这里离线解析全部检验项目表：
+
+    tables:     {表号: {"title", "chapter", "section", "pages", "rows": [{列名: 内容, "page": 页码}, ...]}}
+    foods:      {食品名称/别名: [表号, ...]}      （"表34-15 黄瓜检验项目" -> 黄瓜）
+    categories: {大类: [表号, ...]}               （目录章节名、"所属蔬菜分类" 等）
+
+结果保存到 static/cache/rules_items_index.json，verify_inspection_compliance 优先使用，
+找不到该食品时才检索 RAGFlow。页码为 PDF 物理页码（与前端 switchPdfView('rules', page) 一致）。
+
+构建索引（需要 PyMuPDF，约 20 秒）：
+
+    python -m local_index.rules_index [--pdf static/files/2025年食品安全监督抽检实施细则.pdf]
+"""
+from __future__ import annotations
+
+import argparse
+import html
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app_logging import get_logger
+from ragflow_cache import CACHE_DIR, _load_json, _write_json_atomic
+
+logger = get_logger(__name__)
+
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+
+RULES_PDF = Path("static/files/2025年食品安全监督抽检实施细则.pdf")
+RULES_INDEX_FILE = CACHE_DIR / "rules_items_index.json"
+
+# 解析规则变化时递增，旧索引需要重新构建
+INDEX_SCHEMA_VERSION = 1
+
+ITEM_COLUMN = "检验项目"
+SEQ_COLUMN = "序号"
+VARIETY_COLUMN = "品种"      # 表34-1 "抽检蔬菜品种" / 表36-1 "抽检水果品种"
+CATEGORY_COLUMN = "所属"     # "所属蔬菜分类" / "所属水果分类"
+
+_CAPTION_RE = re.compile(r"^表\s*(\d+-\d+)\s*(\S.*)$")
+_CAPTION_MAX_GAP = 40.0      # 表题与表格上边框的最大距离（pt）
+_QUALIFIERS = {"自制", "非速冻", "发酵型"}
+
+
+def clean_title(title: str) -> str:
+    """'黄瓜检验项目' -> '黄瓜'；'油饼油条（自制）a 检验项目' -> '油饼油条（自制）'"""
+    title = re.sub(r"\s+", "", title)
+    title = re.sub(r"[a-z]*检验项目[a-z]*$", "", title)
+    return title.strip()
+
+
+def title_aliases(title: str) -> List[str]:
+    """
+    表题中的食品名称及别名：
+    '柑、橘' -> ['柑', '橘']；'普通白菜（小白菜、小油菜、青菜）' -> ['普通白菜', '小白菜', '小油菜', '青菜']
+    括号中的限定说明（"自制"、"餐馆自行消毒"、单字）不作为别名
+    """
+    names: List[str] = []
+    base = re.sub(r"（[^（）]*）|\([^()]*\)", "", title)
+    names.extend(re.split(r"[、和]", base))
+    for group in re.findall(r"（([^（）]*)）|\(([^()]*)\)", title):
+        for part in re.split(r"[、,，]", "".join(group)):
+            part = re.sub(r"^又名", "", part)
+            if len(part) >= 2 and part not in _QUALIFIERS and "消毒" not in part:
+                names.append(part)
+    names = [re.sub(r"等$", "", n) for n in names]
+    return [n for n in dict.fromkeys(names) if n and n != title]
+
+
+def _cell_text(cell: Optional[str], join: str) -> str:
+    if not cell:
+        return ""
+    return join.join(line.strip() for line in cell.splitlines() if line.strip())
+
+
+# ---------------------------------------------------------------------- 解析
+
+def _toc_ranges(doc: Any) -> List[Tuple[int, str, str]]:
+    """目录书签 -> [(起始页, 章, 节)]，按页码排序"""
+    ranges: List[Tuple[int, str, str]] = []
+    chapter = ""
+    for level, title, page in doc.get_toc():
+        title = re.sub(r"\s+", " ", title).strip()
+        if level == 1:
+            chapter = title
+            ranges.append((page, chapter, ""))
+        elif level == 2:
+            ranges.append((page, chapter, re.sub(r"^\d+\s*", "", title)))
+    return sorted(ranges, key=lambda r: r[0])
+
+
+def _locate(ranges: List[Tuple[int, str, str]], page: int) -> Tuple[str, str]:
+    chapter, section = "", ""
+    for start, c, s in ranges:
+        if start > page:
+            break
+        chapter, section = c, s
+    # 章名去掉序号："三十四、蔬菜" -> "蔬菜"
+    return re.sub(r"^[一二三四五六七八九十]+、", "", chapter), section
+
+
+def _page_captions(page: Any) -> List[Tuple[float, str, str]]:
+    """页面中的表题 [(下边缘 y, 表号, 标题)]"""
+    captions = []
+    for block in page.get_text("blocks"):
+        for line in block[4].splitlines():
+            match = _CAPTION_RE.match(line.strip())
+            if match:
+                captions.append((block[3], match.group(1), match.group(2)))
+    return captions
+
+
+def build_rules_index(pdf_path: Path = RULES_PDF) -> Dict[str, Any]:
+    """解析实施细则 PDF，返回可直接保存为 JSON 的索引"""
+    if not PYMUPDF_AVAILABLE:
+        raise RuntimeError("构建实施细则索引需要 PyMuPDF (pip install pymupdf)")
+
+    doc = fitz.open(str(pdf_path))
+    tables: Dict[str, Dict[str, Any]] = {}
+    varieties: Dict[str, str] = {}
+    try:
+        ranges = _toc_ranges(doc)
+        current: Optional[Dict[str, Any]] = None
+        pending: Optional[Tuple[str, str, int]] = None   # 页面底部的表题，表格在下一页
+        for page_index in range(doc.page_count):
+            page = doc[page_index]
+            page_num = page_index + 1
+            captions = _page_captions(page)
+            if not captions and pending is None and SEQ_COLUMN not in page.get_text():
+                continue
+            used = set()
+            for found in page.find_tables().tables:
+                raw_rows = found.extract()
+                if not raw_rows:
+                    continue
+                header = [_cell_text(c, "") for c in raw_rows[0]]
+                top = found.bbox[1]
+
+                # 品种 -> 分类 对照表
+                if any(VARIETY_COLUMN in h for h in header) and any(CATEGORY_COLUMN in h for h in header):
+                    v_col = next(i for i, h in enumerate(header) if VARIETY_COLUMN in h)
+                    c_col = next(i for i, h in enumerate(header) if CATEGORY_COLUMN in h)
+                    for raw in raw_rows[1:]:
+                        variety, category = _cell_text(raw[v_col], ""), _cell_text(raw[c_col], "")
+                        if variety and category:
+                            varieties[variety] = category
+                    used.update(c[1] for c in captions if c[0] <= top + 2)
+                    current = pending = None
+                    continue
+
+                if not any(ITEM_COLUMN in h for h in header):
+                    current = pending = None
+                    continue
+
+                # 表题在表格上方（或上一页底部）；没有表题的是上一页表格的续表（表头重复）
+                above = [c for c in captions if c[0] <= top + 2 and top - c[0] <= _CAPTION_MAX_GAP]
+                caption: Optional[Tuple[str, str, int]] = None
+                if above:
+                    _, number, title = max(above, key=lambda c: c[0])
+                    caption = (number, title, page_num)
+                    used.add(number)
+                elif pending is not None:
+                    caption = pending
+                pending = None
+                if caption is not None:
+                    number, title, caption_page = caption
+                    chapter, section = _locate(ranges, caption_page)
+                    current = tables.setdefault(number, {
+                        "title": clean_title(title),
+                        "chapter": chapter,
+                        "section": section,
+                        "pages": [],
+                        "header": header,
+                        "rows": [],
+                    })
+                elif current is None:
+                    continue
+
+                if page_num not in current["pages"]:
+                    current["pages"].append(page_num)
+                _append_rows(current, header, raw_rows[1:], page_num)
+
+            unused = [c for c in captions if c[1] not in used]
+            if unused:
+                _, number, title = unused[-1]
+                pending = (number, title, page_num)
+    finally:
+        doc.close()
+
+    return {
+        "schema_version": INDEX_SCHEMA_VERSION,
+        "source": Path(pdf_path).name,
+        "created_at": time.time(),
+        "tables": tables,
+        **_build_keys(tables, varieties),
+    }
+
+
+def _append_rows(table: Dict[str, Any], header: List[str], raw_rows: List[List[Optional[str]]], page_num: int) -> None:
+    """
+    追加数据行；序号为空的行是上一行跨页/跨行的延续，合并到上一行
+    项目名称按行直接拼接（"铅（以Pb" + "计）"），标准号/方法之间用空格分隔
+    """
+    seq_col = next((i for i, h in enumerate(header) if SEQ_COLUMN in h), None)
+    item_col = next((i for i, h in enumerate(header) if ITEM_COLUMN in h), None)
+    for raw in raw_rows:
+        cells = [_cell_text(c, "" if i == item_col else " ") for i, c in enumerate(raw)]
+        if not any(cells):
+            continue
+        # 表注（"注：a. 限未调味产品检测。"）不是检验项目
+        if seq_col is not None and cells[seq_col].startswith("注"):
+            continue
+        if seq_col is not None and not cells[seq_col] and table["rows"]:
+            last = table["rows"][-1]
+            for key, value in zip(header, cells):
+                if value:
+                    sep = "" if key == header[item_col] else " "
+                    last[key] = f"{last.get(key, '')}{sep}{value}".strip()
+            continue
+        row: Dict[str, Any] = {key: value for key, value in zip(header, cells)}
+        row["page"] = page_num
+        table["rows"].append(row)
+
+
+def _build_keys(tables: Dict[str, Dict[str, Any]], varieties: Dict[str, str]) -> Dict[str, Any]:
+    foods: Dict[str, List[str]] = {}
+    categories: Dict[str, List[str]] = {}
+
+    def _add(index: Dict[str, List[str]], key: str, number: str) -> None:
+        key = re.sub(r"\s+", "", key)
+        if key and number not in index.setdefault(key, []):
+            index[key].append(number)
+
+    for number, table in tables.items():
+        title = table["title"]
+        _add(foods, title, number)
+        for alias in title_aliases(title):
+            _add(foods, alias, number)
+        for category in (table["section"], table["chapter"], varieties.get(title)):
+            if category:
+                _add(categories, category, number)
+    return {"foods": foods, "categories": categories, "varieties": varieties}
+
+
+# ---------------------------------------------------------------------- 查询
+
+class RulesIndex:
+    """实施细则检验项目索引（只读，线程安全）"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.source = data.get("source", RULES_PDF.name)
+        self.version = str(int(data.get("created_at", 0)))
+        self.tables: Dict[str, Dict[str, Any]] = data.get("tables", {})
+        self.foods: Dict[str, List[str]] = data.get("foods", {})
+        self.categories: Dict[str, List[str]] = data.get("categories", {})
+        self.varieties: Dict[str, str] = data.get("varieties", {})
+        # 包含匹配时优先较长的名称（"小麦粉" 优先于 "麦"）
+        self._foods_by_length = sorted(self.foods, key=len, reverse=True)
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    def lookup(self, food_name: str, categories: Sequence[str] = ()) -> Optional[str]:
+        """
+        食品 -> 检验项目表号
+
+        匹配顺序：表题/别名精确匹配 -> 食品名中包含的表题（"精制小麦粉" -> 小麦粉）
+        -> 所属大类（只对应一个表时）；别名或大类对应多个表时不做判断，返回 None
+        """
+        name = re.sub(r"\s+", "", food_name or "")
+        if not name:
+            return None
+        numbers = self.foods.get(name)
+        if numbers:
+            exact = [n for n in numbers if self.tables.get(n, {}).get("title") == name]
+            if exact or len(numbers) == 1:
+                return (exact or numbers)[0]
+        for key in self._foods_by_length:
+            # 多个表共用的别名（"液体乳" -> 5 个表）无法确定是哪个表，跳过
+            if len(key) >= 2 and key in name and len(self.foods[key]) == 1:
+                return self.foods[key][0]
+        for category in [self.varieties.get(name), *categories]:
+            numbers = self.categories.get(category or "")
+            if numbers and len(numbers) == 1:
+                return numbers[0]
+        return None
+
+    def table(self, number: str) -> Dict[str, Any]:
+        return self.tables.get(number) or {}
+
+
+def render_table_html(header: List[str], rows: List[Dict[str, Any]]) -> str:
+    """把表格行渲染成与 RAGFlow chunk 相同的 HTML 表格"""
+    parts = ["<table><tr>"]
+    parts.extend(f"<th>{html.escape(h)}</th>" for h in header)
+    parts.append("</tr>")
+    for row in rows:
+        parts.append("<tr>")
+        parts.extend(f"<td>{html.escape(str(row.get(h, '')))}</td>" for h in header)
+        parts.append("</tr>")
+    parts.append("</table>")
+    return "".join(parts)
+
+
+_index: Optional[RulesIndex] = None
+_index_mtime = 0.0
+_index_lock = threading.Lock()
+_auto_build_tried = False
+
+
+def load_rules_index(path: Path = RULES_INDEX_FILE) -> Optional[RulesIndex]:
+    """加载索引（文件更新后自动重新加载）；索引文件不存在或版本不符时返回 None"""
+    global _index, _index_mtime
+    path = Path(path)
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return None
+    with _index_lock:
+        if _index is None or mtime != _index_mtime:
+            data = _load_json(path, None)
+            _index_mtime = mtime
+            if not data or data.get("schema_version") != INDEX_SCHEMA_VERSION:
+                logger.warning("实施细则索引不可用，请运行 python -m local_index.rules_index 重新构建: %s", path)
+                _index = None
+                return None
+            _index = RulesIndex(data)
+            logger.info("已加载实施细则检验项目索引: %d 个表", len(_index))
+        return _index
+
+
+def get_rules_index(config: Dict[str, Any]) -> Optional[RulesIndex]:
+    """
+    获取实施细则检验项目索引
+
+    RULES_INDEX_DISABLED: true 关闭（全部使用 RAGFlow 检索）
+    RULES_INDEX_FILE: 索引文件路径
+    RULES_INDEX_AUTO_BUILD: 索引文件不存在时是否从 PDF 自动构建（默认 true，需要 PyMuPDF）
+    """
+    if config.get("RULES_INDEX_DISABLED"):
+        return None
+    path = Path(config.get("RULES_INDEX_FILE", RULES_INDEX_FILE))
+    if not path.exists() and config.get("RULES_INDEX_AUTO_BUILD", True):
+        _auto_build(path, Path(config.get("RULES_PDF", RULES_PDF)))
+    return load_rules_index(path)
+
+
+def _auto_build(path: Path, pdf_path: Path) -> None:
+    """首次使用时构建索引（每个进程只尝试一次，失败后回退到 RAGFlow 检索）"""
+    global _auto_build_tried
+    with _index_lock:
+        if _auto_build_tried or path.exists():
+            return
+        _auto_build_tried = True
+        if not PYMUPDF_AVAILABLE or not pdf_path.exists():
+            return
+        try:
+            logger.info("实施细则索引不存在，正在从 %s 构建...", pdf_path)
+            _write_json_atomic(path, build_rules_index(pdf_path))
+        except Exception as e:
+            logger.error("实施细则索引构建失败: %s", e)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="解析实施细则 PDF，生成本地检验项目索引")
+    parser.add_argument("--pdf", default=str(RULES_PDF), help="实施细则 PDF 路径")
+    parser.add_argument("--output", default=str(RULES_INDEX_FILE), help="索引文件路径")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    data = build_rules_index(Path(args.pdf))
+    _write_json_atomic(Path(args.output), data)
+    rows = sum(len(t["rows"]) for t in data["tables"].values())
+    print(f"实施细则检验项目索引: {len(data['tables'])} 个表, {rows} 个检验项目, {len(data['foods'])} 个食品名称, "
+          f"耗时 {time.time() - start:.1f}s -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,154 @@
+"""
+RAGFlow chunk 表格解析结果缓存
+
+同一个 chunk（chunk_id 不变、内容不变）在不同报告、不同食品的检索结果中反复出现，
+每次都要经过 HtmlTableParser.parse_table + find_inspection_items 的长串筛选规则。
+这里按 chunk 缓存最终提取出的检验项目：
+
+- 键: sha1(解析规则版本 + chunk_id + 内容哈希)。知识库重新切分后内容变化，旧条目自然不再命中
+- LRU 容量上限，进程内 OrderedDict，定期持久化到 static/cache/parsed_tables.json
+- 解析或筛选规则（html_table_parser）变化时递增 PARSER_SCHEMA_VERSION，旧条目全部失效
+"""
+from __future__ import annotations
+
+import atexit
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app_logging import get_logger
+from html_table_parser import HtmlTableParser
+from ragflow_cache import CACHE_DIR, SAVE_INTERVAL_S, _load_json, _write_json_atomic
+
+logger = get_logger(__name__)
+
+PARSED_TABLES_FILE = CACHE_DIR / "parsed_tables.json"
+DEFAULT_MAX_ENTRIES = 5000
+
+# html_table_parser 的解析/筛选逻辑变化时递增
+PARSER_SCHEMA_VERSION = 1
+
+
+def extract_chunk_items(content: str) -> List[Dict[str, Any]]:
+    """解析 chunk 中的 HTML 表格并提取检验项目（不经过缓存）"""
+    return HtmlTableParser.find_inspection_items(HtmlTableParser.parse_table(content))
+
+
+class ParsedTableCache:
+    """chunk -> 检验项目 的 LRU 缓存（线程安全）"""
+
+    def __init__(self, path: Optional[Path] = PARSED_TABLES_FILE, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        :param path: 持久化文件，None 表示只在内存中缓存
+        """
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._dirty = False
+        self._last_save = 0.0
+        self._load()
+
+    @staticmethod
+    def make_key(chunk_id: Optional[str], content: str) -> str:
+        content_hash = hashlib.sha1((content or "").encode("utf-8")).hexdigest()
+        raw = f"{PARSER_SCHEMA_VERSION}\x00{chunk_id or ''}\x00{content_hash}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def inspection_items(self, chunk_id: Optional[str], content: str) -> List[Dict[str, Any]]:
+        """
+        返回 chunk 中提取出的检验项目，未命中时解析并写入缓存
+
+        返回的是副本，调用方可以直接补充 source_page 等字段
+        """
+        key = self.make_key(chunk_id, content)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return [dict(item) for item in entry["items"]]
+            self.misses += 1
+
+        # 解析放在锁外，不阻塞其他线程读缓存；并发解析同一 chunk 的结果相同，重复写入无害
+        items = extract_chunk_items(content)
+        with self._lock:
+            self._entries[key] = {
+                "chunk_id": chunk_id,
+                "created_at": time.time(),
+                "items": [dict(item) for item in items],
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+            if time.time() - self._last_save >= SAVE_INTERVAL_S:
+                self.flush()
+        return items
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+        self.flush()
+
+    def _load(self) -> None:
+        if not self.path:
+            return
+        data = _load_json(self.path, {})
+        if data.get("schema") != PARSER_SCHEMA_VERSION:
+            return
+        # 文件中按 LRU 顺序（旧 -> 新）保存
+        for key, entry in (data.get("entries") or {}).items():
+            self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def flush(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                _write_json_atomic(self.path, {"schema": PARSER_SCHEMA_VERSION, "entries": self._entries})
+                self._dirty = False
+                self._last_save = time.time()
+            except Exception as e:
+                logger.warning("Failed to save parsed table cache: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_parsed_table_cache: Optional[ParsedTableCache] = None
+_parsed_table_cache_lock = threading.Lock()
+
+
+def get_parsed_table_cache(config: Dict[str, Any]) -> Optional[ParsedTableCache]:
+    """
+    获取解析结果缓存单例
+
+    RAGFLOW_PARSE_CACHE_DISABLED: true 关闭缓存
+    RAGFLOW_PARSE_CACHE_MAX_ENTRIES: 容量
+    RAGFLOW_PARSE_CACHE_PERSIST: false 时只在内存中缓存（默认持久化）
+    """
+    global _parsed_table_cache
+    if config.get("RAGFLOW_PARSE_CACHE_DISABLED"):
+        return None
+    with _parsed_table_cache_lock:
+        if _parsed_table_cache is None:
+            persist = config.get("RAGFLOW_PARSE_CACHE_PERSIST", True)
+            _parsed_table_cache = ParsedTableCache(
+                path=PARSED_TABLES_FILE if persist else None,
+                max_entries=int(config.get("RAGFLOW_PARSE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            )
+            atexit.register(_parsed_table_cache.flush)
+        return _parsed_table_cache
@@ -0,0 +1,139 @@
+"""
+find_inspection_items 筛选规则微基准
+
+用细则 PDF 中的真实检验项目表（本地细则索引，每页渲染成与 RAGFlow chunk 相同的 HTML 表格），
+对比逐行线性扫描黑名单 + 临时正则的旧写法与预编译筛选规则，并检查两者结果一致。
+
+    python src/profile_table_filters.py [--index static/cache/rules_items_index.json] [--repeat 5]
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from html_table_parser import HtmlTableParser, _NAME_BLACKLIST_WORDS, _STD_PREFIXES
+from local_index.rules_index import RULES_INDEX_FILE, load_rules_index, render_table_html
+
+
+def legacy_reject(raw_name):
+    """旧写法：逐个关键字 in 判断 + 每次调用时查找正则缓存"""
+    name = raw_name.strip()
+    if not raw_name or len(name) < 2 or len(name) > 50:
+        return True
+    if any(kw in raw_name for kw in list(_NAME_BLACKLIST_WORDS)):
+        return True
+    if name.isdigit() or re.match(r'^[a-zA-Z]$', name):
+        return True
+    if name.upper().startswith(_STD_PREFIXES):
+        return True
+    if re.match(r'^[\d\.\)\、]+$', name) or not re.search(r'[\u4e00-\u9fa5A-Za-z0-9]', raw_name):
+        return True
+    if len(re.findall(r'[\u4e00-\u9fa5]', name)) < 2 and not (name.isupper() and 2 <= len(name) <= 10):
+        return True
+    return False
+
+
+def legacy_valid_part(p):
+    if len(p) < 2 or p.isdigit():
+        return False
+    if (p.endswith(')') or p.endswith('）')) and not (p.startswith('(') or p.startswith('（')):
+        return False
+    if (p.startswith('(') or p.startswith('（')) and not (p.endswith(')') or p.endswith('）')):
+        return False
+    if len(p.strip('()（）')) < 2:
+        return False
+    for pattern in ['不检测', '不适用', '视产品', '而定', '以.*为主要原料', r'^[a-z]\.$', '^[a-z]、$']:
+        if re.search(pattern, p):
+            return False
+    return True
+
+
+def legacy_filter(rows):
+    """旧写法的筛选部分：逐行逐列查找列名，再逐条规则判断"""
+    kept = []
+    for row in rows:
+        name_key = None
+        for key in row.keys():
+            for target in ("检验项目", "项目名称", "项目"):
+                if target in key:
+                    name_key = key
+                    break
+            if name_key:
+                break
+        if not name_key or legacy_reject(row[name_key]):
+            continue
+        for key in row.keys():
+            for target in ("依据法律法规", "依据法律法规或标准", "检验依据"):
+                if target in key:
+                    break
+            for target in ("检测方法", "检验方法"):
+                if target in key:
+                    break
+        parts = row[name_key].split()
+        kept.append([p for p in parts if legacy_valid_part(p)] if len(parts) > 1 else parts)
+    return kept
+
+
+def compiled_filter(rows):
+    """预编译写法的筛选部分（与 find_inspection_items 使用相同的内部函数）"""
+    kept = []
+    for row in rows:
+        name_key, _, _ = HtmlTableParser._resolve_columns(tuple(row.keys()))
+        if not name_key or HtmlTableParser._reject_reason(row[name_key]) is not None:
+            continue
+        parts = row[name_key].split()
+        kept.append([p for p in parts if HtmlTableParser._is_valid_part(p)] if len(parts) > 1 else parts)
+    return kept
+
+
+def best_of(fn, chunks, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for rows in chunks:
+            fn(rows)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="find_inspection_items 筛选规则微基准")
+    parser.add_argument("--index", default=str(RULES_INDEX_FILE), help="细则索引文件（python -m local_index.rules_index 生成）")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    index = load_rules_index(Path(args.index))
+    if index is None:
+        print(f"细则索引不存在: {args.index}")
+        return 1
+
+    # 每张表每页一个 chunk，与 build_local_verification_plan / RAGFlow 的切分粒度相同
+    chunks = []
+    for table in index.tables.values():
+        for page in table.get("pages", []):
+            rows = [r for r in table.get("rows", []) if r.get("page") == page]
+            html = render_table_html(table.get("header", []), rows)
+            chunks.append(HtmlTableParser.parse_table(html))
+    total_rows = sum(len(rows) for rows in chunks)
+    print(f"chunks: {len(chunks)}, rows: {total_rows}")
+
+    mismatches = sum(legacy_filter(rows) != compiled_filter(rows) for rows in chunks)
+    print(f"结果不一致的 chunk: {mismatches}")
+
+    legacy = best_of(legacy_filter, chunks, args.repeat)
+    compiled = best_of(compiled_filter, chunks, args.repeat)
+    print(f"旧写法:     {legacy * 1000:8.2f} ms  ({legacy / total_rows * 1e6:.2f} us/行)")
+    print(f"预编译规则: {compiled * 1000:8.2f} ms  ({compiled / total_rows * 1e6:.2f} us/行)  x{legacy / compiled:.1f}")
+
+    # 完整的 find_inspection_items（含项目名称拆分）
+    full = best_of(HtmlTableParser.find_inspection_items, chunks, args.repeat)
+    print(f"find_inspection_items 全流程: {full * 1000:.2f} ms")
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+RAGFlow 异步检索客户端
+
+verify_inspection_compliance 原来每次调用都新建 ThreadPoolExecutor(max_workers=5)，
+每个线程阻塞在同步请求上。这里改为在一个常驻的后台事件循环中执行检索：
+
+- query_many(questions, dataset_ids): 一次提交一个报告的全部检索，并发执行
+  （支持服务端过滤参数和自适应 top-k，语义同 RAGFlowClient.query / query_adaptive）
+- 全局并发上限（asyncio.Semaphore，所有报告共享），排队中的检索只是挂起的协程，开销很小
+- 安装了 aiohttp 时直接发异步 HTTP 请求；否则在线程池中调用同步的 RAGFlowClient.query
+- 检索缓存、熔断器与同步客户端共用；同一事件循环内相同的检索只发一次
+- 其他方法（query_inspection_items 等）直接转发给同步客户端，保持 RAGFlowClient 接口不变
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from app_logging import bind_context, current_request_id, get_logger, request_context
+from circuit_breaker import CircuitOpenError, RetryableError, async_call_with_retry
+from ragflow_client import (
+    ADAPTIVE_PAGE_SIZES,
+    CONNECT_TIMEOUT_S,
+    RAGFlowClient,
+    build_retrieval_filters,
+    build_retrieval_payload,
+    get_ragflow_client,
+    needs_more_results,
+)
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+# 自适应检索的本地筛选条件：单个函数或与 questions 对应的函数列表
+Accept = Union[Callable[[Dict[str, Any]], bool], Sequence[Callable[[Dict[str, Any]], bool]]]
+
+
+async def _in_request(request_id: str, coro) -> Any:
+    # gather 创建的子任务复制当前上下文，一并带上请求 ID
+    with request_context(request_id):
+        return await coro
+
+
+class AsyncRAGFlowClient:
+    """在后台事件循环中并发执行 RAGFlow 检索"""
+
+    def __init__(self, client: RAGFlowClient, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        """
+        :param client: 同步客户端（提供配置、缓存、熔断器，以及无 aiohttp 时的实际请求）
+        :param max_concurrency: 全局同时进行的检索请求数上限
+        """
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        # 以下对象只在后台事件循环中创建和访问
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._http = None
+
+    def __getattr__(self, name: str) -> Any:
+        # 未实现的方法转发给同步客户端
+        return getattr(self.client, name)
+
+    # ------------------------------------------------------------------ 事件循环
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="ragflow-async", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def _run(self, coro) -> Any:
+        """在后台事件循环中执行协程并等待结果（供同步调用方使用），日志沿用调用方的请求 ID"""
+        return asyncio.run_coroutine_threadsafe(
+            _in_request(current_request_id(), coro), self._ensure_loop()
+        ).result()
+
+    # ------------------------------------------------------------------ 同步接口
+
+    def query(self, question: str, dataset_ids: List[str] = None, page_size: int = 30,
+              **filters: Any) -> List[Dict[str, Any]]:
+        return self.query_many([question], dataset_ids=dataset_ids, page_size=page_size, **filters)[0]
+
+    def query_adaptive(
+        self,
+        question: str,
+        accept: Callable[[Dict[str, Any]], bool],
+        min_usable: int = 1,
+        page_sizes: Sequence[int] = ADAPTIVE_PAGE_SIZES,
+        dataset_ids: List[str] = None,
+        **filters: Any,
+    ) -> List[Dict[str, Any]]:
+        return self.query_many(
+            [question], dataset_ids=dataset_ids, accept=accept, min_usable=min_usable,
+            page_sizes=page_sizes, **filters,
+        )[0]
+
+    def query_many(
+        self,
+        questions: Sequence[str],
+        dataset_ids: List[str] = None,
+        page_size: int = 30,
+        accept: Optional[Accept] = None,
+        min_usable: int = 1,
+        page_sizes: Optional[Sequence[int]] = None,
+        **filters: Any,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        并发执行多个检索，按 questions 的顺序返回结果（失败的检索返回空列表）
+
+        :param accept: 指定时使用自适应 top-k（见 RAGFlowClient.query_adaptive），
+                       按 page_sizes 逐档扩大，此时忽略 page_size；
+                       可以是单个函数，也可以是与 questions 一一对应的函数列表
+        :param filters: 下推到服务端的检索参数（similarity_threshold / document_ids 等）
+        """
+        if not questions:
+            return []
+        return self._run(self.aquery_many(
+            questions, dataset_ids=dataset_ids, page_size=page_size, accept=accept,
+            min_usable=min_usable, page_sizes=page_sizes, **filters,
+        ))
+
+    # ------------------------------------------------------------------ 异步接口
+
+    async def aquery_many(
+        self,
+        questions: Sequence[str],
+        dataset_ids: List[str] = None,
+        page_size: int = 30,
+        accept: Optional[Accept] = None,
+        min_usable: int = 1,
+        page_sizes: Optional[Sequence[int]] = None,
+        **filters: Any,
+    ) -> List[List[Dict[str, Any]]]:
+        if accept is not None:
+            sizes = page_sizes or ADAPTIVE_PAGE_SIZES
+            accepts = accept if isinstance(accept, (list, tuple)) else [accept] * len(questions)
+            coros = (
+                self.aquery_adaptive(q, a, min_usable, sizes, dataset_ids, **filters)
+                for q, a in zip(questions, accepts)
+            )
+        else:
+            coros = (self.aquery(q, dataset_ids=dataset_ids, page_size=page_size, **filters) for q in questions)
+        return list(await asyncio.gather(*coros))
+
+    async def aquery_adaptive(
+        self,
+        question: str,
+        accept: Callable[[Dict[str, Any]], bool],
+        min_usable: int = 1,
+        page_sizes: Sequence[int] = ADAPTIVE_PAGE_SIZES,
+        dataset_ids: List[str] = None,
+        **filters: Any,
+    ) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        for page_size in page_sizes:
+            results = await self.aquery(question, dataset_ids=dataset_ids, page_size=page_size, **filters)
+            if not needs_more_results(results, page_size, accept, min_usable):
+                break
+        return results
+
+    async def aquery(self, question: str, dataset_ids: List[str] = None, page_size: int = 30,
+                     **filters: Any) -> List[Dict[str, Any]]:
+        target_ids = dataset_ids if dataset_ids else [self.client.kb_id]
+        filters = build_retrieval_filters(**filters)
+        cache = self.client.cache
+
+        if cache:
+            cached = cache.get(question, target_ids, page_size, filters)
+            if cached is not None:
+                return cached
+            key = cache.make_key(question, target_ids, page_size, filters)
+        else:
+            key = repr((question, sorted(target_ids), page_size, sorted(filters.items())))
+
+        # 同一事件循环内相同的检索只发一次
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(question, target_ids, page_size, filters))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _f: self._inflight.pop(key, None))
+        results = await asyncio.shield(future)
+        return [dict(r) for r in results]
+
+    async def _fetch(self, question: str, target_ids: List[str], page_size: int,
+                     filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self._semaphore:
+            if not AIOHTTP_AVAILABLE or not isinstance(self.client, RAGFlowClient):
+                # 同步客户端自带缓存、请求合并、熔断与重试；本地检索引擎（RAGFLOW_BACKEND=local）同样走这里
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    None, bind_context(functools.partial(self.client.query, question, target_ids, page_size, **filters))
+                )
+
+            results = await self._aretrieve(question, target_ids, page_size, filters)
+            if results is None:
+                return []
+            if self.client.cache:
+                self.client.cache.put(question, target_ids, page_size, results, filters)
+            return results
+
+    async def _aretrieve(self, question: str, target_ids: List[str], page_size: int,
+                         filters: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """aiohttp 请求 RAGFlow 检索接口；失败返回 None（不写入缓存）"""
+        client = self.client
+        data = build_retrieval_payload(question, target_ids, page_size, filters)
+        if self._http is None:
+            self._http = aiohttp.ClientSession(
+                headers=client.headers,
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+                trust_env=False,
+            )
+
+        async def _post(timeout: float) -> Dict[str, Any]:
+            t = aiohttp.ClientTimeout(total=timeout, connect=min(CONNECT_TIMEOUT_S, timeout))
+            async with self._http.post(client.api_url, json=data, timeout=t) as response:
+                if response.status >= 500:
+                    raise RetryableError(f"HTTP {response.status}")
+                if response.status != 200:
+                    text = await response.text()
+                    return {"code": -1, "message": f"HTTP {response.status} - {text[:200]}"}
+                return await response.json(content_type=None)
+
+        try:
+            logger.info("正在查询 RAGFlow (async): %s", question)
+            result = await async_call_with_retry(
+                _post,
+                client.breaker,
+                client.retry_budget,
+                retry_on=(RetryableError, aiohttp.ClientConnectionError, asyncio.TimeoutError),
+                max_attempt_timeout_s=client.timeout_s,
+            )
+            if result.get("code") == 0:
+                chunks = result.get("data", {}).get("chunks", [])
+                logger.debug("RAGFlow 查询成功: %s 找到 %d 个结果", question, len(chunks))
+                return client._process_results(chunks)
+            logger.warning("RAGFlow API 错误: %s", result)
+            return None
+        except CircuitOpenError as e:
+            logger.warning("RAGFlow 请求跳过: %s", e)
+            return None
+        except Exception as e:
+            logger.warning("RAGFlow 请求异常: %s", e)
+            return None
+
+
+# 全局单例（共享事件循环和并发上限）
+_async_client: Optional[AsyncRAGFlowClient] = None
+_async_client_lock = threading.Lock()
+
+
+def get_async_ragflow_client(config: Dict[str, Any]) -> Optional[AsyncRAGFlowClient]:
+    """
+    获取 AsyncRAGFlowClient 单例
+
+    RAGFLOW_MAX_CONCURRENCY: 全局并发检索数上限
+    """
+    global _async_client
+
+    if _async_client is not None:
+        return _async_client
+
+    with _async_client_lock:
+        if _async_client is not None:
+            return _async_client
+        client = get_ragflow_client(config)
+        if client is None:
+            return None
+        _async_client = AsyncRAGFlowClient(
+            client,
+            max_concurrency=int(config.get("RAGFLOW_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+        )
+        return _async_client
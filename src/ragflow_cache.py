@@ -0,0 +1,287 @@
+"""
+RAGFlow 检索结果缓存
+
+同一批检索问题在不同报告中反复出现（"黄瓜 检验项目表 必检项目 限量指标"、"{item} 目次"、
+"表{n}"、"{item} 最大残留限量" 等），每次往返 RAGFlow 最长要 60 秒。
+
+- 键: (question, 排序后的 dataset_ids, page_size, 服务端过滤参数) + 各知识库的版本号
+- TTL + LRU 容量上限，进程内 OrderedDict，定期持久化到 static/cache/ragflow_retrieval.json
+- 知识库重新索引后调用 bump_dataset_version(dataset_id)，旧版本的缓存立即失效
+
+版本号来源（两者合并，后者优先）：
+  - config 中的 RAGFLOW_KB_VERSIONS: {"<dataset_id>": "2025-06-01", ...}
+  - static/cache/ragflow_kb_versions.json（bump_dataset_version 写入）
+
+多个 gunicorn worker 各自持有一份缓存：版本号文件的 mtime 变化时重新读取，
+任一进程的 bump 在其他进程下一次查询时生效；落盘前先合并磁盘上其他进程写入的条目。
+"""
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_DIR = Path("static/cache")
+RETRIEVAL_CACHE_FILE = CACHE_DIR / "ragflow_retrieval.json"
+KB_VERSIONS_FILE = CACHE_DIR / "ragflow_kb_versions.json"
+
+DEFAULT_TTL_S = 7 * 86400       # 知识库内容很少变化，主要依赖版本号失效
+DEFAULT_MAX_ENTRIES = 2000
+SAVE_INTERVAL_S = 10            # 两次落盘的最小间隔，避免每次写入都序列化整个缓存
+
+
+def _load_json(path: Path, default: Any) -> Any:
+    if path.exists():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return default
+    return default
+
+
+def _write_json_atomic(path: Path, data: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class RetrievalCache:
+    """RAGFlow 检索结果的 TTL + LRU 缓存（线程安全）"""
+
+    def __init__(
+        self,
+        path: Optional[Path] = RETRIEVAL_CACHE_FILE,
+        versions_path: Optional[Path] = KB_VERSIONS_FILE,
+        ttl_s: float = DEFAULT_TTL_S,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        versions: Optional[Dict[str, str]] = None,
+    ):
+        """
+        :param path: 持久化文件，None 表示只在内存中缓存
+        :param versions_path: 版本号文件，None 表示不持久化版本号
+        :param versions: config 中配置的初始版本号
+        """
+        self.path = Path(path) if path else None
+        self.versions_path = Path(versions_path) if versions_path else None
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._dirty = False
+        self._last_save = 0.0
+
+        # 本进程上次落盘后删除的键（bump / 过期），合并磁盘条目时不再带回来
+        self._dropped: set = set()
+        self._cleared = False
+
+        self._config_versions: Dict[str, str] = {str(k): str(v) for k, v in (versions or {}).items()}
+        self._versions: Dict[str, str] = dict(self._config_versions)
+        self._versions_mtime: Optional[int] = None
+        self._refresh_versions()
+
+        self._load()
+
+    # ------------------------------------------------------------------ 键与版本
+
+    def _refresh_versions(self) -> None:
+        """版本号文件被（其他进程）修改后重新读取"""
+        if not self.versions_path:
+            return
+        try:
+            mtime = self.versions_path.stat().st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._versions_mtime:
+            return
+        with self._lock:
+            if mtime == self._versions_mtime:
+                return
+            versions = dict(self._config_versions)
+            versions.update(_load_json(self.versions_path, {}))
+            self._versions = versions
+            self._versions_mtime = mtime
+
+    def dataset_version(self, dataset_id: str) -> str:
+        self._refresh_versions()
+        return self._versions.get(dataset_id, "0")
+
+    def make_key(self, question: str, dataset_ids: List[str], page_size: int,
+                 filters: Optional[Dict[str, Any]] = None) -> str:
+        self._refresh_versions()
+        ids = sorted(dataset_ids or [])
+        versions = [f"{i}@{self._versions.get(i, '0')}" for i in ids]
+        parts: List[Any] = [question, versions, page_size]
+        if filters:
+            # 没有过滤参数时保持旧的键不变
+            parts.append(filters)
+        raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def bump_dataset_version(self, dataset_id: str, version: Optional[str] = None) -> str:
+        """
+        知识库重新索引后调用：更新版本号并清除该知识库相关的缓存
+
+        :param version: 指定新版本号，默认使用当前时间戳
+        """
+        new_version = str(version) if version else time.strftime("%Y%m%d%H%M%S")
+        with self._lock:
+            # 先读取其他进程的 bump，避免整体覆盖掉它们写入的版本号
+            self._refresh_versions()
+            self._versions[dataset_id] = new_version
+            stale = [k for k, e in self._entries.items() if dataset_id in e.get("dataset_ids", [])]
+            for k in stale:
+                del self._entries[k]
+            self._dropped.update(stale)
+            if self.versions_path:
+                try:
+                    disk_versions = _load_json(self.versions_path, {})
+                    disk_versions[dataset_id] = new_version
+                    _write_json_atomic(self.versions_path, disk_versions)
+                    self._versions_mtime = self.versions_path.stat().st_mtime_ns
+                except Exception as e:
+                    logger.warning("Failed to save RAGFlow KB versions: %s", e)
+            self._dirty = True
+            self.flush()
+        logger.info("RAGFlow 知识库 %s 版本更新为 %s，清除缓存 %d 条", dataset_id, new_version, len(stale))
+        return new_version
+
+    # ------------------------------------------------------------------ 读写
+
+    def get(self, question: str, dataset_ids: List[str], page_size: int,
+            filters: Optional[Dict[str, Any]] = None) -> Optional[List[Dict[str, Any]]]:
+        key = self.make_key(question, dataset_ids, page_size, filters)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() - entry.get("created_at", 0) > self.ttl_s:
+                del self._entries[key]
+                self._dropped.add(key)
+                self._dirty = True
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # 返回副本，调用方修改结果不会污染缓存
+            return [dict(r) for r in entry["results"]]
+
+    def put(self, question: str, dataset_ids: List[str], page_size: int, results: List[Dict[str, Any]],
+            filters: Optional[Dict[str, Any]] = None) -> None:
+        key = self.make_key(question, dataset_ids, page_size, filters)
+        with self._lock:
+            self._entries[key] = {
+                "question": question,
+                "dataset_ids": sorted(dataset_ids or []),
+                "page_size": page_size,
+                "filters": filters or {},
+                "created_at": time.time(),
+                "results": [dict(r) for r in results],
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+            if time.time() - self._last_save >= SAVE_INTERVAL_S:
+                self.flush()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._cleared = True
+            self._dirty = True
+            self.flush()
+
+    # ------------------------------------------------------------------ 持久化
+
+    def _load(self) -> None:
+        if not self.path:
+            return
+        data = _load_json(self.path, {})
+        now = time.time()
+        # 文件中按 LRU 顺序（旧 -> 新）保存
+        for key, entry in (data.get("entries") or {}).items():
+            if now - entry.get("created_at", 0) <= self.ttl_s:
+                self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def reload(self) -> None:
+        """
+        从磁盘合并其他进程写入的条目（本进程已有的条目不覆盖）
+        """
+        if not self.path:
+            return
+        data = _load_json(self.path, {})
+        now = time.time()
+        with self._lock:
+            for key, entry in (data.get("entries") or {}).items():
+                if key in self._entries or key in self._dropped:
+                    continue
+                if now - entry.get("created_at", 0) <= self.ttl_s:
+                    self._entries[key] = entry
+                    self._entries.move_to_end(key, last=False)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def flush(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                # 合并其他进程落盘的条目后再写，而不是用本进程的内容整体覆盖（clear 之后除外）
+                if not self._cleared:
+                    self.reload()
+                _write_json_atomic(self.path, {"entries": self._entries})
+                self._dirty = False
+                self._dropped.clear()
+                self._cleared = False
+                self._last_save = time.time()
+            except Exception as e:
+                logger.warning("Failed to save RAGFlow retrieval cache: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "versions": dict(self._versions),
+            }
+
+
+def create_retrieval_cache(config: Dict[str, Any]) -> Optional[RetrievalCache]:
+    """
+    根据 config 创建缓存
+
+    RAGFLOW_CACHE_DISABLED: true 关闭缓存
+    RAGFLOW_CACHE_TTL_S / RAGFLOW_CACHE_MAX_ENTRIES: TTL 与容量
+    RAGFLOW_KB_VERSIONS: 各知识库的初始版本号
+    """
+    if config.get("RAGFLOW_CACHE_DISABLED"):
+        return None
+    cache = RetrievalCache(
+        ttl_s=float(config.get("RAGFLOW_CACHE_TTL_S", DEFAULT_TTL_S)),
+        max_entries=int(config.get("RAGFLOW_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+        versions=config.get("RAGFLOW_KB_VERSIONS") or {},
+    )
+    atexit.register(cache.flush)
+    return cache
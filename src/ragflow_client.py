@@ -1,15 +1,103 @@
 import requests
 import json
+import logging
 import re
-from typing import List, Dict, Any, Optional
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from requests.adapters import HTTPAdapter
+
+from app_logging import get_logger
+from circuit_breaker import CircuitOpenError, RetryableError, RetryBudget, call_with_retry, get_breaker
+from ragflow_cache import CACHE_DIR, RetrievalCache, create_retrieval_cache
+from single_flight import SingleFlight, interprocess_lock
+
+logger = get_logger(__name__)
+
+# 单个报告约 20~60 次检索，ragflow_verifier 中最多 5 个线程并发
+DEFAULT_POOL_SIZE = 10
+
+INFLIGHT_LOCK_DIR = CACHE_DIR / "ragflow_locks"
+
+# 自适应 top-k 的页大小档位
+ADAPTIVE_PAGE_SIZES = (5, 10, 20, 30)
+
+# 正常检索在数秒内返回；RAGFlow 卡死时单次检索最多占用请求线程 DEFAULT_RETRY_BUDGET_S 秒，
+# 连续失败 3 次（约两次检索）后熔断，之后直接快速失败（gunicorn 每个 worker 只有 2 个线程）
+CONNECT_TIMEOUT_S = 2
+DEFAULT_TIMEOUT_S = 8
+DEFAULT_MAX_ATTEMPTS = 2
+DEFAULT_RETRY_BUDGET_S = 12
+
+
+def build_retrieval_filters(
+    similarity_threshold: Optional[float] = None,
+    top_k: Optional[int] = None,
+    document_ids: Optional[List[str]] = None,
+    vector_similarity_weight: Optional[float] = None,
+    keyword: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """
+    服务端过滤参数（RAGFlow retrieval 接口原生支持），只保留显式指定的项
+
+    :param similarity_threshold: 相似度下限，低于此值的 chunk 不返回
+    :param top_k: 参与重排的候选 chunk 数
+    :param document_ids: 只在这些文档中检索
+    :param vector_similarity_weight: 向量相似度权重（其余为关键词权重），表号/目次等精确词检索宜调低
+    :param keyword: 是否启用关键词抽取增强
+    """
+    filters: Dict[str, Any] = {}
+    if similarity_threshold is not None:
+        filters["similarity_threshold"] = float(similarity_threshold)
+    if top_k is not None:
+        filters["top_k"] = int(top_k)
+    if document_ids:
+        filters["document_ids"] = sorted(document_ids)
+    if vector_similarity_weight is not None:
+        filters["vector_similarity_weight"] = float(vector_similarity_weight)
+    if keyword is not None:
+        filters["keyword"] = bool(keyword)
+    return filters
+
+
+def build_retrieval_payload(question: str, dataset_ids: List[str], page_size: int,
+                            filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """RAGFlow 官方 API 的检索请求体"""
+    data = {
+        "question": question,
+        "dataset_ids": dataset_ids,
+        "page": 1,
+        "page_size": page_size
+    }
+    data.update(filters or {})
+    return data
+
+
+def needs_more_results(results: List[Dict[str, Any]], page_size: int,
+                       accept: Callable[[Dict[str, Any]], bool], min_usable: int) -> bool:
+    """自适应 top-k：本页已取满（可能还有更多）且本地筛选后可用结果不足时需要扩大"""
+    if len(results) < page_size:
+        return False
+    return sum(1 for c in results if accept(c)) < min_usable
+
 
 class RAGFlowClient:
-    def __init__(self, api_url: str, api_key: str, kb_id: str):
+    def __init__(self, api_url: str, api_key: str, kb_id: str, pool_size: int = DEFAULT_POOL_SIZE,
+                 cache: Optional[RetrievalCache] = None, cross_worker: bool = False,
+                 timeout_s: float = DEFAULT_TIMEOUT_S, retry_budget: Optional[RetryBudget] = None,
+                 breaker_threshold: int = 3, breaker_recovery_s: float = 30.0):
         """
         初始化 RAGFlow 客户端
         :param api_url: RAGFlow API 地址
         :param api_key: API 密钥
         :param kb_id: 知识库 ID
+        :param pool_size: 连接池大小（同一主机的最大 keep-alive 连接数）
+        :param cache: 检索结果缓存（None 表示不缓存）
+        :param cross_worker: 是否通过文件锁在多个 worker 进程间合并相同请求（需要启用缓存）
+        :param timeout_s: 单次尝试的读取超时
+        :param retry_budget: 单次检索的重试预算（尝试次数 + 总耗时）
+        :param breaker_threshold: 连续失败多少次后熔断
+        :param breaker_recovery_s: 熔断后多久放行探测请求
         """
         self.api_url = api_url
         self.api_key = api_key
@@ -19,9 +107,42 @@ class RAGFlowClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        self.session = self._create_session(pool_size)
+        self.cache = cache
+        self.cross_worker = cross_worker and cache is not None and cache.path is not None
+        # 并发的相同检索只发一次 HTTP 请求
+        self._inflight = SingleFlight()
+        self.timeout_s = timeout_s
+        self._doc_ids: Dict[tuple, List[str]] = {}
+        self._doc_ids_lock = threading.Lock()
+        self.retry_budget = retry_budget or RetryBudget(
+            max_attempts=DEFAULT_MAX_ATTEMPTS, deadline_s=DEFAULT_RETRY_BUDGET_S,
+        )
+        # 同一接口地址共享熔断器
+        self.breaker = get_breaker(
+            f"RAGFlow {self.api_url}",
+            failure_threshold=breaker_threshold,
+            recovery_timeout_s=breaker_recovery_s,
+        )
         
-        # 调试输出
-        print(f"RAGFlowClient 初始化: URL={self.api_url}, KB_ID={self.kb_id}")
+        logger.info("RAGFlowClient 初始化: URL=%s, KB_ID=%s, pool_size=%d", self.api_url, self.kb_id, pool_size)
+
+    def _create_session(self, pool_size: int) -> requests.Session:
+        """
+        创建共享的 requests.Session（只配置一次）
+
+        - HTTPAdapter 连接池按主机复用 keep-alive 连接，urllib3 连接池本身是线程安全的，
+          多个线程共用一个 Session 发起 POST 不会互相干扰
+        - trust_env=False: 不读取 HTTP(S)_PROXY / NO_PROXY 等环境变量，直连 RAGFlow
+          （替代原来每次请求前改写 os.environ['NO_PROXY'] 的做法）
+        """
+        session = requests.Session()
+        session.trust_env = False
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=False)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(self.headers)
+        return session
 
     def query_inspection_items(self, food_name: str, custom_query: str = None) -> List[Dict[str, Any]]:
         """
@@ -63,12 +184,14 @@ class RAGFlowClient:
         code = standard_code if standard_code else "GB 2763"
         return self.query_standard_limit(code, item_name, kb_id=kb_id)
 
-    def query(self, question: str, dataset_ids: List[str] = None, page_size: int = 30) -> List[Dict[str, Any]]:
+    def query(self, question: str, dataset_ids: List[str] = None, page_size: int = 30,
+              **filters: Any) -> List[Dict[str, Any]]:
         """
         通用查询方法
         :param question: 查询问题
         :param dataset_ids: 知识库 ID 列表 (可选，默认为 self.kb_id)
         :param page_size: 返回结果数量
+        :param filters: 下推到服务端的检索参数，见 build_retrieval_filters
         """
         target_kb_ids = dataset_ids if dataset_ids else [self.kb_id]
         
@@ -76,15 +199,87 @@ class RAGFlowClient:
         # 为了不破坏现有逻辑，我们直接在这里调用底层请求，或者增强 _search
         # 考虑到 _search 比较复杂（重试、代理），最好增强 _search
         
-        return self._search(question, dataset_ids=target_kb_ids, page_size=page_size)
+        return self._search(question, dataset_ids=target_kb_ids, page_size=page_size, **filters)
+
+    def query_adaptive(
+        self,
+        question: str,
+        accept: Callable[[Dict[str, Any]], bool],
+        min_usable: int = 1,
+        page_sizes: Sequence[int] = ADAPTIVE_PAGE_SIZES,
+        dataset_ids: List[str] = None,
+        **filters: Any,
+    ) -> List[Dict[str, Any]]:
+        """
+        自适应 top-k：先取少量结果，本地筛选后可用的 chunk 不足 min_usable 且本页已取满时再扩大
+
+        :param accept: 本地筛选条件（与调用方后续使用的过滤逻辑一致）
+        :return: 最后一次检索的全部结果（调用方照常做本地筛选）
+        """
+        results: List[Dict[str, Any]] = []
+        for page_size in page_sizes:
+            results = self.query(question, dataset_ids=dataset_ids, page_size=page_size, **filters)
+            if not needs_more_results(results, page_size, accept, min_usable):
+                break
+            logger.debug("RAGFlow 自适应检索: '%s' 可用结果不足 %d 个，扩大到下一档", question, min_usable)
+        return results
+
+    def find_document_ids(self, dataset_id: str, keyword: str) -> List[str]:
+        """
+        按文件名关键字查找知识库中的文档 ID（用于 document_ids 过滤），结果在进程内缓存
+        失败时返回空列表，调用方退回到不过滤文档
+        """
+        key = (dataset_id, keyword)
+        with self._doc_ids_lock:
+            if key in self._doc_ids:
+                return list(self._doc_ids[key])
+
+        doc_ids: List[str] = []
+        base_url = self.api_url.rsplit("/retrieval", 1)[0]
+        try:
+            response = self.session.get(
+                f"{base_url}/datasets/{dataset_id}/documents",
+                params={"keywords": keyword, "page": 1, "page_size": 100},
+                timeout=(CONNECT_TIMEOUT_S, 15),
+            )
+            result = response.json() if response.status_code == 200 else {}
+            if result.get("code") != 0:
+                logger.warning("RAGFlow 文档列表查询失败: %s %.200s", response.status_code, result)
+                return []
+            for doc in result.get("data", {}).get("docs", []):
+                if keyword in doc.get("name", ""):
+                    doc_ids.append(doc.get("id"))
+        except Exception as e:
+            logger.warning("RAGFlow 文档列表查询异常: %s", e)
+            return []
+
+        logger.info("RAGFlow 文档 '%s' -> %s", keyword, doc_ids)
+        with self._doc_ids_lock:
+            self._doc_ids[key] = doc_ids
+        return list(doc_ids)
+
+    def is_available(self) -> bool:
+        """熔断中返回 False，调用方可以直接降级，不再发起检索"""
+        return not self.breaker.is_open()
 
-    def _search(self, question: str, kb_id: str = None, dataset_ids: List[str] = None, page_size: int = 30) -> List[Dict[str, Any]]:
+    def bump_dataset_version(self, dataset_id: str, version: str = None) -> Optional[str]:
+        """
+        知识库重新索引后调用，使该知识库的检索缓存失效
+        """
+        if not self.cache:
+            return None
+        return self.cache.bump_dataset_version(dataset_id, version)
+
+    def _search(self, question: str, kb_id: str = None, dataset_ids: List[str] = None, page_size: int = 30,
+                **filters: Any) -> List[Dict[str, Any]]:
         """
         执行 RAGFlow 搜索 (使用官方 API 格式)
         :param kb_id: 可选，已废弃，兼容旧代码
         :param dataset_ids: 知识库 ID 列表
         :param page_size: 页大小
+        :param filters: 服务端过滤参数
         """
+        filters = build_retrieval_filters(**filters)
         # 确定 dataset_ids
         target_ids = dataset_ids
         if not target_ids:
@@ -93,55 +288,83 @@ class RAGFlowClient:
             else:
                 target_ids = [self.kb_id]
         
-        # 使用官方 API 参数格式
-        data = {
-            "question": question,
-            "dataset_ids": target_ids,
-            "page": 1,
-            "page_size": page_size
-        }
+        if self.cache:
+            cached = self.cache.get(question, target_ids, page_size, filters)
+            if cached is not None:
+                logger.debug("RAGFlow 缓存命中: %s (%d 个结果)", question, len(cached))
+                return cached
+
+        if self.cache:
+            key = self.cache.make_key(question, target_ids, page_size, filters)
+        else:
+            key = json.dumps([question, sorted(target_ids), page_size, filters], ensure_ascii=False, sort_keys=True)
+        results = self._inflight.do(key, lambda: self._fetch(key, question, target_ids, page_size, filters))
+        # 合并的调用方各自拿一份副本
+        return [dict(r) for r in results]
+
+    def _fetch(self, key: str, question: str, target_ids: List[str], page_size: int,
+               filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        本进程内的 leader 执行；开启 cross_worker 时先拿文件锁，
+        拿到锁后重新读取磁盘缓存（其他 worker 可能刚刚写入）
+        """
+        if not self.cross_worker:
+            return self._fetch_and_store(question, target_ids, page_size, filters)
+
+        with interprocess_lock(INFLIGHT_LOCK_DIR, key) as locked:
+            if locked:
+                self.cache.reload()
+                cached = self.cache.get(question, target_ids, page_size, filters)
+                if cached is not None:
+                    logger.debug("RAGFlow 缓存命中(其他 worker): %s", question)
+                    return cached
+            results = self._fetch_and_store(question, target_ids, page_size, filters)
+            if locked:
+                # 释放锁之前落盘，等待中的 worker 才能读到
+                self.cache.flush()
+            return results
+
+    def _fetch_and_store(self, question: str, target_ids: List[str], page_size: int,
+                         filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        results = self._retrieve(question, target_ids, page_size, filters)
+        if results is None:
+            return []
+        if self.cache:
+            self.cache.put(question, target_ids, page_size, results, filters)
+        return results
+
+    def _retrieve(self, question: str, target_ids: List[str], page_size: int,
+                  filters: Optional[Dict[str, Any]] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        请求 RAGFlow 检索接口
+        :return: 处理后的结果列表；请求失败返回 None（失败结果不写入缓存）
+        """
+        data = build_retrieval_payload(question, target_ids, page_size, filters)
+
+        def _post(timeout: float) -> requests.Response:
+            # 连接超时单独设短，服务不可达时快速失败
+            response = self.session.post(
+                self.api_url,
+                json=data,
+                timeout=(min(CONNECT_TIMEOUT_S, timeout), timeout),
+            )
+            if response.status_code >= 500:
+                raise RetryableError(f"HTTP {response.status_code}")
+            return response
 
         try:
-            print(f"正在查询 RAGFlow: {question}")
-            
-            # 添加重试机制
-            max_retries = 2
-            retry_count = 0
-            last_error = None
-            
-            while retry_count <= max_retries:
-                try:
-                    # 调试输出
-                    print(f"DEBUG: 请求 URL: {self.api_url}")
-                    print(f"DEBUG: 请求数据: {json.dumps(data, ensure_ascii=False)}")
-                    print(f"DEBUG: 请求头: {self.headers}")
-                    
-                    # 使用系统代理设置（已配置例外地址），增加超时时间到 60 秒
-                    # 强制绕过代理访问 RagFlow
-                    import os
-                    os.environ['NO_PROXY'] = '218.244.149.115,47.110.141.115,localhost,127.0.0.1'
-
-                    response = requests.post(
-                        self.api_url,
-                        json=data,
-                        headers=self.headers,
-                        timeout=60,  # 增加到 60 秒
-                        proxies={'http': None, 'https': None}  # 明确禁用代理
-                    )
-                    
-                    # 成功获取响应,跳出重试循环
-                    break
-                    
-                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
-                    last_error = e
-                    retry_count += 1
-                    if retry_count <= max_retries:
-                        print(f"RAGFlow 连接失败,正在重试 ({retry_count}/{max_retries})...")
-                        import time
-                        time.sleep(2)  # 等待 2 秒后重试
-                    else:
-                        print(f"RAGFlow 连接失败,已达到最大重试次数")
-                        raise
+            logger.info("正在查询 RAGFlow: %s", question)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("请求数据: %s", json.dumps(data, ensure_ascii=False))
+
+            # 熔断器 + 重试预算（指数退避 + 抖动）
+            response = call_with_retry(
+                _post,
+                self.breaker,
+                self.retry_budget,
+                retry_on=(RetryableError, requests.exceptions.ConnectionError, requests.exceptions.Timeout),
+                max_attempt_timeout_s=self.timeout_s,
+            )
             
             if response.status_code == 200:
                 result = response.json()
@@ -150,18 +373,21 @@ class RAGFlowClient:
                     # 官方 API 响应格式: {"code": 0, "data": {"chunks": [...], "total": N}}
                     chunks = result.get("data", {}).get("chunks", [])
                     total = result.get("data", {}).get("total", 0)
-                    print(f"RAGFlow 查询成功: 找到 {len(chunks)} 个结果")
+                    logger.debug("RAGFlow 查询成功: %s 找到 %d 个结果", question, len(chunks))
                     return self._process_results(chunks)
                 else:
-                    print(f"RAGFlow API 错误: {result}")
-                    return []
+                    logger.warning("RAGFlow API 错误: %s", result)
+                    return None
             else:
-                print(f"RAGFlow HTTP 错误: {response.status_code} - {response.text}")
-                return []
-                
+                logger.warning("RAGFlow HTTP 错误: %s - %.500s", response.status_code, response.text)
+                return None
+
+        except CircuitOpenError as e:
+            logger.warning("RAGFlow 请求跳过: %s", e)
+            return None
         except Exception as e:
-            print(f"RAGFlow 请求异常: {str(e)}")
-            return []
+            logger.warning("RAGFlow 请求异常: %s", e)
+            return None
 
     def _process_results(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -202,21 +428,49 @@ class RAGFlowClient:
 
 # 全局单例
 _ragflow_client = None
+_ragflow_client_lock = threading.Lock()
 
 def get_ragflow_client(config: Dict[str, Any]) -> Optional[RAGFlowClient]:
     """
-    获取 RAGFlowClient 单例
+    获取 RAGFlowClient 单例（并发调用时只创建一次，保证所有线程共用同一个连接池）
+
+    RAGFLOW_BACKEND: "local" 时返回本地 BM25 检索引擎（local_index.bm25_retriever.LocalRetrievalClient，
+    接口与 RAGFlowClient 相同，不需要 RAGFlow 服务）
     """
     global _ragflow_client
     
-    if _ragflow_client is None:
+    if _ragflow_client is not None:
+        return _ragflow_client
+
+    with _ragflow_client_lock:
+        if _ragflow_client is not None:
+            return _ragflow_client
+
+        if config.get("RAGFLOW_BACKEND") == "local":
+            from local_index.bm25_retriever import create_local_retrieval_client
+            _ragflow_client = create_local_retrieval_client(config)
+            return _ragflow_client
+
         api_url = config.get("RAGFLOW_API_URL")
         api_key = config.get("RAGFLOW_API_KEY")
         kb_id = config.get("RAGFLOW_KB_ID")
+        pool_size = int(config.get("RAGFLOW_POOL_SIZE", DEFAULT_POOL_SIZE))
         
         if api_url and api_key and kb_id:
-            _ragflow_client = RAGFlowClient(api_url, api_key, kb_id)
+            _ragflow_client = RAGFlowClient(
+                api_url, api_key, kb_id,
+                pool_size=pool_size,
+                cache=create_retrieval_cache(config),
+                cross_worker=bool(config.get("RAGFLOW_CROSS_WORKER_COALESCE", False)),
+                timeout_s=float(config.get("RAGFLOW_TIMEOUT_S", DEFAULT_TIMEOUT_S)),
+                retry_budget=RetryBudget(
+                    max_attempts=int(config.get("RAGFLOW_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)),
+                    deadline_s=float(config.get("RAGFLOW_RETRY_BUDGET_S", DEFAULT_RETRY_BUDGET_S)),
+                ),
+                breaker_threshold=int(config.get("RAGFLOW_BREAKER_THRESHOLD", 3)),
+                breaker_recovery_s=float(config.get("RAGFLOW_BREAKER_RECOVERY_S", 30)),
+            )
         else:
-            print("RAGFlow 配置不完整，无法初始化客户端")
+            logger.warning("RAGFlow 配置不完整，无法初始化客户端")
             
-    return _ragflow_client
+        return _ragflow_client
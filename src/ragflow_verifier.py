@@ -1,57 +1,55 @@
+import functools
+import logging
 import re
+import time
 from typing import List, Dict, Any, Optional
+from app_logging import get_logger
 from ragflow_client import get_ragflow_client, RAGFlowClient
+from ragflow_async import get_async_ragflow_client
+from verification_plan import (
+    PLAN_NO_ITEMS,
+    PLAN_NOT_FOUND,
+    PLAN_READY,
+    PLAN_UNAVAILABLE,
+    VerificationPlanStore,
+    get_plan_store,
+)
 from html_table_parser import HtmlTableParser
-from item_name_matcher import normalize_item_name, fuzzy_match_item_name
+from parsed_table_cache import extract_chunk_items, get_parsed_table_cache
+from item_name_matcher import ItemMatcher, normalize_item_name
+from limit_table import check_limits, parse_limit_rows, parse_measurement, select_limit
+from local_index.gb2763_index import GB2763Index, get_gb2763_index, render_limit_evidence
+from local_index.food_taxonomy import get_food_taxonomy
+from local_index.rules_index import RulesIndex, get_rules_index, render_table_html
+
+logger = get_logger(__name__)
+
+# 细则检索: 本地筛选后至少需要的可用 chunk 数，不足时扩大 top-k
+INSPECTION_MIN_USABLE_CHUNKS = 2
+# GB 2763 目次/表格检索的向量相似度权重（其余为关键词权重）
+TABLE_VECTOR_WEIGHT = 0.1
+# GB 2763 检索参与重排的候选数（RAGFlow 默认 1024，文档过滤后不需要那么多）
+TABLE_TOP_K = 256
+# 目次检索的页大小（目次共 13 页，所有项目共享）
+TOC_PAGE_SIZE = 30
 
 # ======================================================================
-# 食品分类映射 - 将具体食品名映射到GB 2763中的大类名称
+# 食品分类 - 具体食品名 -> GB 2763 附录 A 中的类别（local_index.food_taxonomy）
 # ======================================================================
-FOOD_CATEGORY_MAPPING = {
-    # 瓜类蔬菜
-    "黄瓜": ["瓜类蔬菜", "黄瓜"],
-    "冬瓜": ["瓜类蔬菜", "冬瓜"],
-    "苦瓜": ["瓜类蔬菜", "苦瓜"],
-    "南瓜": ["瓜类蔬菜", "南瓜"],
-    "西葡芦": ["瓜类蔬菜", "西葡芦"],
-    "丝瓜": ["瓜类蔬菜", "丝瓜"],
-    "佛手瓜": ["瓜类蔬菜", "佛手瓜"],
-    
-    # 茄果类蔬菜
-    "茄子": ["茄果类蔬菜", "茄子"],
-    "番茄": ["茄果类蔬菜", "番茄"],
-    "辣椒": ["茄果类蔬菜", "辣椒"],
-    
-    # 叶菜类
-    "白菜": ["叶菜类蔬菜", "白菜"],
-    "菠菜": ["叶菜类蔬菜", "菠菜"],
-    "生菜": ["叶菜类蔬菜", "生菜"],
-    "油菜": ["叶菜类蔬菜", "油菜"],
-    "芥菜": ["叶菜类蔬菜", "芥菜"],
-    
-    # 豆类蔬菜
-    "豆角": ["豆类蔬菜", "豆角"],
-    "豌豆": ["豆类蔬菜", "豌豆"],
-    "荱豆": ["豆类蔬菜", "荱豆"],
-    
-    # 根茎类
-    "萝卜": ["根茎类和薯苋类蔬菜", "萝卜"],
-    "胡萝卜": ["根茎类和薯苋类蔬菜", "胡萝卜"],
-    "土豆": ["根茎类和薯苋类蔬菜", "土豆"],
-}
 
 def get_food_categories(food_name: str) -> List[str]:
     """
-    获取食品的所有可能名称(包括大类)
-    返回顺序: [具体名称, 大类名称]
-    
-    例如: get_food_categories("黄瓜") -> ["黄瓜", "瓜类蔬菜"]
+    获取食品的所有可能名称(包括各级大类)
+    返回顺序: 由具体到宽泛 [食品名称, 分类中的名称, 类别, 大类...]
+
+    例如: get_food_categories("黄瓜") -> ["黄瓜", "瓜类蔬菜", "蔬菜"]
+         get_food_categories("土豆") -> ["土豆", "马铃薯", "根茎类和薯芋类蔬菜", "蔬菜"]
     """
-    if food_name in FOOD_CATEGORY_MAPPING:
-        # 返回大类和具体名称，大类在前
-        return [FOOD_CATEGORY_MAPPING[food_name][0], food_name]
-    # 如果没有映射,返回原名称
-    return [food_name]
+    taxonomy = get_food_taxonomy()
+    if taxonomy is None:
+        # 分类文件缺失时只返回原名称
+        return [food_name]
+    return taxonomy.categories(food_name)
 
 # ======================================================================
 
@@ -112,65 +110,24 @@ def check_structural_validity(content: str, food_name: str, require_strict: bool
     
     return True
 
+def _limit_food_candidates(food_name: str) -> List[str]:
+    """限量匹配用的食品名称，从具体到宽泛: [食品名, 大类...]"""
+    return [food_name] + [c for c in get_food_categories(food_name) if c != food_name]
+
+
 def _extract_limit_value(limit_text: str, food_name: str, item_name: str) -> str:
     """
-    从限量表格文本中提取具体食品的限量值
-    支持大类名称匹配 (例如: 黄瓜 -> 瓜类蔬菜)
-    
+    从限量证据中提取具体食品的限量值（用于展示）
+    支持大类名称匹配 (例如: 黄瓜 -> 瓜类蔬菜)，解析与选行规则见 limit_table
+
     例如:
     输入: limit_text="瓜类蔬菜 0.5mg/kg", food_name="黄瓜"
     输出: "0.5 mg/kg"
     """
-    import re
-    
     if not limit_text or not food_name:
         return "未找到限量值"
-    
-    # 获取食品的所有可能名称(包括大类)
-    food_categories = get_food_categories(food_name)
-    
-    # 尝试找到包含食品名称或大类的行
-    lines = limit_text.split('\n')
-    food_line = None
-    matched_category = None
-    
-    # 优先尝试匹配具体名称,其次匹配大类
-    for category in food_categories:
-        for line in lines:
-            if category in line:
-                food_line = line
-                matched_category = category
-                break
-        if food_line:
-            break
-    
-    if not food_line:
-        # 如果没找到任何食品名/大类,尝试直接提取数值
-        numbers = re.findall(r'(\d+\.?\d*)\s*(mg/kg|ppm|%|μg/kg)', limit_text)
-        if numbers:
-            return f"{numbers[0][0]} {numbers[0][1]}"
-        return "未找到限量值"
-    
-    # 从该行提取数值和单位
-    # 常见格式: "0.5", "0.5mg/kg", "≤0.5", "0.5 mg/kg" 等
-    # 匹配: 数字(可包含小数点) + 可选空格 + 单位
-    pattern = r'([\u2264≤<]?\s*\d+\.?\d*)\s*(mg/kg|ppm|%|μg/kg|mg\/L)?'
-    matches = re.findall(pattern, food_line)
-    
-    if matches:
-        # 取第一个匹配
-        value, unit = matches[0]
-        value = value.strip()
-        unit = unit.strip() if unit else "mg/kg"  # 默认单位
-        
-        # 清理格式
-        if value.startswith('≤') or value.startswith('≤') or value.startswith('<'):
-            value = value.lstrip('≤≤<').strip()
-            return f"≤{value} {unit}"
-        else:
-            return f"{value} {unit}"
-    
-    return "未找到限量值"
+    row = select_limit(parse_limit_rows(limit_text), _limit_food_candidates(food_name), item_name)
+    return row.describe() if row else "未找到限量值"
 
 # ======================================================================
 
@@ -183,53 +140,145 @@ def verify_inspection_compliance(
     """
     验证检验项目合规性 (使用 RAGFlow)
     
-    1. 通过 RAGFlow 查询细则中该食品的检验项目
-    2. 解析返回的 HTML 表格
-    3. 与报告中的检验项目进行比对
+    1. 获取该食品的验证计划（细则检验项目 + 已解析的限量证据），
+       优先使用本地实施细则索引（无网络请求），索引中没有该食品时检索 RAGFlow；
+       同一食品、同一知识库版本的计划持久化缓存，重复报告不再检索细则
+    2. 与报告中的检验项目进行比对（apply_verification_plan）
     """
     
     # 1. 初始化结果
-    result = {
-        "status": "pass",  # pass, fail, warning, unknown
-        "issues": [],
-        "evidence": [],    # RAGFlow 返回的佐证 (原文片段, 页码)
-        "missing_items": [], # 细则有但报告没有
-        "extra_items": [],   # 报告有但细则没有
-        "matched_items": []  # 匹配的项目
-    }
+    result = _new_result()
     
     if not food_name:
         result["status"] = "unknown"
         result["issues"].append("缺少食品名称，无法查询细则")
         return result
-        
+
+    # 本地实施细则索引中有该食品的检验项目表时不检索细则知识库
+    rules_index = get_rules_index(config)
+    rules_table = rules_index.lookup(food_name, get_food_categories(food_name)) if rules_index else None
+
     client = get_ragflow_client(config)
-    if not client:
+    if not client and not rules_table:
         result["status"] = "unknown"
         result["issues"].append("RAGFlow 客户端未能初始化")
         return result
 
+    plan_store = get_plan_store(config)
+    kb_versions = _kb_versions(client, config) if client else {}
+    if rules_table:
+        kb_versions["local_rules"] = rules_index.version
+    plan = plan_store.get(food_name, kb_versions) if plan_store else None
+    if plan is not None:
+        logger.debug("使用验证计划缓存: %s (%d 个检测项目, %d 个限量)", food_name, len(plan['required_items']), len(plan['limits']))
+    else:
+        if rules_table:
+            plan = build_local_verification_plan(food_name, rules_index, rules_table)
+        else:
+            plan = build_verification_plan(food_name, client, config)
+        plan["kb_versions"] = kb_versions
+        # 只缓存完整的计划；服务不可用/未检索到结果时下次重新检索
+        if plan_store and plan["status"] == PLAN_READY:
+            plan_store.save(plan)
+
+    return apply_verification_plan(plan, report_items, report_gb_codes, config, client=client, plan_store=plan_store)
+
+
+def _new_result() -> Dict[str, Any]:
+    return {
+        "status": "pass",  # pass, fail, warning, unknown
+        "issues": [],
+        "evidence": [],    # RAGFlow 返回的佐证 (原文片段, 页码)
+        "missing_items": [], # 细则有但报告没有
+        "extra_items": [],   # 报告有但细则没有
+        "matched_items": []  # 匹配的项目
+    }
+
+
+def _kb_versions(client: Any, config: Dict[str, Any]) -> Dict[str, str]:
+    """细则知识库和国标知识库的当前版本号（计划缓存键的一部分）"""
+    configured = config.get("RAGFLOW_KB_VERSIONS") or {}
+    versions = {}
+    for kb_id in (config.get("RAGFLOW_KB_ID"), config.get("RAGFLOW_KB_ID_GB")):
+        if not kb_id:
+            continue
+        cache = getattr(client, "cache", None)
+        versions[kb_id] = cache.dataset_version(kb_id) if cache else str(configured.get(kb_id, "0"))
+    return versions
+
+
+def build_verification_plan(food_name: str, client: Any, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    从 RAGFlow 构建该食品的验证计划（与具体报告无关的部分）
+
+    返回:
+    {
+        "food_name": ..., "status": "ready" | "unavailable" | "not_found" | "no_items",
+        "issues": [...],                # status 不是 ready 时直接作为验证结果的问题
+        "required_items": [...],        # 细则检验项目（含 standard_basis / test_method / required_basis）
+        "evidence": [...],              # 筛选后的细则 chunks
+        "query_result_count": N,
+        "limits": {}                    # 项目名 -> 限量证据，apply 时按需补充
+    }
+    """
+    plan = {
+        "food_name": food_name,
+        "status": PLAN_READY,
+        "issues": [],
+        "required_items": [],
+        "evidence": [],
+        "query_result_count": 0,
+        "limits": {},
+        "created_at": time.time(),
+    }
+
+    # 服务熔断中直接降级，不再逐项等待超时
+    if not client.is_available():
+        plan["status"] = PLAN_UNAVAILABLE
+        plan["issues"].append("RAGFlow 服务暂不可用（熔断中），未能核验检验项目")
+        return plan
+
     # 2. 查询 RAGFlow
     # Layer 0: Query 约束 - 使用优化的查询语句
     optimized_query = build_optimized_query(food_name, "inspection")
-    print(f"DEBUG Layer0: 优化查询 = '{optimized_query}'")
+    logger.debug("Layer0: 优化查询 = '%s'", optimized_query)
     
-    query_result = client.query_inspection_items(food_name, custom_query=optimized_query)
+    # Layer 1 阈值 (同时作为服务端 similarity_threshold 下推，低于软门槛的 chunk 不再传回)
+    SIMILARITY_THRESHOLD_HARD = 0.4  # 硬门槛,低于此值直接丢弃
+    SIMILARITY_THRESHOLD_SOFT = 0.25  # 软门槛,需要通过后续检查
+
+    def _usable(chunk: Dict[str, Any]) -> bool:
+        """Layer 1 + Layer 2 的本地筛选（用于自适应 top-k 判断是否需要扩大检索）"""
+        score = chunk.get("score", 0)
+        content = chunk.get("content", "")
+        if not content or score < SIMILARITY_THRESHOLD_SOFT:
+            return False
+        return check_structural_validity(content, food_name, score < SIMILARITY_THRESHOLD_HARD)
+
+    # 自适应 top-k: 先取 10 个，可用 chunk 不足时再扩大到 30 个（原固定 page_size=30）
+    query_result = client.query_adaptive(
+        optimized_query,
+        accept=_usable,
+        min_usable=INSPECTION_MIN_USABLE_CHUNKS,
+        page_sizes=(10, 30),
+        similarity_threshold=SIMILARITY_THRESHOLD_SOFT,
+    )
+    if not query_result and not client.is_available():
+        plan["status"] = PLAN_UNAVAILABLE
+        plan["issues"].append("RAGFlow 服务暂不可用（熔断中），未能核验检验项目")
+        return plan
     if not query_result:
-        result["status"] = "warning"
-        result["issues"].append(f"未在细则中找到关于'{food_name}'的检验要求")
-        return result
+        plan["status"] = PLAN_NOT_FOUND
+        plan["issues"].append(f"未在细则中找到关于'{food_name}'的检验要求")
+        return plan
     
-    print(f"DEBUG Layer0: RAGFlow 返回 {len(query_result)} 个 chunks")
+    logger.debug("Layer0: RAGFlow 返回 %d 个 chunks", len(query_result))
         
     # 3. 筛选和解析 RAGFlow 结果
     required_items = []
     filtered_chunks = []  # 存储筛选后的 chunks
     
     # Layer 1: 向量相似度硬门槛
-    SIMILARITY_THRESHOLD_HARD = 0.4  # 硬门槛,低于此值直接丢弃
-    SIMILARITY_THRESHOLD_SOFT = 0.25  # 软门槛,需要通过后续检查
-    
     layer1_passed = []
     for chunk in query_result:
         content = chunk.get("content", "")
@@ -248,10 +297,10 @@ def verify_inspection_compliance(
             layer1_passed.append(chunk)
         else:
             # 低于软门槛,直接丢弃
-            print(f"DEBUG Layer1: 过滤低分 chunk (score={score:.3f})")
+            logger.debug("Layer1: 过滤低分 chunk (score=%.3f)", score)
             continue
     
-    print(f"DEBUG Layer1: {len(query_result)} -> {len(layer1_passed)} chunks")
+    logger.debug("Layer1: %d -> %d chunks", len(query_result), len(layer1_passed))
     
     # Layer 2: 结构存在性过滤
     layer2_passed = []
@@ -264,12 +313,13 @@ def verify_inspection_compliance(
         if check_structural_validity(content, food_name, require_strict):
             layer2_passed.append(chunk)
         else:
-            print(f"DEBUG Layer2: 过滤结构无效 chunk (score={score:.3f}, strict={require_strict})")
+            logger.debug("Layer2: 过滤结构无效 chunk (score=%.3f, strict=%s)", score, require_strict)
             continue
     
-    print(f"DEBUG Layer2: {len(layer1_passed)} -> {len(layer2_passed)} chunks")
+    logger.debug("Layer2: %d -> %d chunks", len(layer1_passed), len(layer2_passed))
     
-    # 收集证据和解析表格
+    # 收集证据和解析表格（同一 chunk 的解析结果跨报告缓存）
+    parse_cache = get_parsed_table_cache(config)
     for chunk in layer2_passed:
         content = chunk.get("content", "")
         page_num = chunk.get("page_num", 1)
@@ -285,8 +335,10 @@ def verify_inspection_compliance(
         })
         
         # 解析表格
-        parsed_tables = HtmlTableParser.parse_table(content)
-        items = HtmlTableParser.find_inspection_items(parsed_tables)
+        if parse_cache:
+            items = parse_cache.inspection_items(chunk.get("chunk_id"), content)
+        else:
+            items = extract_chunk_items(content)
         
         # 为每个提取的项目添加来源信息
         for item in items:
@@ -297,8 +349,24 @@ def verify_inspection_compliance(
         required_items.extend(items)
     
     # 调试输出:显示解析出的检测项目
-    print(f"DEBUG: 从 RAGFlow 解析出 {len(required_items)} 个检测项目(去重前)")
+    logger.debug("从 RAGFlow 解析出 %d 个检测项目(去重前)", len(required_items))
+    required_items = _finalize_required_items(required_items)
     
+    # 将筛选后的 chunks 添加到证据中
+    plan["evidence"] = filtered_chunks
+    plan["required_items"] = required_items
+    plan["query_result_count"] = len(query_result)
+
+    if not required_items:
+        plan["status"] = PLAN_NO_ITEMS
+        plan["issues"].append(f"找到 {len(query_result)} 个相关文档,但筛选后未能提取到有效检验项目")
+        plan["issues"].append(f"筛选条件: 相似度>{SIMILARITY_THRESHOLD_SOFT}, 包含'{food_name}', 包含'检验项目'")
+
+    return plan
+
+
+def _finalize_required_items(required_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """检验项目去重、过滤异常名称，并统一所有项目的 required_basis"""
     # 后处理:去重和筛选
     seen_names = set()
     filtered_items = []
@@ -309,26 +377,26 @@ def verify_inspection_compliance(
         
         # 完全重复去重
         if name in seen_names:
-            print(f"DEBUG 去重: 过滤掉重复项目: {name}")
+            logger.debug("去重: 过滤掉重复项目: %s", name)
             continue
         seen_names.add(name)
         
         # 最后一次验证:过滤明显无效的项目
         if len(name) > 50 or len(name) < 2:
-            print(f"DEBUG 去重: 过滤掉长度异常的项目: {name}")
+            logger.debug("去重: 过滤掉长度异常的项目: %s", name)
             continue
         
         filtered_items.append(item)
     
     required_items = filtered_items
-    print(f"DEBUG: 去重和筛选后剩余 {len(required_items)} 个检测项目")
+    logger.info("去重和筛选后剩余 %d 个检测项目", len(required_items))
     
-    for idx, item in enumerate(required_items[:5]):  # 只显示前5个
-        print(f"  [{idx+1}] 项目名称: {item.get('item_name', 'N/A')}")
-        print(f"      标准依据: {item.get('standard_basis', 'N/A')}")
-        print(f"      检测方法: {item.get('test_method', 'N/A')}")
-    if len(required_items) > 5:
-        print(f"  ... 还有 {len(required_items) - 5} 个项目")
+    if logger.isEnabledFor(logging.DEBUG):
+        for idx, item in enumerate(required_items[:5]):  # 只显示前5个
+            logger.debug("  [%d] 项目名称: %s | 标准依据: %s | 检测方法: %s", idx + 1,
+                         item.get('item_name', 'N/A'), item.get('standard_basis', 'N/A'), item.get('test_method', 'N/A'))
+        if len(required_items) > 5:
+            logger.debug("  ... 还有 %d 个项目", len(required_items) - 5)
     
     # 统一依据标准: 收集所有不同的依据，移除不完整的片段
     all_bases = set()
@@ -339,7 +407,6 @@ def verify_inspection_compliance(
     
     # 智能过滤: 移除是其他basis子串的basis
     # 例如: {"GB", "2763", "GB 2763"} -> {"GB 2763"}
-    import re
     filtered_bases = []
     for basis in all_bases:
         # 检查是否是完整的标准号 (GB + 数字)
@@ -352,30 +419,99 @@ def verify_inspection_compliance(
             for other in all_bases:
                 if other != basis and basis in other:
                     is_substring = True
-                    print(f"DEBUG 依据过滤: 移除子串 '{basis}' (存在完整版本 '{other}')")
+                    logger.debug("依据过滤: 移除子串 '%s' (存在完整版本 '%s')", basis, other)
                     break
             if not is_substring:
                 # 不是子串但也不是完整标准号，警告但保留
-                print(f"WARNING: 不完整的依据标准: '{basis}'")
+                logger.warning("不完整的依据标准: '%s'", basis)
                 filtered_bases.append(basis)
     
     # 统一所有项目的 required_basis
     unified_basis = " ".join(sorted(filtered_bases)) if filtered_bases else ""
-    print(f"DEBUG: 统一依据标准: {list(all_bases)} -> '{unified_basis}'")
+    logger.debug("统一依据标准: %s -> '%s'", all_bases, unified_basis)
     
     for item in required_items:
         item["required_basis"] = unified_basis
+    return required_items
+
+
+def build_local_verification_plan(food_name: str, rules_index: RulesIndex, table_number: str) -> Dict[str, Any]:
+    """
+    从本地实施细则索引构建验证计划（格式同 build_verification_plan，不访问网络）
+
+    每页表格作为一条证据（与 RAGFlow chunk 一样是 HTML 表格），检验项目带 source_page 供前端跳转
+    """
+    table = rules_index.table(table_number)
+    header = table.get("header", [])
+    logger.info("本地细则索引命中: %s -> 表%s %s (页码 %s)", food_name, table_number, table.get('title'), table.get('pages'))
+
+    required_items = []
+    evidence = []
+    for page_num in table.get("pages", []):
+        rows = [row for row in table.get("rows", []) if row.get("page") == page_num]
+        chunk_id = f"rules-local-{table_number}-p{page_num}"
+        evidence.append({
+            "content": f"表{table_number} {table.get('title', '')}检验项目\n" + render_table_html(header, rows),
+            "chunk_id": chunk_id,
+            "score": 1.0,
+            "page_num": page_num,
+            "doc_name": rules_index.source,
+            "source": "local_index",
+        })
+        for item in HtmlTableParser.find_inspection_items(rows):
+            item["source_page"] = page_num
+            item["source_chunk_id"] = chunk_id
+            item["source_score"] = 1.0
+            required_items.append(item)
+
+    required_items = _finalize_required_items(required_items)
+    plan = {
+        "food_name": food_name,
+        "status": PLAN_READY if required_items else PLAN_NO_ITEMS,
+        "issues": [] if required_items else [f"本地细则索引表{table_number}中未能提取到有效检验项目"],
+        "required_items": required_items,
+        "evidence": evidence,
+        "query_result_count": len(evidence),
+        "limits": {},
+        "created_at": time.time(),
+        "rules_table": table_number,
+    }
+    return plan
+
+
+def apply_verification_plan(
+    plan: Dict[str, Any],
+    report_items: List[Dict[str, Any]],
+    report_gb_codes: List[str],
+    config: Dict[str, Any],
+    client: Any = None,
+    plan_store: Optional[VerificationPlanStore] = None,
+) -> Dict[str, Any]:
+    """
+    用验证计划核验一份报告：检验项目比对 + 限量比对
+
+    计划中缺少的限量证据才会检索 RAGFlow，检索结果写回计划（同一食品的后续报告不再检索）
+    """
+    result = _new_result()
+    food_name = plan["food_name"]
+
+    if plan["status"] in (PLAN_UNAVAILABLE, PLAN_NOT_FOUND):
+        result["status"] = "unknown" if plan["status"] == PLAN_UNAVAILABLE else "warning"
+        result["issues"].extend(plan["issues"])
+        return result
+
+    # 计划可能被多个报告共享，比对时使用副本
+    required_items = [dict(item) for item in plan["required_items"]]
+    filtered_chunks = [dict(chunk) for chunk in plan["evidence"]]
 
-    
     # 将筛选后的 chunks 添加到证据中
     result["evidence"] = filtered_chunks
     result["evidence_count"] = len(filtered_chunks)
     result["evidence_pages"] = list(set(chunk["page_num"] for chunk in filtered_chunks))  # 去重的页码列表
 
-    if not required_items:
+    if plan["status"] == PLAN_NO_ITEMS:
         result["status"] = "warning"
-        result["issues"].append(f"找到 {len(query_result)} 个相关文档,但筛选后未能提取到有效检验项目")
-        result["issues"].append(f"筛选条件: 相似度>{SIMILARITY_THRESHOLD}, 包含'{food_name}', 包含'检验项目'")
+        result["issues"].extend(plan["issues"])
         return result
 
     # 4. 比对逻辑 - 使用模糊匹配
@@ -399,17 +535,14 @@ def verify_inspection_compliance(
         if name:
             req_map[name] = item
     
+    # 细则项目 × 报告项目的模糊匹配一次算完（语义同 fuzzy_match_item_name 两层循环）
+    item_match = ItemMatcher(list(req_map)).match(list(report_map))
+    matched_by_req = dict(item_match.matched)
+
     # 检查必检项目是否在报告中 - 使用模糊匹配
     for req_name, req_item in req_map.items():
-        # 尝试在报告中找到匹配项 (使用模糊匹配)
-        matched_report_item = None
-        matched_report_name = None
-        
-        for report_name, report_item in report_map.items():
-            if fuzzy_match_item_name(report_name, req_name):
-                matched_report_item = report_item
-                matched_report_name = report_name
-                break
+        matched_report_name = matched_by_req.get(req_name)
+        matched_report_item = report_map[matched_report_name] if matched_report_name is not None else None
         
         if matched_report_item:
             # 找到匹配项
@@ -456,7 +589,7 @@ def verify_inspection_compliance(
                 
                 # 如果没找到，记录问题 (注意: 有些细则写的是 "产品明示标准"，这种比较难校验，先跳过)
                 if not found_basis and "明示" not in req_basis_raw and "企业标准" not in req_basis_raw:
-                     print(f"DEBUG 判定依据: 项目'{req_name}' 依据不匹配 - 细则要求:{req_basis_raw}, 报告引用:{report_gb_codes}")
+                     logger.debug("判定依据: 项目'%s' 依据不匹配 - 细则要求:%s, 报告引用:%s", req_name, req_basis_raw, report_gb_codes)
                      basis_issues.append({
                          "item": req_name,
                          "expected": req_basis_raw,
@@ -465,24 +598,13 @@ def verify_inspection_compliance(
                      })
                 else:
                     if found_basis:
-                        print(f"DEBUG 判定依据: 项目'{req_name}' 依据匹配成功 - 细则要求:{req_basis_raw}, 报告引用:{report_gb_codes}")
+                        logger.debug("判定依据: 项目'%s' 依据匹配成功 - 细则要求:%s, 报告引用:%s", req_name, req_basis_raw, report_gb_codes)
             
         else:
             missing.append(req_name)
     
-    # ... (extra checks) ...
-    
-    # 检查报告中多余的项目 (非细则要求的) - 使用模糊匹配
-    for rep_name in report_map:
-        # 检查是否有任何细则项目与此报告项目匹配
-        is_matched = False
-        for req_name in req_map:
-            if fuzzy_match_item_name(rep_name, req_name):
-                is_matched = True
-                break
-        
-        if not is_matched:
-            extra.append(rep_name)
+    # 检查报告中多余的项目 (非细则要求的)
+    extra = item_match.extra
     
     result["missing_items"] = missing
     result["extra_items"] = extra
@@ -498,226 +620,84 @@ def verify_inspection_compliance(
     items_to_check = [m for m in matched if m.get("report_name") and report_map.get(m["report_name"], {}).get("value")]
     
     # 调试输出：显示要查询的匹配项目
-    print(f"DEBUG: 准备查询 {len(items_to_check)} 个匹配项目的标准限量 (并行)")
-    for idx, m in enumerate(items_to_check[:5]):  # 调试输出只显示前5个
-        print(f"  [{idx+1}] 细则名称: {m.get('name', 'N/A')}")
-        print(f"      报告名称: {m.get('report_name', 'N/A')}")
-        print(f"      标准依据: {m.get('required_basis', 'N/A')}")
+    logger.info("准备查询 %d 个匹配项目的标准限量 (并行)", len(items_to_check))
+    if logger.isEnabledFor(logging.DEBUG):
+        for idx, m in enumerate(items_to_check[:5]):  # 调试输出只显示前5个
+            logger.debug("  [%d] 细则名称: %s | 报告名称: %s | 标准依据: %s", idx + 1,
+                         m.get('name', 'N/A'), m.get('report_name', 'N/A'), m.get('required_basis', 'N/A'))
 
     
-    def _query_limit_worker(match_item):
-        """Worker function for threading"""
-        try:
+    # 限量查询分两个阶段批量提交（同一报告的所有检索并发执行）:
+    #   Phase 1: 表格编号（本地索引 + 最多两次共享的目次检索）
+    #   Phase 2: 每个不同表格一次检索（"表{n}" 或 "{item} {食品} 最大残留限量"）
+    evidence_list = []
+    limit_items = []
+    pending: List[str] = []
+    for match_item in items_to_check:
+        # 没有任何判定依据的项目不查限量
+        if match_item["required_basis"] or report_gb_codes:
+            limit_items.append(match_item)
+
+    if limit_items:
+        # 优先查本地 GB 2763 限量索引；索引和计划中都没有的限量证据才检索 RAGFlow
+        names = list(dict.fromkeys(m["name"] for m in limit_items))
+        gb_index = get_gb2763_index(config)
+        local = _lookup_local_limits(gb_index, names, food_name)
+        limits = {**plan["limits"], **local}
+        pending = [name for name in names if name not in limits]
+        if local:
+            logger.info("本地 GB 2763 索引命中 %d/%d 个限量", len(local), len(names))
+        if pending and client is not None:
+            fetched = _resolve_limit_evidence(pending, food_name, client, config, gb_index=gb_index)
+            # 服务熔断时未找到的结果不写回，下次重新检索
+            if not client.is_available():
+                fetched = {name: entry for name, entry in fetched.items() if entry}
+            limits.update(fetched)
+            if plan_store and plan["status"] == PLAN_READY and fetched:
+                plan_store.add_limits(plan, fetched)
+        else:
+            logger.info("限量证据全部来自本地索引/验证计划缓存 (%d 个)", len(names))
+
+        # 每条限量证据解析为结构化限量表并选出适用行，全部项目一次比对
+        candidates = _limit_food_candidates(food_name)
+        checked_names = []
+        measurements = []
+        limit_rows = []
+        for match_item in limit_items:
             item_name = match_item["name"]  # 细则中的名称
-            report_name = match_item["report_name"]  # 报告中的实际名称
-            report_item = report_map[report_name]  # 使用报告中的名称查找
-            
-            # Restore missing definition
-            query_code = match_item["required_basis"]
-            if not query_code and report_gb_codes:
-                query_code = report_gb_codes[0]
-            
-            if query_code:
-                # 实施 "3步检索策略" (实为 2步+验证，模拟用户逻辑)
-                # 逻辑: 1. 定位项目表格上下文 2. 查找食品限量数值
-                
-                kb_id_gb = config.get("RAGFLOW_KB_ID_GB")  # 获取国标知识库ID
-                query_code = "GB 2763"
-                
-                # ========================================
-                # 新增: Step 0 - 从目次查找表格编号 (Table Number from TOC)
-                # ========================================
-                print(f"\n{'='*60}")
-                print(f"[Step 0] 查询目次: {item_name}")
-                print(f"{'='*60}")
-                toc_query = f"{item_name} 目次"  # 查询目次
-                print(f"  查询词: '{toc_query}'")
-                toc_chunks = client.query(toc_query, dataset_ids=[kb_id_gb], page_size=10)
-                
-                print(f"  返回结果: {len(toc_chunks) if toc_chunks else 0} 个 chunks")
-                if toc_chunks:
-                    for idx, chunk in enumerate(toc_chunks[:3]):  # 只显示前3个
-                        print(f"    [{idx+1}] 页码:{chunk.get('page_num', 'N/A')} | 分数:{chunk.get('score', 0):.4f} | 内容:{chunk.get('content', '')[:100]}...")
-                
-                table_number = None
-                if toc_chunks:
-                    # 尝试从目次中提取表格编号
-                    # 格式: "4.10 阿维菌素" -> 表10
-                    import re
-                    for chunk in toc_chunks:
-                        content = chunk.get("content", "")
-                        page_num = chunk.get("page_num", 0)
-                        
-                        # 只处理目次页 (第3-15页)
-                        if not (3 <= page_num <= 15):
-                            continue
-                        
-                        # 匹配格式: "4.\d+ 项目名"
-                        pattern = rf"4\.(\d+)\s*{re.escape(item_name)}"
-                        match = re.search(pattern, content)
-                        if match:
-                            table_number = match.group(1)
-                            print(f"\n  ✔✔✔ 从目次找到: 4.{table_number} {item_name} -> 表{table_number}")
-                            print(f"      目次页码: {page_num}")
-                            print(f"      匹配内容: {content[:150]}")
-                            break
-                
-                if not table_number:
-                    print(f"\n  ⚠⚠⚠ 未在目次中找到 {item_name} 的表格编号")
-                    print(f"      尝试匹配模式: '4.\\d+ {item_name}'")
-                
-                # ========================================
-                # Step 1: 直接查询表格 (Find Table Directly)
-                # ========================================
-                print(f"\n{'='*60}")
-                print(f"[Step 1] 查询表格: {item_name}")
-                print(f"{'='*60}")
-                
-                # 如果有表格编号,直接查询表格
-                if table_number:
-                    context_query = f"表{table_number}"  # 简化查询
-                    print(f"  查询策略: 使用表格编号")
-                    print(f"  查询词: '{context_query}'")
-                else:
-                    context_query = f"{item_name} 最大残留限量"
-                    print(f"  查询策略: 使用项目名 (未找到表号)")
-                    print(f"  查询词: '{context_query}'")
-                
-                context_chunks_raw = client.query(context_query, dataset_ids=[kb_id_gb], page_size=20)
-                
-                print(f"  原始返回: {len(context_chunks_raw) if context_chunks_raw else 0} 个 chunks")
-                
-                # 打印原始返回的文档名称
-                if context_chunks_raw:
-                    print(f"  RAGFlow 返回文档列表:")
-                    for idx, c in enumerate(context_chunks_raw[:5]):  # 只显示前5个
-                        print(f"    [{idx+1}] Doc:{c.get('doc_name', 'N/A')} | 页:{c.get('page_num', 'N/A')} | 分数:{c.get('score', 0):.4f}")
-                        print(f"        内容:{c.get('content', '')[:150]}...")
-                
-                # 文档名称过滤: 只保留国标文件，过滤掉细则文件
-                context_chunks = []
-                for c in context_chunks_raw:
-                    doc_name = c.get("doc_name", "")
-                    # 只保留国标文件 ("GB 2763")
-                    if "GB 2763" in doc_name or "GB2763" in doc_name:
-                        context_chunks.append(c)
-                    else:
-                        # 过滤掉细则文件
-                        if "细则" in doc_name or "实施细则" in doc_name:
-                            print(f"DEBUG: 过滤掉细则文件 chunk: {doc_name}")
-                            continue
-                        # 其他未知文件也保留，但记录警告
-                        print(f"WARNING: 未知文档名称: {doc_name}")
-                        context_chunks.append(c)
-                
-                print(f"DEBUG: 国标文档过滤: {len(context_chunks_raw)} -> {len(context_chunks)} chunks")
-                
-                context_found = False
-                if context_chunks:
-                    for c in context_chunks:
-                        if item_name in c.get("content", ""):
-                            context_found = True
-                            break
-                
-                # ========================================
-                # Step 2: 从表格中提取限量值 (Extract Limit from Table)
-                # ========================================
-                print(f"\n[Step 2] 提取限量值: {item_name}")
-                
-                best_chunk = None
-                
-                # 直接使用 Step 1 的结果,不再查第二次
-                if context_chunks:
-                    print(f"  使用 Step 1 的 {len(context_chunks)} 个 chunks")
-                    # 智能筛选
-                    for chunk in context_chunks:
-                        content = chunk.get("content", "")
-                        
-                        # 必须包含项目名称 (防止查到其他农药)
-                        if item_name not in content:
-                            continue
-                        
-                        # 找到包含项目名的chunk即可
-                        best_chunk = chunk
-                        print(f"  ✔ 找到包含 '{item_name}' 的chunk")
-                        break
-                            
-                        # 必须包含食品名称 (或其类别，较难判断，先匹配食品名)
-                        # 如果内容里直接有 "黄瓜"
-                        if food_name in content:
-                             best_chunk = chunk
-                             break
-                             
-                    # 如果没有完美匹配，回退到第一个包含项目名的
-                    if not best_chunk:
-                        for chunk in limit_chunks:
-                             if item_name in chunk.get("content", ""):
-                                 best_chunk = chunk
-                                 break
-                
-                # 如果 Step 2 没找到，尝试使用 Step 1 的结果 (可能表格就在 Step 1 的 chunk 里)
-                if not best_chunk and context_chunks:
-                     best_chunk = context_chunks[0]
-
-                if best_chunk:
-                    limit_text = best_chunk.get("content", "")
-                    
-                    # 提取具体的限量值
-                    print(f"\n=== 提取限量值: {item_name} ===")
-                    print(f"  食品名: {food_name}")
-                    print(f"  食品分类: {get_food_categories(food_name)}")
-                    print(f"  表格内容预览: {limit_text[:200]}...")  # 只打印前200字符
-                    
-                    extracted_limit = _extract_limit_value(limit_text, food_name, item_name)
-                    print(f"  提取结果: {extracted_limit}")
-                    print(f"  文档: {best_chunk.get('doc_name', 'N/A')}")
-                    print(f"  页码: {best_chunk.get('page_num', 'N/A')}")
-                    print("="*50)
-                    
-                    # 提取 limit_text 中的数值进行比对
-                    limit_issue = _check_limit_compliance(report_item.get("value"), limit_text)
-                    
-                    return {
-                        "type": "success",
-                        "item_name": item_name,
-                        "limit_text": limit_text,  # 完整文本供调试
-                        "extracted_limit": extracted_limit,  # 提取的限量值
-                        "best_chunk": best_chunk,
-                        "limit_issue": limit_issue
-                    }
-            return None
-        except Exception as e:
-            print(f"Error checking limit for {match_item.get('name')}: {e}")
-            return None
+            report_item = report_map[match_item["report_name"]]  # 使用报告中的名称查找
+            entry = limits.get(item_name)
+            if not entry:
+                continue
+            # 添加证据到列表 - 设置 type='indicator'
+            evidence_list.append({
+                "type": "indicator",  # 添加证据类型标记
+                "item": item_name,
+                **entry,
+            })
+            checked_names.append(item_name)
+            measurements.append(parse_measurement(report_item.get("value"), report_item.get("unit")))
+            limit_rows.append(select_limit(parse_limit_rows(entry.get("content", "")), candidates, item_name))
 
-    # Use ThreadPoolExecutor for parallel queries
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-    
-    evidence_list = []
-    
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_match = {executor.submit(_query_limit_worker, m): m for m in items_to_check}
-        for future in as_completed(future_to_match):
-            res = future.result()
-            if res and res["type"] == "success":
-                # 添加证据到列表 - 设置 type='indicator'
-                evidence_list.append({
-                    "type": "indicator",  # 添加证据类型标记
-                    "item": res["item_name"],
-                    "content": res["limit_text"],  # 完整表格文本
-                    "extracted_limit": res.get("extracted_limit", "未提取"),  # 提取的限量值
-                    "chunk_id": res["best_chunk"].get("chunk_id"),
-                    "page_num": res["best_chunk"].get("page_num"),
-                    "doc_name": res["best_chunk"].get("doc_name", "")
-                })
-                # 如果有问题，添加到问题列表
-                if res.get("limit_issue"):
-                    indicator_issues.append(f"{res['item_name']}: {res['limit_issue']}")
+        try:
+            limit_issues = check_limits(measurements, limit_rows)
+        except Exception as e:
+            logger.exception("Error checking limits: %s", e)
+            limit_issues = []
+        # 如果有问题，添加到问题列表
+        for item_name, limit_issue in zip(checked_names, limit_issues):
+            if limit_issue:
+                indicator_issues.append(f"{item_name}: {limit_issue}")
 
     # Merge evidence
     result["evidence"].extend(evidence_list)
     result["indicator_issues"] = indicator_issues
 
+    # 查询过程中服务熔断：限量证据不完整，结论降级为 unknown（全部来自本地索引/计划缓存时不受影响）
+    limits_incomplete = bool(pending) and client is not None and not client.is_available()
+    if limits_incomplete:
+        result["issues"].append("RAGFlow 服务中断（熔断中），部分指标限量未能核验")
+
     if missing:
         result["status"] = "fail"
         result["issues"].append(f"缺少必检项目: {', '.join(missing[:5])}" + ("..." if len(missing)>5 else ""))
@@ -734,8 +714,208 @@ def verify_inspection_compliance(
          if result["status"] == "pass": result["status"] = "warning"
          result["issues"].append(f"存在指标不合格或无法验证 ({len(indicator_issues)}项)")
 
+    if limits_incomplete and result["status"] == "pass":
+        result["status"] = "unknown"
+
     return result
 
+def _lookup_local_limits(
+    gb_index: Optional[GB2763Index],
+    item_names: List[str],
+    food_name: str,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    在本地 GB 2763 限量索引中查找限量，返回命中的 {项目名: 证据}（格式同 RAGFlow 检索结果）
+
+    先按食品名称匹配，再按 get_food_categories 的大类匹配；未命中的项目不返回
+    """
+    if gb_index is None:
+        return {}
+    categories = [c for c in get_food_categories(food_name) if c != food_name]
+    limits = {}
+    for name in item_names:
+        hit = gb_index.lookup(name, food_name, categories)
+        if hit:
+            limits[name] = render_limit_evidence(hit)
+            logger.debug("本地索引限量: %s -> %s (表%s %s)", name, limits[name]['extracted_limit'], hit['table'], hit['food'])
+    return limits
+
+
+def _resolve_limit_evidence(
+    item_names: List[str],
+    food_name: str,
+    client: Any,
+    config: Dict[str, Any],
+    gb_index: Optional[GB2763Index] = None,
+) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    检索 GB 2763 中各项目的限量证据（按报告整体规划检索，检索次数随不同表格数增长，而不是随项目数）
+
+      Phase 1: 表格编号 —— 本地索引中有表号的项目跳过；其余项目共用最多两次目次检索
+               （固定的 "目次" 检索可被缓存复用，仍未找到的项目再合并成一次 "目次 项目1 项目2 ..."）
+      Phase 2: 每个不同的表格只检索一次（"表{n}"），找不到表号的项目检索 "{item} {食品/分类} 最大残留限量"，
+               同一表格的项目共享检索结果
+
+    返回 {项目名: 证据 或 None}，证据字段: content / extracted_limit / chunk_id / page_num / doc_name
+    """
+    async_client = get_async_ragflow_client(config)
+    kb_id_gb = config.get("RAGFLOW_KB_ID_GB")  # 获取国标知识库ID
+
+    # 服务端过滤: 只在 GB 2763 文档中检索，表号/目次属于精确词检索，调高关键词权重
+    gb_filters = {
+        "document_ids": _resolve_gb2763_doc_ids(client, config, kb_id_gb),
+        "vector_similarity_weight": float(config.get("RAGFLOW_TABLE_VECTOR_WEIGHT", TABLE_VECTOR_WEIGHT)),
+        "top_k": int(config.get("RAGFLOW_TABLE_TOP_K", TABLE_TOP_K)),
+    }
+
+    # Phase 1: 表格编号
+    table_numbers = _plan_table_numbers(item_names, async_client, kb_id_gb, gb_filters, gb_index)
+
+    # Phase 2: 按不同的检索语句分组，每组只检索一次
+    food_terms = " ".join(_limit_food_candidates(food_name)[:2])
+    groups: Dict[str, List[str]] = {}
+    for name in item_names:
+        table_number = table_numbers.get(name)
+        if table_number:
+            logger.debug("表格编号: 4.%s %s -> 表%s", table_number, name, table_number)
+            question = f"表{table_number}"
+        else:
+            # 带上食品在分类中的名称/所属类别，检索直接落在对应的限量行上
+            logger.info("未找到 %s 的表格编号，使用项目名查询", name)
+            question = f"{name} {food_terms} 最大残留限量"
+        groups.setdefault(question, []).append(name)
+
+    questions = list(groups)
+    logger.info("[Phase 2] 查询表格: %d 个项目 -> %d 次检索", len(item_names), len(questions))
+    context_results = async_client.query_many(
+        questions, dataset_ids=[kb_id_gb],
+        accept=[functools.partial(_is_group_limit_hit, groups[q]) for q in questions],
+        page_sizes=(5, 10, 20),
+        **gb_filters,
+    )
+
+    limits: Dict[str, Optional[Dict[str, Any]]] = {}
+    for question, context_chunks_raw in zip(questions, context_results):
+        gb_chunks = _filter_gb_chunks(context_chunks_raw)
+        for item_name in groups[question]:
+            best_chunk = _select_limit_chunk(item_name, gb_chunks)
+            if not best_chunk:
+                limits[item_name] = None
+                continue
+
+            limit_text = best_chunk.get("content", "")
+            extracted_limit = _extract_limit_value(limit_text, food_name, item_name)
+            logger.debug("提取限量值: %s -> %s (页码 %s)", item_name, extracted_limit, best_chunk.get('page_num', 'N/A'))
+            limits[item_name] = {
+                "content": limit_text,  # 完整表格文本
+                "extracted_limit": extracted_limit,  # 提取的限量值
+                "chunk_id": best_chunk.get("chunk_id"),
+                "page_num": best_chunk.get("page_num"),
+                "doc_name": best_chunk.get("doc_name", ""),
+            }
+    return limits
+
+
+def _plan_table_numbers(
+    item_names: List[str],
+    async_client: Any,
+    kb_id_gb: str,
+    gb_filters: Dict[str, Any],
+    gb_index: Optional[GB2763Index] = None,
+) -> Dict[str, str]:
+    """
+    一次性确定所有项目的 GB 2763 表格编号（找不到的项目不返回）
+
+    本地索引 -> 共享的 "目次" 检索 -> 剩余项目合并的一次目次检索；目次 chunk 在所有项目间共享
+    """
+    numbers: Dict[str, str] = {}
+    if gb_index:
+        for name in item_names:
+            table_number = gb_index.table_number(name)
+            if table_number:
+                numbers[name] = table_number
+
+    toc_chunks: List[Dict[str, Any]] = []
+    toc_queries = 0
+    for attempt in range(2):
+        remaining = [name for name in item_names if name not in numbers]
+        if not remaining:
+            break
+        question = "目次" if attempt == 0 else "目次 " + " ".join(remaining)
+        toc_queries += 1
+        toc_chunks.extend(async_client.query(
+            question, dataset_ids=[kb_id_gb], page_size=TOC_PAGE_SIZE, **gb_filters,
+        ))
+        for name in remaining:
+            table_number = _find_table_number(name, toc_chunks)
+            if table_number:
+                numbers[name] = table_number
+
+    logger.info("[Phase 1] 表格编号: %d/%d 个项目, 目次检索 %d 次", len(numbers), len(item_names), toc_queries)
+    return numbers
+
+
+def _resolve_gb2763_doc_ids(client: Any, config: Dict[str, Any], kb_id_gb: str) -> Optional[List[str]]:
+    """
+    GB 2763 文档 ID（用于 document_ids 过滤）
+    优先使用 config 中的 RAGFLOW_GB2763_DOC_IDS，否则按文件名在国标知识库中查找；
+    都拿不到时返回 None（不过滤，仍由 _filter_gb_chunks 在本地过滤）
+    """
+    doc_ids = config.get("RAGFLOW_GB2763_DOC_IDS")
+    if doc_ids:
+        return list(doc_ids)
+    if kb_id_gb and hasattr(client, "find_document_ids"):
+        return client.find_document_ids(kb_id_gb, "2763") or None
+    return None
+
+
+def _is_limit_hit(item_name: str, chunk: Dict[str, Any]) -> bool:
+    return bool(_filter_gb_chunks([chunk])) and item_name in chunk.get("content", "")
+
+
+def _is_group_limit_hit(item_names: List[str], chunk: Dict[str, Any]) -> bool:
+    """共享同一次表格检索的项目：chunk 对其中任一项目有用即可"""
+    return any(_is_limit_hit(name, chunk) for name in item_names)
+
+
+def _find_table_number(item_name: str, toc_chunks: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    从 GB 2763 目次中查找项目对应的表格编号
+    格式: "4.10 阿维菌素" -> "10"（只处理目次页，第 3-15 页）
+    """
+    pattern = re.compile(rf"4\.(\d+)\s*{re.escape(item_name)}")
+    for chunk in toc_chunks or []:
+        page_num = chunk.get("page_num", 0)
+        if not (3 <= page_num <= 15):
+            continue
+        match = pattern.search(chunk.get("content", ""))
+        if match:
+            return match.group(1)
+    return None
+
+
+def _filter_gb_chunks(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """文档名称过滤: 只保留国标文件，过滤掉细则文件（未知文档保留）"""
+    kept = []
+    for c in chunks or []:
+        doc_name = c.get("doc_name", "")
+        if "GB 2763" in doc_name or "GB2763" in doc_name:
+            kept.append(c)
+        elif "细则" in doc_name:
+            continue
+        else:
+            kept.append(c)
+    return kept
+
+
+def _select_limit_chunk(item_name: str, chunks: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """选取第一个包含项目名称的 chunk（防止查到其他农药的表格）"""
+    for chunk in chunks:
+        if item_name in chunk.get("content", ""):
+            return chunk
+    return None
+
+
 def _fuzzy_match_method(report_method: str, required_method: str) -> bool:
     """
     模糊匹配检测方法
@@ -761,90 +941,3 @@ def _fuzzy_match_method(report_method: str, required_method: str) -> bool:
 def _normalize_name(name: str) -> str:
     normalized = re.sub(r'\s+', '', name)
     return normalized
-
-def _check_limit_compliance(report_value_str: str, limit_text: str) -> Optional[str]:
-    """
-    检查指标是否合规
-    返回: None (无法判断/合规), 或 错误描述字符串
-    """
-    if not report_value_str or not limit_text:
-        return None
-        
-    # 1. 解析报告值
-    report_val = _parse_value(report_value_str)
-    if report_val is None:
-        return None # 无法解析报告值，跳过
-        
-    # 2. 解析限值
-    # 限值文本可能是一大段话，我们需要提取出与该项目相关的数值
-    # 简单策略：查找 "≤", "<", "不得检出" 等关键词附近的数字
-    # TODO: 这是一个难点，目前仅处理最简单的 "≤ X" 格式
-    
-    limit_val = None
-    limit_type = None # 'max', 'min', 'range', 'nd' (not detected)
-    
-    import re
-    
-    # 预处理 limit_text
-    limit_text = limit_text.replace(" ", "")
-    
-    if "不得检出" in limit_text or "不得检测出" in limit_text:
-        limit_type = 'nd'
-    else:
-        # 匹配 ≤ 3.0 或 < 3.0
-        match = re.search(r'(?:≤|<=|<)([\d\.]+)', limit_text)
-        if match:
-            try:
-                limit_val = float(match.group(1))
-                limit_type = 'max'
-            except:
-                pass
-                
-    # 3. 比对
-    if limit_type == 'nd':
-        # 要求不得检出
-        # 如果报告值是数值且 > 0，或者报告值是 "检出"
-        if isinstance(report_val, float) and report_val > 0:
-            return f"要求不得检出，实际检出 {report_value_str}"
-        # 如果报告值包含 "<" (e.g. <0.01) 通常认为是未检出，合规
-        
-    elif limit_type == 'max':
-        # 上限控制
-        if isinstance(report_val, float):
-             if report_val > limit_val:
-                 return f"超标 (实测 {report_value_str} > 限量 {limit_val})"
-    
-    return None
-
-def _parse_value(val_str: str) -> Optional[float]:
-    """
-    解析检测值
-    "0.052" -> 0.052
-    "<0.01" -> 0.0 (视为未检出/合规边界)
-    "未检出" -> 0.0
-    "ND" -> 0.0
-    """
-    if not val_str:
-        return None
-        
-    val_str = val_str.strip()
-    
-    if "未检出" in val_str or "ND" in val_str.upper():
-        return 0.0
-        
-    # 处理 < 符号
-    if val_str.startswith("<"):
-        # <0.01 视为 0 (或者视为小于限量的极小值)
-        # 这里的逻辑是：如果是 <DL，通常说明合规（除非DL > Limit，那在另外的逻辑处理）
-        return 0.0 
-        
-    try:
-        import re
-        # 提取第一个浮点数
-        match = re.search(r'([\d\.]+)', val_str)
-        if match:
-            return float(match.group(1))
-    except:
-        pass
-        
-    return None
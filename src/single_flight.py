@@ -0,0 +1,115 @@
+"""
+并发相同请求合并（single-flight）
+
+多个线程同时发起同一个键的请求时，只有第一个线程（leader）真正执行，
+其余线程等待并共享同一个结果。
+
+跨 worker（多个 gunicorn 进程）时可选使用文件锁：拿到锁的进程执行请求并写入共享缓存，
+其他进程拿到锁后先重新读取缓存，命中则不再请求。文件锁依赖 fcntl，Windows 下自动降级为
+仅进程内合并。
+
+锁文件按键的哈希分到固定的 LOCK_STRIPES 个文件上（而不是每个键一个文件），锁目录大小有上界；
+不同的键偶尔共用一个锁文件只会让它们串行执行，不影响正确性。
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+LOCK_STRIPES = 256
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """进程内的请求合并"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.shared = 0  # 被合并（未实际执行）的调用次数
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        执行 fn，同一时刻相同 key 的调用共享同一次执行的结果（或异常）
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+
+def _lock_file_name(key: str) -> str:
+    stripe = int(hashlib.sha1(key.encode("utf-8")).hexdigest(), 16) % LOCK_STRIPES
+    return f"{stripe:02x}.lock"
+
+
+@contextmanager
+def interprocess_lock(lock_dir: Path, key: str) -> Iterator[bool]:
+    """
+    跨进程互斥锁（阻塞等待），产出 True 表示确实持有了文件锁
+
+    不支持 fcntl 或锁文件无法创建时产出 False，调用方照常执行即可。
+    """
+    if not FCNTL_AVAILABLE:
+        yield False
+        return
+    try:
+        lock_dir.mkdir(parents=True, exist_ok=True)
+        f = open(lock_dir / _lock_file_name(key), "a+")
+    except OSError as e:
+        logger.warning("无法创建锁文件: %s", e)
+        yield False
+        return
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        yield True
+    finally:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        finally:
+            f.close()
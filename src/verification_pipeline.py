@@ -0,0 +1,92 @@
+"""
+报告核验阶段并发执行
+
+process_single_file 在字段提取之后要调用几个互不依赖的外部核验：国标有效性（verify_gb_standards，
+访问标准网站、截图、下载）和检验项目合规性（verify_inspection_compliance，RAGFlow 检索）。
+它们只依赖提取结果，原来依次执行，总耗时是各阶段之和。这里在一个共享线程池中同时启动所有阶段，
+等待全部完成，总耗时约为最慢的阶段。
+
+- 每个阶段的返回值/异常/耗时记录在 StageResult 中，一个阶段失败不影响其他阶段
+- 阶段函数在调用方的日志上下文（请求 ID）中执行
+- 只有一个阶段时直接在当前线程执行
+"""
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from app_logging import bind_context, get_logger
+
+logger = get_logger(__name__)
+
+# 所有请求共享的阶段线程池（每个报告 2 个阶段，阶段内部各自有自己的并发）
+DEFAULT_MAX_WORKERS = 8
+
+
+@dataclass
+class StageResult:
+    name: str
+    value: Any = None
+    error: Optional[BaseException] = None
+    duration_s: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS, thread_name_prefix="verify-stage")
+        return _executor
+
+
+def _run_stage(name: str, fn: Callable[[], Any]) -> StageResult:
+    start = time.perf_counter()
+    result = StageResult(name)
+    try:
+        result.value = fn()
+    except Exception as e:
+        result.error = e
+    result.duration_s = time.perf_counter() - start
+    if result.ok:
+        logger.info("核验阶段 %s 完成: %.2fs", name, result.duration_s)
+    else:
+        logger.error("核验阶段 %s 失败 (%.2fs): %s", name, result.duration_s, result.error, exc_info=result.error)
+    return result
+
+
+def run_stages(stages: Dict[str, Callable[[], Any]]) -> Dict[str, StageResult]:
+    """
+    并发执行互不依赖的核验阶段并等待全部完成
+
+    :param stages: {阶段名: 无参函数}
+    :return: {阶段名: StageResult}，顺序与 stages 相同
+    """
+    if not stages:
+        return {}
+    start = time.perf_counter()
+    if len(stages) == 1:
+        name, fn = next(iter(stages.items()))
+        return {name: _run_stage(name, fn)}
+
+    executor = _get_executor()
+    futures = {
+        name: executor.submit(bind_context(_run_stage), name, fn)
+        for name, fn in stages.items()
+    }
+    results = {name: future.result() for name, future in futures.items()}
+    logger.info(
+        "核验阶段并发完成: %.2fs (%s)", time.perf_counter() - start,
+        ", ".join(f"{r.name} {r.duration_s:.2f}s" for r in results.values()),
+    )
+    return results
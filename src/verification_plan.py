@@ -0,0 +1,113 @@
+"""
+食品验证计划缓存
+
+同一食品、同一知识库版本下，细则中的检验项目（standard_basis / test_method）、统一依据标准
+以及 GB 2763 的限量证据对每份报告都相同。验证计划保存这些与报告无关的内容：
+
+    static/cache/verification_plans/<sha1(食品名 + 知识库版本)>.json
+
+重复的报告只需要做本地比对，不再检索 RAGFlow。限量证据按需补充（只检索报告中出现过的项目），
+补充后写回计划文件。知识库版本号变化（RAGFlowClient.bump_dataset_version）后自动使用新计划。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app_logging import get_logger
+from ragflow_cache import CACHE_DIR, _load_json, _write_json_atomic
+
+logger = get_logger(__name__)
+
+PLANS_DIR = CACHE_DIR / "verification_plans"
+DEFAULT_TTL_S = 30 * 86400
+
+# 计划格式或构建逻辑（筛选阈值、解析规则）变化时递增，旧计划自动失效
+PLAN_SCHEMA_VERSION = 2
+
+PLAN_READY = "ready"
+PLAN_UNAVAILABLE = "unavailable"   # RAGFlow 熔断中
+PLAN_NOT_FOUND = "not_found"       # 细则中未检索到该食品
+PLAN_NO_ITEMS = "no_items"         # 检索到了但未解析出检验项目
+
+
+class VerificationPlanStore:
+    """验证计划的内存 + 文件缓存（线程安全）"""
+
+    def __init__(self, plans_dir: Path = PLANS_DIR, ttl_s: float = DEFAULT_TTL_S):
+        self.plans_dir = Path(plans_dir)
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._plans: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def plan_key(food_name: str, kb_versions: Dict[str, str]) -> str:
+        raw = json.dumps(
+            [PLAN_SCHEMA_VERSION, food_name.strip(), sorted(kb_versions.items())],
+            ensure_ascii=False, separators=(",", ":"),
+        )
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.plans_dir / f"{key}.json"
+
+    def get(self, food_name: str, kb_versions: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        key = self.plan_key(food_name, kb_versions)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is None:
+                plan = _load_json(self._path(key), None)
+                if plan is not None:
+                    self._plans[key] = plan
+        if plan is None:
+            return None
+        if time.time() - plan.get("created_at", 0) > self.ttl_s:
+            with self._lock:
+                self._plans.pop(key, None)
+            return None
+        return plan
+
+    def save(self, plan: Dict[str, Any]) -> None:
+        key = self.plan_key(plan["food_name"], plan.get("kb_versions") or {})
+        plan["plan_key"] = key
+        with self._lock:
+            self._plans[key] = plan
+            self._write(key, plan)
+
+    def add_limits(self, plan: Dict[str, Any], limits: Dict[str, Optional[Dict[str, Any]]]) -> None:
+        """把新检索到的限量证据写回计划（None 表示 GB 2763 中未找到，同样缓存）"""
+        key = plan.get("plan_key") or self.plan_key(plan["food_name"], plan.get("kb_versions") or {})
+        with self._lock:
+            # 替换整个 dict，正在读取旧 dict 的报告不受影响
+            plan["limits"] = {**plan.get("limits", {}), **limits}
+            self._plans[key] = plan
+            self._write(key, plan)
+
+    def _write(self, key: str, plan: Dict[str, Any]) -> None:
+        try:
+            _write_json_atomic(self._path(key), plan)
+        except Exception as e:
+            logger.warning("Failed to save verification plan: %s", e)
+
+
+_plan_store: Optional[VerificationPlanStore] = None
+_plan_store_lock = threading.Lock()
+
+
+def get_plan_store(config: Dict[str, Any]) -> Optional[VerificationPlanStore]:
+    """
+    获取验证计划缓存单例
+
+    RAGFLOW_PLAN_CACHE_DISABLED: true 关闭；RAGFLOW_PLAN_TTL_S: 计划有效期（秒）
+    """
+    global _plan_store
+    if config.get("RAGFLOW_PLAN_CACHE_DISABLED"):
+        return None
+    with _plan_store_lock:
+        if _plan_store is None:
+            _plan_store = VerificationPlanStore(ttl_s=float(config.get("RAGFLOW_PLAN_TTL_S", DEFAULT_TTL_S)))
+        return _plan_store
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 与 src/app.py 一致：模块按 src 下的顶层名称导入
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+import app_logging
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "app.log"
+    app_logging.configure_logging(level="INFO", log_file=str(path), fmt="text")
+    yield path
+    app_logging.configure_logging()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="需要 os.fork")
+def test_forked_child_records_are_emitted(log_file):
+    # 模拟 gunicorn preload_app: 父进程中配置日志后 fork 出 worker
+    logger = app_logging.get_logger("test.fork")
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            logger.info("child-record %d", os.getpid())
+            app_logging.shutdown_logging()
+            code = 0
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert f"child-record {pid}" in log_file.read_text(encoding="utf-8")
+
+
+def test_request_id_in_records(log_file):
+    with app_logging.request_context("req-abc"):
+        app_logging.get_logger("test.rid").info("hello")
+    app_logging.shutdown_logging()
+    assert "[req-abc] test.rid: hello" in log_file.read_text(encoding="utf-8")
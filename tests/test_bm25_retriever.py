@@ -0,0 +1,82 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from local_index import bm25_retriever
+from local_index.bm25_retriever import BM25_B, BM25_K1, BM25Index, LocalRetrievalClient, tokenize
+
+DOCS = [
+    "<table><tr><td>黄瓜</td><td>毒死蜱</td><td>0.1</td></tr></table>",
+    "表10 苹果 毒死蜱 1",
+    "黄瓜 检验项目 铅 镉",
+    "GB 2763-2021 食品中农药最大残留限量",
+]
+
+
+def _reference_scores(texts, query):
+    docs = [Counter(tokenize(t)) for t in texts]
+    lengths = [sum(d.values()) for d in docs]
+    avgdl = sum(lengths) / len(lengths)
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(1 for d in docs if term in d)
+            if not df:
+                continue
+            idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            tf = doc[term]
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avgdl))
+        scores.append(score)
+    return scores
+
+
+def test_tokenize():
+    tokens = tokenize("<td>黄瓜</td> 表 10 GB 2763")
+    assert {"黄", "瓜", "黄瓜", "表10", "gb", "2763"} <= set(tokens)
+    assert "td" not in tokens
+
+
+@pytest.mark.parametrize("query", ["黄瓜 毒死蜱", "表10", "gb 2763", "不存在的词"])
+def test_scores_match_reference_bm25(query):
+    index = BM25Index(DOCS)
+    np.testing.assert_allclose(index.scores(query), _reference_scores(DOCS, query), rtol=1e-5, atol=1e-6)
+
+
+def test_mask_zeroes_excluded_documents():
+    index = BM25Index(DOCS)
+    mask = np.array([False, True, True, True])
+    assert index.scores("黄瓜", mask)[0] == 0
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    rules = tmp_path / "细则.pdf"
+    gb = tmp_path / "GB2763.pdf"
+    rules.write_bytes(b"")
+    gb.write_bytes(b"")
+    chunks = {
+        rules.name: [{"content": DOCS[2], "page_num": 1}, {"content": "苹果 检验项目 甲胺磷", "page_num": 2}],
+        gb.name: [{"content": DOCS[0], "page_num": 5}],
+    }
+    monkeypatch.setattr(bm25_retriever, "load_document_chunks", lambda path, tables="html": chunks[path.name])
+    return LocalRetrievalClient({"rules": [{"path": str(rules)}], "gb": [{"path": str(gb)}]}, kb_id="rules")
+
+
+def test_query_is_scoped_to_dataset(client):
+    results = client.query("黄瓜")
+    assert [r["page_num"] for r in results] == [1]
+    assert results[0]["score"] == 1.0
+    assert [r["page_num"] for r in client.query("黄瓜 毒死蜱", dataset_ids=["gb"])] == [5]
+
+
+def test_query_respects_page_size_and_threshold(client):
+    assert len(client.query("检验项目", page_size=1)) == 1
+    assert client.query("不存在的词") == []
+
+
+def test_find_document_ids(client):
+    assert client.find_document_ids("gb", "GB2763") == [bm25_retriever.document_id("GB2763.pdf")]
+    assert client.find_document_ids("rules", "GB2763") == []
@@ -0,0 +1,53 @@
+import csv
+import io
+import json
+
+import pytest
+
+from gb_verifier import bulk_audit
+from gb_verifier.bulk_audit import RESULT_COLUMNS, load_catalog, stream_csv
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps({
+        "GB 2763-2021": {"status": "现行有效", "implement_date": "2021-09-03"},
+    }, ensure_ascii=False), encoding="utf-8")
+    return load_catalog(path)
+
+
+def _rows(text):
+    return list(csv.reader(io.StringIO(text)))
+
+
+def test_stream_csv_rejects_missing_column_before_streaming(catalog):
+    with pytest.raises(ValueError, match="production_date"):
+        stream_csv(catalog, io.StringIO("code,date\nGB 2763-2021,2022-01-01\n"))
+
+
+def test_stream_csv_rejects_empty_input(catalog):
+    with pytest.raises(ValueError):
+        stream_csv(catalog, io.StringIO(""))
+
+
+def test_stream_csv_short_rows(catalog):
+    text = "".join(stream_csv(catalog, io.StringIO("code,production_date\nGB 2763-2021,2022-01-01\nGB 2763-2021\n")))
+    header, first, short = _rows(text)
+    assert header == ["code", "production_date"] + RESULT_COLUMNS
+    passed = dict(zip(header, first))["passed"]
+    assert passed == "1"
+    assert dict(zip(header, short))["invalid_production_date"] == "1"
+
+
+@pytest.mark.skipif(not bulk_audit.PYARROW_AVAILABLE, reason="需要 pyarrow")
+def test_write_parquet_fixed_schema(catalog, tmp_path):
+    import pyarrow.parquet as pq
+
+    # 第一块全部是未知标准（status 为空），第二块有状态；短行不抛 IndexError
+    text = "code,production_date\nGB 1-2000,2022-01-01\nGB 2763-2021\nGB 2763-2021,2022-01-01\n"
+    out = tmp_path / "audit.parquet"
+    total = bulk_audit.write_parquet(catalog, io.StringIO(text), out, chunk_size=1)
+    assert total == 3
+    table = pq.read_table(out)
+    assert table.column("status").to_pylist() == [None, "现行有效", "现行有效"]
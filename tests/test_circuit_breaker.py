@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryableError,
+    RetryBudget,
+    async_call_with_retry,
+    call_with_retry,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+NO_WAIT = RetryBudget(max_attempts=3, deadline_s=60, base_delay_s=0, max_delay_s=0)
+
+
+def test_opens_after_threshold_and_recovers_via_half_open(clock):
+    breaker = CircuitBreaker("svc", failure_threshold=2, recovery_timeout_s=30)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock[0] += 30
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()                 # 放行一个探测请求
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()             # 半开状态只放行 half_open_max_calls 个
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_failure_in_half_open_reopens(clock):
+    breaker = CircuitBreaker("svc", failure_threshold=1, recovery_timeout_s=10)
+    breaker.record_failure()
+    clock[0] += 10
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+
+def test_call_with_retry_retries_retryable_errors():
+    breaker = CircuitBreaker("svc", failure_threshold=5)
+    attempts = []
+
+    def fn(timeout):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise RetryableError("502")
+        return "ok"
+
+    assert call_with_retry(fn, breaker, NO_WAIT, max_attempt_timeout_s=20) == "ok"
+    assert len(attempts) == 3 and all(t <= 20 for t in attempts)
+    assert breaker.state == CLOSED
+
+
+def test_call_with_retry_gives_up_and_opens_breaker():
+    breaker = CircuitBreaker("svc", failure_threshold=3)
+    with pytest.raises(RetryableError):
+        call_with_retry(lambda t: (_ for _ in ()).throw(RetryableError("503")), breaker, NO_WAIT)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(lambda t: "ok", breaker, NO_WAIT)
+
+
+def test_non_retryable_errors_are_not_counted():
+    breaker = CircuitBreaker("svc", failure_threshold=1)
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        raise ValueError("bad json")
+
+    with pytest.raises(ValueError):
+        call_with_retry(fn, breaker, NO_WAIT)
+    assert len(calls) == 1
+    assert breaker.state == CLOSED
+
+
+def test_async_call_with_retry():
+    breaker = CircuitBreaker("svc", failure_threshold=5)
+    attempts = []
+
+    async def fn(timeout):
+        attempts.append(timeout)
+        if len(attempts) < 2:
+            raise RetryableError("timeout")
+        return "ok"
+
+    assert asyncio.run(async_call_with_retry(fn, breaker, NO_WAIT)) == "ok"
+    assert len(attempts) == 2
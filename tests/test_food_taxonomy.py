@@ -0,0 +1,59 @@
+import pytest
+
+from local_index.food_taxonomy import FoodTaxonomy, get_food_taxonomy
+
+DATA = {
+    "nodes": {
+        "蔬菜": None,
+        "瓜类蔬菜": "蔬菜",
+        "黄瓜": "瓜类蔬菜",
+        "叶菜类蔬菜": "蔬菜",
+        "小白菜": "叶菜类蔬菜",
+        "水果": None,
+        "桃": "水果",
+        "辣椒(鲜)": "蔬菜",
+    },
+    "aliases": {"青瓜": "黄瓜", "不存在的别名": "不存在"},
+}
+
+
+@pytest.fixture
+def taxonomy():
+    return FoodTaxonomy(DATA)
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("黄瓜", "黄瓜"),
+    ("青瓜", "黄瓜"),            # 别名
+    ("精品黄瓜", "黄瓜"),        # 名称中最长的词典词
+    ("有机小白菜", "小白菜"),
+    ("辣椒", "辣椒(鲜)"),        # 去掉限定语后无歧义
+    ("桃", "桃"),
+    ("核桃仁", None),            # 单字不参与包含匹配
+    ("", None),
+])
+def test_resolve(taxonomy, name, expected):
+    assert taxonomy.resolve(name) == expected
+
+
+def test_categories_from_fine_to_coarse(taxonomy):
+    assert taxonomy.categories("黄瓜") == ["黄瓜", "瓜类蔬菜", "蔬菜"]
+    assert taxonomy.categories("青瓜") == ["青瓜", "黄瓜", "瓜类蔬菜", "蔬菜"]
+    assert taxonomy.categories("未知食品") == ["未知食品"]
+
+
+def test_aliases_to_missing_nodes_are_dropped(taxonomy):
+    assert "不存在的别名" not in taxonomy.aliases
+
+
+def test_cyclic_parents_do_not_hang():
+    taxonomy = FoodTaxonomy({"nodes": {"甲类": "乙类", "乙类": "甲类"}})
+    assert taxonomy.ancestors("甲类") == ["甲类", "乙类"]
+
+
+def test_shipped_taxonomy_covers_common_foods():
+    taxonomy = get_food_taxonomy()
+    if taxonomy is None:
+        pytest.skip("food_taxonomy.json 不存在")
+    assert taxonomy.categories("黄瓜")[:2] == ["黄瓜", "瓜类蔬菜"]
+    assert "茄果类蔬菜" in taxonomy.categories("西红柿")
@@ -0,0 +1,54 @@
+import pytest
+
+import html_table_engine
+from html_table_engine import MAX_SPAN, extract_tables
+
+BACKENDS = [html_table_engine._extract_tables_regex]
+if html_table_engine.LXML_AVAILABLE:
+    BACKENDS.append(html_table_engine._extract_tables_lxml)
+
+
+@pytest.fixture(params=BACKENDS, ids=lambda fn: fn.__name__)
+def parse(request):
+    return request.param
+
+
+def test_rowspan_and_colspan_are_expanded(parse):
+    html = (
+        "<table><caption>表1</caption>"
+        "<tr><th>检验项目</th><th colspan=\"2\">依据</th></tr>"
+        "<tr><td>铅</td><td rowspan=\"2\">GB 2762</td><td>GB 5009.12</td></tr>"
+        "<tr><td>镉</td><td>GB 5009.15</td></tr>"
+        "</table>"
+    )
+    assert parse(html) == [[
+        ["检验项目", "依据", "依据"],
+        ["铅", "GB 2762", "GB 5009.12"],
+        ["镉", "GB 2762", "GB 5009.15"],
+    ]]
+
+
+def test_br_entities_and_whitespace(parse):
+    html = "<table><tr><td>毒死蜱<br/>(chlorpyrifos)</td><td>&lt;0.02&nbsp;mg/kg </td></tr></table>"
+    assert parse(html) == [[["毒死蜱 (chlorpyrifos)", "<0.02 mg/kg"]]]
+
+
+def test_every_table_in_chunk_is_returned(parse):
+    html = "<table><tr><td>a</td></tr></table>正文<table><tr><td>b</td><td>c</td></tr></table>"
+    assert parse(html) == [[["a"]], [["b", "c"]]]
+
+
+def test_short_rows_are_padded(parse):
+    html = "<table><tr><td>a</td><td>b</td><td>c</td></tr><tr><td>d</td></tr></table>"
+    assert parse(html) == [[["a", "b", "c"], ["d", "", ""]]]
+
+
+def test_huge_span_is_capped(parse):
+    html = "<table><tr><td rowspan=\"100000\">x</td></tr></table>"
+    grid = parse(html)[0]
+    assert len(grid) <= MAX_SPAN
+
+
+def test_no_table():
+    assert extract_tables("") == []
+    assert extract_tables("纯文本 chunk") == []
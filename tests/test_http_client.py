@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from gb_verifier import http_client
+
+
+class _SseHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections: set = set()
+    paths: list = []
+    hold_open_s = 0.0
+
+    def do_POST(self):
+        type(self).connections.add(self.client_address)
+        type(self).paths.append(self.path)
+        req = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for msg in ({"jsonrpc": "2.0", "id": req["id"], "result": {"ok": True}}, {"jsonrpc": "2.0", "method": "log"}):
+            data = f"data: {json.dumps(msg)}\n\n".encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+        time.sleep(type(self).hold_open_s)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    for name in ("http_proxy", "HTTP_PROXY", "https_proxy", "HTTPS_PROXY", "no_proxy", "NO_PROXY"):
+        monkeypatch.delenv(name, raising=False)
+    _SseHandler.connections = set()
+    _SseHandler.paths = []
+    _SseHandler.hold_open_s = 0.0
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _SseHandler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    http_client._pool = http_client._ConnectionPool()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_chunked_sse_connection_is_reused(server):
+    url = f"http://127.0.0.1:{server.server_port}/mcp"
+    for i in range(3):
+        out = http_client.http_jsonrpc_stream(url, {"jsonrpc": "2.0", "id": i, "method": "ping"}, timeout_s=5)
+        assert out["_transport"] == "sse"
+        assert out["body"]["id"] == i
+    assert len(_SseHandler.connections) == 1
+
+
+def test_http_proxy_from_environment(server, monkeypatch):
+    monkeypatch.setenv("http_proxy", f"http://127.0.0.1:{server.server_port}")
+    out = http_client.http_jsonrpc_stream("http://mcp.example.invalid/mcp?x=1", {"jsonrpc": "2.0", "id": 7}, timeout_s=5)
+    assert out["body"]["id"] == 7
+    assert _SseHandler.paths == ["http://mcp.example.invalid/mcp?x=1"]
+
+
+def test_returns_without_waiting_for_stream_end(server):
+    _SseHandler.hold_open_s = 3
+    url = f"http://127.0.0.1:{server.server_port}/mcp"
+    start = time.monotonic()
+    out = http_client.http_jsonrpc_stream(url, {"jsonrpc": "2.0", "id": 1}, timeout_s=10)
+    assert out["body"]["id"] == 1
+    assert time.monotonic() - start < 1.5
+    # 未读完的连接被丢弃，下一次请求使用新连接
+    _SseHandler.hold_open_s = 0
+    assert http_client.http_jsonrpc_stream(url, {"jsonrpc": "2.0", "id": 2}, timeout_s=10)["body"]["id"] == 2
+    assert len(_SseHandler.connections) == 2
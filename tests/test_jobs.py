@@ -0,0 +1,67 @@
+import json
+import os
+import time
+
+import pytest
+
+from gb_verifier import jobs
+
+
+@pytest.fixture
+def jobs_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_DIR", tmp_path)
+    monkeypatch.setattr(jobs, "JOB_HEARTBEAT_S", 0)
+    return tmp_path
+
+
+def _write_job(jobs_dir, job_id, events):
+    path = jobs_dir / f"{job_id}.ndjson"
+    path.write_text("".join(json.dumps(ev) + "\n" for ev in events), encoding="utf-8")
+    return path
+
+
+def _started(pid, host=None):
+    return {"seq": 0, "type": "started", "job_id": "j", "total": 2,
+            "owner_pid": pid, "owner_host": host or jobs.socket.gethostname()}
+
+
+def _dead_pid():
+    pid = os.getpid() + 100000
+    while True:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return pid
+        except OSError:
+            pass
+        pid += 1
+
+
+def test_stale_job_with_dead_owner_ends_with_error(jobs_dir):
+    _write_job(jobs_dir, "j", [_started(_dead_pid()), {"seq": 1, "type": "result", "code": "GB 1", "result": {}}])
+    events = [ev for ev in jobs.iter_job_events("j", timeout_s=2) if ev is not None]
+    assert [ev["type"] for ev in events] == ["started", "result", "error", "done"]
+    assert events[2]["stale"] is True
+    assert events[2]["seq"] == 2 and events[3]["seq"] == 3
+
+
+def test_stale_job_without_heartbeat(jobs_dir):
+    path = _write_job(jobs_dir, "j", [_started(os.getpid(), host="other-host")])
+    old = time.time() - jobs.JOB_STALE_S - 5
+    os.utime(path, (old, old))
+    assert jobs.stale_reason("j", _started(os.getpid(), host="other-host"))
+    events = [ev for ev in jobs.iter_job_events("j", cursor=1, timeout_s=2) if ev is not None]
+    assert [ev["type"] for ev in events] == ["error", "done"]
+
+
+def test_running_job_is_not_stale_and_poll_is_capped(jobs_dir):
+    _write_job(jobs_dir, "j", [_started(os.getpid())])
+    assert jobs.stale_reason("j", _started(os.getpid())) is None
+    start = time.time()
+    events = list(jobs.iter_job_events("j", poll_interval=0.05, timeout_s=0.3, heartbeat_s=None))
+    assert time.time() - start < 2
+    assert [ev["type"] for ev in events] == ["started"]
+
+
+def test_default_long_poll_below_worker_timeout():
+    assert jobs.EVENTS_MAX_WAIT_S < 300
@@ -0,0 +1,111 @@
+import pytest
+
+from limit_table import (
+    CMP_LT,
+    CMP_MAX,
+    CMP_MIN,
+    CMP_ND,
+    LimitRow,
+    check_limits,
+    parse_limit_rows,
+    parse_measurement,
+    select_limit,
+)
+
+CUCUMBER_TABLE = (
+    "<table><tr><th>食品类别/名称</th><th>最大残留限量,mg/kg</th></tr>"
+    "<tr><td>瓜类蔬菜(黄瓜除外)</td><td>0.5</td></tr>"
+    "<tr><td>黄瓜</td><td>0.1</td></tr>"
+    "<tr><td>叶菜类蔬菜</td><td>不得检出</td></tr>"
+    "</table>"
+)
+
+SECTIONED_TEXT = (
+    "4.10 阿维菌素(abamectin)\n"
+    "黄瓜 0.02\n"
+    "4.11 百菌清(chlorothalonil)\n"
+    "黄瓜 5\n"
+)
+
+
+@pytest.mark.parametrize("content, foods, item, expected_food, expected_value, expected_cmp", [
+    # "(黄瓜除外)" 的类别行不用于黄瓜
+    (CUCUMBER_TABLE, ["黄瓜", "瓜类蔬菜"], None, "黄瓜", 0.1, CMP_MAX),
+    (CUCUMBER_TABLE, ["西葫芦", "瓜类蔬菜"], None, "瓜类蔬菜(黄瓜除外)", 0.5, CMP_MAX),
+    (CUCUMBER_TABLE, ["菠菜", "叶菜类蔬菜"], None, "叶菜类蔬菜", 0.0, CMP_ND),
+    # 章节范围：只使用检验项目所在章节的行
+    (SECTIONED_TEXT, ["黄瓜"], "阿维菌素", "黄瓜", 0.02, CMP_MAX),
+    (SECTIONED_TEXT, ["黄瓜"], "百菌清", "黄瓜", 5.0, CMP_MAX),
+    # 比较符
+    ("黄瓜 <0.01 mg/kg", ["黄瓜"], None, "黄瓜", 0.01, CMP_LT),
+    ("黄瓜 ≥2 mg/kg", ["黄瓜"], None, "黄瓜", 2.0, CMP_MIN),
+    # 表头单位
+    ("<table><tr><th>食品</th><th>限量/(μg/kg)</th></tr><tr><td>黄瓜</td><td>20</td></tr></table>",
+     ["黄瓜"], None, "黄瓜", 20.0, CMP_MAX),
+])
+def test_select_limit(content, foods, item, expected_food, expected_value, expected_cmp):
+    row = select_limit(parse_limit_rows(content), foods, item)
+    assert row is not None
+    assert (row.food, row.value, row.comparator) == (expected_food, expected_value, expected_cmp)
+
+
+def test_header_unit_is_applied():
+    rows = parse_limit_rows(
+        "<table><tr><th>食品</th><th>限量/(μg/kg)</th></tr><tr><td>黄瓜</td><td>20</td></tr></table>"
+    )
+    assert rows[0].unit == "μg/kg"
+
+
+@pytest.mark.parametrize("text, unit, value, unit_name, known", [
+    ("0.052", None, 0.052, None, True),
+    ("150 μg/kg", None, 150.0, "μg/kg", True),
+    ("150", "ug/kg", 150.0, "μg/kg", True),
+    ("<0.01", "mg/kg", 0.0, "mg/kg", True),
+    ("未检出", None, 0.0, None, True),
+    ("ND", None, 0.0, None, True),
+    ("N.D.", None, 0.0, None, True),
+    ("nd(<0.005)", None, 0.0, None, True),
+    ("120", "CFU/g", 120.0, None, False),
+])
+def test_parse_measurement(text, unit, value, unit_name, known):
+    m = parse_measurement(text, unit)
+    assert (m.value, m.unit, m.unit_known) == (value, unit_name, known)
+
+
+def test_nd_only_matches_whole_token():
+    # 含 "nd" 字母的其他文字不应被当作未检出
+    assert parse_measurement("0.3 (endosulfan)").value == 0.3
+    assert parse_measurement("Indoxacarb 0.2").value == 0.2
+
+
+def _limit(value, unit="mg/kg", cmp=CMP_MAX, sign=""):
+    return LimitRow("黄瓜", value, str(value), unit, cmp, sign)
+
+
+@pytest.mark.parametrize("measurement, limit, issue", [
+    # 单位换算: 150 μg/kg = 0.15 mg/kg > 0.1 mg/kg
+    (("150", "μg/kg"), _limit(0.1), "超标"),
+    (("100", "μg/kg"), _limit(0.1), None),           # 换算后恰好等于限量
+    (("0.02", "mg/kg"), _limit(20, "μg/kg"), None),
+    (("0.08", None), _limit(0.1), None),             # 报告未写单位，按限量单位
+    # 比较方式
+    (("0.01", "mg/kg"), _limit(0.01, cmp=CMP_LT, sign="<"), "超标"),
+    (("0.009", "mg/kg"), _limit(0.01, cmp=CMP_LT, sign="<"), None),
+    (("1.5", "mg/kg"), _limit(2, cmp=CMP_MIN, sign="≥"), "低于下限"),
+    (("2", "mg/kg"), _limit(2, cmp=CMP_MIN, sign="≥"), None),
+    (("0.003", "mg/kg"), _limit(0, cmp=CMP_ND), "要求不得检出"),
+    (("未检出", None), _limit(0, cmp=CMP_ND), None),
+    # 无法识别的单位 / 量纲不一致不做判断
+    (("1000", "CFU/g"), _limit(0.1), None),
+    (("5", "mg/L"), _limit(0.1), None),
+])
+def test_check_limits(measurement, limit, issue):
+    result = check_limits([parse_measurement(*measurement)], [limit])[0]
+    if issue is None:
+        assert result is None
+    else:
+        assert result is not None and result.startswith(issue)
+
+
+def test_check_limits_handles_missing_values():
+    assert check_limits([None, parse_measurement("0.5")], [_limit(0.1), None]) == [None, None]
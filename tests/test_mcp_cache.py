@@ -0,0 +1,24 @@
+from gb_verifier.mcp_cache import McpResponseCache
+
+OK_RESPONSE = {"http_status": 200, "body": {"result": {"content": [{"text": "现行有效"}]}}}
+
+
+def test_refreshing_cache_skips_cached_entry(tmp_path):
+    cache = McpResponseCache(tmp_path)
+    cache.put("tavily_search", {"query": "GB 2763"}, OK_RESPONSE)
+    assert cache.call_tool(None, 1, "tavily_search", {"query": "GB 2763"})["_cache"] == "hit"
+
+    refreshing = cache.refreshing()
+    assert refreshing.cache_dir == cache.cache_dir
+    # 不读缓存：没有连接时返回未命中，而不是旧响应
+    resp = refreshing.call_tool(None, 1, "tavily_search", {"query": "GB 2763"})
+    assert "_cache" not in resp
+    assert resp["http_status"] is None
+
+
+def test_refresh_result_overwrites_cache(tmp_path):
+    cache = McpResponseCache(tmp_path)
+    cache.put("tavily_search", {"query": "GB 2763"}, OK_RESPONSE)
+    fresh = {"http_status": 200, "body": {"result": {"content": [{"text": "已废止"}]}}}
+    cache.refreshing().put("tavily_search", {"query": "GB 2763"}, fresh)
+    assert cache.get("tavily_search", {"query": "GB 2763"}) == fresh
@@ -0,0 +1,49 @@
+import os
+
+from ragflow_cache import RetrievalCache
+
+
+def _pair(tmp_path):
+    kwargs = dict(path=tmp_path / "retrieval.json", versions_path=tmp_path / "versions.json")
+    return RetrievalCache(**kwargs), RetrievalCache(**kwargs)
+
+
+def test_bump_in_one_process_invalidates_the_other(tmp_path):
+    a, b = _pair(tmp_path)
+    b.put("黄瓜 限量", ["kb1"], 10, [{"content": "old"}])
+    assert b.get("黄瓜 限量", ["kb1"], 10) == [{"content": "old"}]
+
+    a.bump_dataset_version("kb1", "v2")
+    # 保证 mtime 与初次读取时不同（低精度文件系统）
+    os.utime(tmp_path / "versions.json", ns=(1, 1))
+    assert b.dataset_version("kb1") == "v2"
+    assert b.get("黄瓜 限量", ["kb1"], 10) is None
+
+
+def test_bumps_from_two_processes_are_merged(tmp_path):
+    a, b = _pair(tmp_path)
+    a.bump_dataset_version("kb1", "v1")
+    b.bump_dataset_version("kb2", "v2")
+    fresh = RetrievalCache(path=None, versions_path=tmp_path / "versions.json")
+    assert fresh.dataset_version("kb1") == "v1"
+    assert fresh.dataset_version("kb2") == "v2"
+
+
+def test_flush_merges_entries_from_other_process(tmp_path):
+    a, b = _pair(tmp_path)
+    a.put("q1", ["kb1"], 10, [{"id": 1}])
+    b.put("q2", ["kb1"], 10, [{"id": 2}])
+    a.flush()
+    b.flush()
+    fresh, _ = _pair(tmp_path)
+    assert fresh.get("q1", ["kb1"], 10) == [{"id": 1}]
+    assert fresh.get("q2", ["kb1"], 10) == [{"id": 2}]
+
+
+def test_clear_is_not_undone_by_merge(tmp_path):
+    a, _ = _pair(tmp_path)
+    a.put("q1", ["kb1"], 10, [{"id": 1}])
+    a.flush()
+    a.clear()
+    fresh, _ = _pair(tmp_path)
+    assert fresh.get("q1", ["kb1"], 10) is None
@@ -0,0 +1,44 @@
+import socket
+import time
+
+import pytest
+
+import ragflow_client
+from circuit_breaker import OPEN, RetryBudget
+from ragflow_client import RAGFlowClient
+
+
+@pytest.fixture
+def hung_server():
+    """接受连接但从不响应的服务端"""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(16)
+    yield f"http://127.0.0.1:{sock.getsockname()[1]}/api/v1/retrieval"
+    sock.close()
+
+
+def test_default_budget_bounds_a_hung_request():
+    assert ragflow_client.DEFAULT_TIMEOUT_S <= 10
+    assert ragflow_client.DEFAULT_RETRY_BUDGET_S <= 15
+    client = RAGFlowClient("http://ragflow.invalid/api", "key", "kb")
+    assert client.retry_budget.deadline_s == ragflow_client.DEFAULT_RETRY_BUDGET_S
+
+
+def test_hung_ragflow_fails_fast_and_opens_breaker(hung_server):
+    client = RAGFlowClient(
+        hung_server, "key", "kb",
+        timeout_s=1,
+        retry_budget=RetryBudget(max_attempts=2, deadline_s=3, base_delay_s=0, max_delay_s=0),
+        breaker_threshold=3,
+    )
+    start = time.monotonic()
+    assert client._retrieve("黄瓜 检验项目", ["kb"], 5) is None
+    assert time.monotonic() - start < 3.5
+    assert client._retrieve("黄瓜 检验项目", ["kb"], 5) is None
+    assert client.breaker.state == OPEN
+
+    # 熔断后不再发出请求
+    start = time.monotonic()
+    assert client._retrieve("黄瓜 检验项目", ["kb"], 5) is None
+    assert time.monotonic() - start < 0.5
@@ -0,0 +1,47 @@
+import multiprocessing
+
+import pytest
+
+from gb_verifier import report_store
+
+PROCESSES = 4
+REPORTS_PER_PROCESS = 20
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_store, "REPORTS_DIR", tmp_path / "reports")
+    monkeypatch.setattr(report_store, "INDEX_FILE", tmp_path / "gb_report_index.json")
+    monkeypatch.setattr(report_store, "LOCK_DIR", tmp_path / "locks")
+    return tmp_path
+
+
+def _result(code):
+    return {"summary": {"gb_validation": {code: {"passed": True}}}, "issues": [], "status": "success"}
+
+
+def _save_many(worker):
+    for n in range(REPORTS_PER_PROCESS):
+        report_store.save_report(f"r{worker}-{n}", _result("GB 2763-2021"))
+
+
+def test_save_report_index(store_dir):
+    report_store.save_report("r1", _result("gb 2763 — 2021"))
+    assert report_store.get_reports_for_standard("GB 2763-2021") == ["r1"]
+    # 重新处理后国标集合变化，旧引用被移除
+    report_store.save_report("r1", _result("GB 2762-2022"))
+    assert report_store.get_reports_for_standard("GB 2763-2021") == []
+    assert report_store.get_reports_for_standard("GB 2762-2022") == ["r1"]
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="需要 fork")
+def test_concurrent_saves_from_processes_keep_every_index_entry(store_dir):
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_save_many, args=(i,)) for i in range(PROCESSES)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(30)
+        assert p.exitcode == 0
+    ids = report_store.get_reports_for_standard("GB 2763-2021")
+    assert len(ids) == PROCESSES * REPORTS_PER_PROCESS
@@ -0,0 +1,45 @@
+import threading
+import time
+
+import pytest
+
+import single_flight
+from single_flight import SingleFlight, interprocess_lock
+
+
+def test_concurrent_calls_share_one_execution():
+    sf = SingleFlight()
+    calls = []
+    gate = threading.Event()
+
+    def fn():
+        calls.append(1)
+        gate.wait(2)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(sf.do("k", fn))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert sf.shared == 4
+
+
+def test_error_is_shared_and_key_released():
+    sf = SingleFlight()
+    with pytest.raises(ValueError):
+        sf.do("k", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert sf.do("k", lambda: 1) == 1
+
+
+@pytest.mark.skipif(not single_flight.FCNTL_AVAILABLE, reason="fcntl 不可用")
+def test_lock_files_are_bounded(tmp_path):
+    for i in range(2000):
+        with interprocess_lock(tmp_path, f"key-{i}") as locked:
+            assert locked
+    assert len(list(tmp_path.iterdir())) <= single_flight.LOCK_STRIPES
@@ -0,0 +1,44 @@
+import threading
+import time
+
+from app_logging import current_request_id, request_context
+from verification_pipeline import run_stages
+
+
+def test_stages_run_concurrently():
+    barrier = threading.Barrier(2, timeout=2)
+
+    def stage(value):
+        def fn():
+            barrier.wait()    # 两个阶段必须同时在执行才能通过
+            return value
+        return fn
+
+    start = time.perf_counter()
+    results = run_stages({"gb": stage(1), "compliance": stage(2)})
+    assert time.perf_counter() - start < 2
+    assert list(results) == ["gb", "compliance"]
+    assert [r.value for r in results.values()] == [1, 2]
+    assert all(r.ok for r in results.values())
+
+
+def test_failure_is_isolated():
+    def broken():
+        raise RuntimeError("RAGFlow 不可用")
+
+    results = run_stages({"gb": lambda: "ok", "compliance": broken})
+    assert results["gb"].ok and results["gb"].value == "ok"
+    assert not results["compliance"].ok
+    assert isinstance(results["compliance"].error, RuntimeError)
+
+
+def test_stages_inherit_request_id():
+    with request_context("req-123"):
+        results = run_stages({"a": current_request_id, "b": current_request_id})
+    assert [r.value for r in results.values()] == ["req-123", "req-123"]
+
+
+def test_single_stage_runs_inline():
+    results = run_stages({"only": threading.get_ident})
+    assert results["only"].value == threading.get_ident()
+    assert run_stages({}) == {}